@@ -3,13 +3,20 @@ import os
 from pydantic import BaseModel, TypeAdapter
 from typing import Type, TypeVar, Any
 from tollbit._environment import Environment
-from tollbit._apis.models import ContentRate, DeveloperContentResponseSuccess
+from tollbit._apis.transport import Transport
+from tollbit._apis.models import (
+    ContentRate,
+    DeveloperContentResponseSuccess,
+    LazyContentResult,
+    parse_lazy_content,
+)
 from tollbit._apis.errors import (
     UnauthorizedError,
     BadRequestError,
     ServerError,
     ParseResponseError,
     UnknownError,
+    RateLimitedError,
 )
 from tollbit.tokens import TollbitToken
 from tollbit._logging import get_sdk_logger
@@ -26,22 +33,31 @@ T = TypeVar("T", bound=BaseModel)
 class ContentAPI:
     user_agent: str
     _base_url: str
+    _transport: Transport
 
-    def __init__(self, user_agent: str, env: Environment):
+    def __init__(self, user_agent: str, env: Environment, transport: Transport | None = None):
         self.user_agent = user_agent
         self._base_url = env.developer_api_base_url
+        self._transport = transport or Transport(env)
+
+    def close(self) -> None:
+        """Release any resources held by this client."""
+        self._transport.close()
+
+    def warmup(self, connections: int = 1) -> int:
+        """Open pooled connections to the developer API ahead of time."""
+        return self._transport.warmup(connections)
 
     def get_rate(self, content: str) -> list[ContentRate]:
         try:
             headers = {"User-Agent": self.user_agent}
-            url = f"{self._base_url}{_GET_RATE_PATH.replace('<PATH>', content)}"
+            path = _GET_RATE_PATH.replace("<PATH>", content)
             logger.debug(
                 "Requesting content rate...",
-                extra={"content": content, "url": url, "headers": headers},
+                extra={"content": content, "url": f"{self._base_url}{path}", "headers": headers},
             )
-            response = requests.get(
-                url,
-                headers=headers,
+            response = self._transport.get(
+                path, headers=headers, endpoint=_GET_RATE_PATH, hedge=True, idempotent=True
             )
         except requests.RequestException as e:
             logger.error(f"Error occurred while fetching rate: {e}")
@@ -61,6 +77,9 @@ class ContentAPI:
                 raise BadRequestError(
                     "Bad Request: Check your request; most likely the content path is invalid or unknown."
                 )
+            case 429:
+                logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
+                raise RateLimitedError("Too Many Requests: Tollbit is throttling requests")
             case code if 500 <= code <= 599:
                 logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
                 raise ServerError(f"An error occurred on Tollbit's servers: {response.status_code}")
@@ -73,17 +92,25 @@ class ContentAPI:
     def get_content(
         self, token: TollbitToken, content_url: str
     ) -> list[DeveloperContentResponseSuccess]:
-        # Implementation for fetching content using the provided token
+        response = self._get_content_response(token, content_url)
+        return _parse_get_content_response(response.json())
+
+    def get_content_lazy(self, token: TollbitToken, content_url: str) -> list[LazyContentResult]:
+        """Fetch content like ``get_content``, decoding each part only when it is read."""
+        response = self._get_content_response(token, content_url)
+        return _parse_lazy_content_response(response.content)
+
+    def _get_content_response(self, token: TollbitToken, content_url: str) -> requests.Response:
+        # Fetches content using the provided token, raising unless the response is a 200
         try:
             headers = {"User-Agent": self.user_agent, "TollbitToken": str(token)}
-            url = f"{self._base_url}{_GET_CONTENT_PATH.replace('<PATH>', content_url)}"
+            path = _GET_CONTENT_PATH.replace("<PATH>", content_url)
             logger.debug(
                 "Requesting content...",
-                extra={"url": url, "headers": headers},
+                extra={"url": f"{self._base_url}{path}", "headers": headers},
             )
-            response = requests.get(
-                url,
-                headers=headers,
+            response = self._transport.get(
+                path, headers=headers, endpoint=_GET_CONTENT_PATH, hedge=True
             )
         except requests.RequestException as e:
             logger.error(f"Error occurred while fetching content: {e}")
@@ -91,7 +118,7 @@ class ContentAPI:
 
         match response.status_code:
             case 200:
-                return _parse_get_content_response(response.json())
+                return response
             case 401:
                 logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
                 raise UnauthorizedError("Unauthorized: Invalid API key")
@@ -100,6 +127,9 @@ class ContentAPI:
                 raise BadRequestError(
                     "Bad Request: Check your request; most likely the content path is invalid or unknown."
                 )
+            case 429:
+                logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
+                raise RateLimitedError("Too Many Requests: Tollbit is throttling requests")
             case code if 500 <= code <= 599:
                 logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
                 raise ServerError(f"An error occurred on Tollbit's servers: {response.status_code}")
@@ -107,8 +137,6 @@ class ContentAPI:
                 logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
                 raise UnknownError(f"An unknown error occurred: {response.status_code}")
 
-        return []  # Shouldn't get here
-
 
 def _parse_get_content_response(data: Any) -> list[DeveloperContentResponseSuccess]:
     if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
@@ -124,6 +152,19 @@ def _parse_get_content_response(data: Any) -> list[DeveloperContentResponseSucce
     return TypeAdapter(list[DeveloperContentResponseSuccess]).validate_python(data)
 
 
+def _parse_lazy_content_response(raw: bytes) -> list[LazyContentResult]:
+    items = parse_lazy_content(raw)
+    if len(items) == 0:
+        raise ParseResponseError("Response data is an empty list")
+
+    results: list[LazyContentResult] = []
+    for item in items:
+        if isinstance(item, dict):
+            raise _guess_error(item["error"])
+        results.append(item)
+    return results
+
+
 def _guess_error(error_str: str) -> Exception:
     if "error parsing content token" in error_str.lower():
         return UnauthorizedError(f"Unauthorized: Invalid Token key: {error_str.lower()}")
@@ -18,3 +18,9 @@ class ParseResponseError(RuntimeError):
 
 class UnknownError(RuntimeError):
     pass
+
+
+class RateLimitedError(UnknownError):
+    """Raised when Tollbit throttles requests (HTTP 429)."""
+
+    pass
@@ -0,0 +1,173 @@
+from __future__ import annotations
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Sequence, TypeVar
+import requests
+from tollbit._apis.errors import RateLimitedError, ServerError, UnauthorizedError
+from tollbit._apis.models import (
+    CreateSubdomainAccessTokenRequest,
+    CreateSubdomainAccessTokenResponse,
+    CreateCrawlAccessTokenRequest,
+    CreateCrawlAccessTokenResponse,
+)
+from tollbit._apis.token_refresher import TokenProvider
+from tollbit._apis.transport import _never_sent
+from tollbit._logging import get_sdk_logger
+from tollbit.metrics import Metrics
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+# How long a key is left out of rotation after each kind of failure. Cooldowns double
+# with each consecutive failure, up to _MAX_COOLDOWN_SECONDS.
+_THROTTLED_COOLDOWN_SECONDS = 5.0
+_SERVER_ERROR_COOLDOWN_SECONDS = 1.0
+_UNAUTHORIZED_COOLDOWN_SECONDS = 300.0
+_MAX_COOLDOWN_SECONDS = 600.0
+
+T = TypeVar("T")
+
+# Every live pool, so that forked children can drop the state inherited from the parent.
+_pools: weakref.WeakSet[KeyPool] = weakref.WeakSet()
+
+
+@dataclass
+class _KeyState:
+    in_flight: int = 0
+    failures: int = 0
+    available_at: float = 0.0
+
+
+class KeyPool:
+    """Spreads token minting across several API keys.
+
+    Each call goes to the available key with the fewest calls in flight, taking turns
+    between keys that are equally loaded. A key that is throttled, rejected or hit by a
+    server error is left out of rotation for a cooldown that grows while it keeps
+    failing. Minting a token is not idempotent, so the call is only retried with the next
+    key when it was throttled or rejected, or could not be sent at all; other server
+    errors are raised. When every key is cooling down, the one that recovers first is
+    used.
+
+    Failures are counted in ``metrics`` by key position, never by the key itself.
+    """
+
+    token_apis: list[TokenProvider]
+    metrics: Metrics
+    _lock: threading.Lock
+    _states: list[_KeyState]
+    _turn: int
+
+    def __init__(self, token_apis: Sequence[TokenProvider], metrics: Metrics | None = None):
+        if not token_apis:
+            raise ValueError("A key pool needs at least one token API")
+        self.token_apis = list(token_apis)
+        self.metrics = metrics or Metrics()
+        self._reset()
+        _pools.add(self)
+
+    @property
+    def user_agent(self) -> str:
+        return self.token_apis[0].user_agent
+
+    def get_content_token(
+        self, req: CreateSubdomainAccessTokenRequest
+    ) -> CreateSubdomainAccessTokenResponse:
+        return self._call(lambda token_api: token_api.get_content_token(req))
+
+    def get_crawl_token(self, req: CreateCrawlAccessTokenRequest) -> CreateCrawlAccessTokenResponse:
+        return self._call(lambda token_api: token_api.get_crawl_token(req))
+
+    def close(self) -> None:
+        for token_api in self.token_apis:
+            token_api.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"token_apis": self.token_apis, "metrics": self.metrics}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset()
+        _pools.add(self)
+
+    def _call(self, mint: Callable[[TokenProvider], T]) -> T:
+        tried: set[int] = set()
+        while True:
+            index = self._acquire(tried)
+            try:
+                result = mint(self.token_apis[index])
+            except (RateLimitedError, UnauthorizedError, ServerError) as e:
+                self._release(index, e)
+                tried.add(index)
+                if len(tried) == len(self.token_apis) or not _retryable(e):
+                    raise
+                logger.warning(f"API key {index} failed, trying another key: {e}")
+                continue
+            except BaseException:
+                self._release(index, None)
+                raise
+            self._release(index, None)
+            return result
+
+    def _acquire(self, tried: set[int]) -> int:
+        now = time.monotonic()
+        with self._lock:
+            candidates = [i for i in range(len(self._states)) if i not in tried]
+            available = [i for i in candidates if self._states[i].available_at <= now]
+            if available:
+                # Least loaded first, then in turn starting after the last key used
+                count = len(self._states)
+                index = min(
+                    available,
+                    key=lambda i: (self._states[i].in_flight, (i - self._turn - 1) % count),
+                )
+            else:
+                index = min(candidates, key=lambda i: self._states[i].available_at)
+            self._turn = index
+            self._states[index].in_flight += 1
+            return index
+
+    def _release(self, index: int, error: BaseException | None) -> None:
+        with self._lock:
+            state = self._states[index]
+            state.in_flight -= 1
+            if error is None:
+                state.failures = 0
+                return
+            if isinstance(error, RateLimitedError):
+                cooldown = _THROTTLED_COOLDOWN_SECONDS
+            elif isinstance(error, UnauthorizedError):
+                cooldown = _UNAUTHORIZED_COOLDOWN_SECONDS
+            else:
+                cooldown = _SERVER_ERROR_COOLDOWN_SECONDS
+            state.failures += 1
+            cooldown = min(cooldown * 2 ** (state.failures - 1), _MAX_COOLDOWN_SECONDS)
+            state.available_at = time.monotonic() + cooldown
+        self.metrics.inc("tollbit_key_failures_total", key=str(index), reason=type(error).__name__)
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._states = [_KeyState() for _ in self.token_apis]
+        self._turn = -1
+
+
+def _retryable(error: Exception) -> bool:
+    """Return whether a failed mint can be retried with another key without minting twice."""
+    if not isinstance(error, ServerError):
+        return True
+    # The token API raises connection failures as server errors
+    cause = error.__cause__
+    return isinstance(cause, requests.RequestException) and _never_sent(cause)
+
+
+def _after_fork_in_child() -> None:
+    # The lock may have been held by another thread when the process forked.
+    for pool in list(_pools):
+        pool._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
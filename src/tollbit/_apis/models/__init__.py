@@ -9,3 +9,4 @@ from ._generated.openapi_tollbit_apis import (
 from ._generated.openapi_tollbit_subdomain import ContentRate, RatePrice, RateLicenseResponse
 
 from ._hand_rolled.get_content import DeveloperContentResponseSuccess
+from ._hand_rolled.lazy_content import LazyContentResult, parse_lazy_content
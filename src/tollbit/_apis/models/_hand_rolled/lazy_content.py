@@ -0,0 +1,242 @@
+"""Content responses that are only decoded as far as they are read.
+
+A ``LazyContentResult`` keeps the raw body of a content response and the byte spans of its
+fields, found by a scan that skips over string values without decoding them. Each of
+``metadata``, ``rate`` and ``content`` is validated on first access, and the page sections
+can be read one at a time, or as UTF-8 bytes without building a ``str`` at all.
+"""
+
+from __future__ import annotations
+import functools
+import json
+import re
+from typing import Any
+from tollbit._apis.errors import ParseResponseError
+from .get_content import (
+    DeveloperContent,
+    DeveloperContentResponseMetadata,
+    DeveloperContentResponseSuccess,
+    DeveloperRateResponse,
+)
+
+_WHITESPACE = re.compile(rb"[ \t\r\n]*")
+# Characters that open or close a nested value, or start a string that might contain them
+_STRUCTURE = re.compile(rb'["{}\[\]]')
+_SCALAR_END = re.compile(rb"[ \t\r\n,}\]]")
+_ESCAPE = re.compile(rb'\\(?:u([0-9A-Fa-f]{4})(?:\\u([0-9A-Fa-f]{4}))?|(["\\/bfnrt]))')
+_SIMPLE_ESCAPES = {
+    b'"': b'"',
+    b"\\": b"\\",
+    b"/": b"/",
+    b"b": b"\b",
+    b"f": b"\f",
+    b"n": b"\n",
+    b"r": b"\r",
+    b"t": b"\t",
+}
+
+Span = tuple[int, int]
+
+
+class LazyContentResult:
+    """A content response decoded on demand.
+
+    Has the same ``metadata``, ``rate`` and ``content`` attributes as
+    ``DeveloperContentResponseSuccess``; ``to_model`` returns one.
+    """
+
+    def __init__(self, raw: bytes, fields: dict[str, Span], sections: dict[str, Span]):
+        self._raw = raw
+        self._fields = fields
+        self._sections = sections
+
+    @functools.cached_property
+    def metadata(self) -> DeveloperContentResponseMetadata:
+        return DeveloperContentResponseMetadata.model_validate_json(self._field_bytes("metadata"))
+
+    @functools.cached_property
+    def rate(self) -> DeveloperRateResponse:
+        return DeveloperRateResponse.model_validate_json(self._field_bytes("rate"))
+
+    @functools.cached_property
+    def content(self) -> DeveloperContent:
+        return DeveloperContent.model_validate_json(self._field_bytes("content"))
+
+    @property
+    def header(self) -> str:
+        return self._section_str("header")
+
+    @property
+    def main(self) -> str:
+        return self._section_str("main")
+
+    @property
+    def footer(self) -> str:
+        return self._section_str("footer")
+
+    def section_bytes(self, name: str) -> bytes:
+        """Return the ``header``, ``main`` or ``footer`` section as UTF-8 bytes."""
+        start, end = self._section(name)
+        # Drop the quotes
+        value = self._raw[start + 1 : end - 1]
+        if b"\\" not in value:
+            return value
+        return _ESCAPE.sub(_unescape, value)
+
+    def main_bytes(self) -> bytes:
+        """Return the main section as UTF-8 bytes, without decoding it to a ``str``."""
+        return self.section_bytes("main")
+
+    def to_model(self) -> DeveloperContentResponseSuccess:
+        """Return the fully decoded response."""
+        return DeveloperContentResponseSuccess(
+            content=self.content, metadata=self.metadata, rate=self.rate
+        )
+
+    def _field_bytes(self, name: str) -> bytes:
+        span = self._fields.get(name)
+        if span is None:
+            raise ParseResponseError(f"Content response has no {name}")
+        return self._raw[span[0] : span[1]]
+
+    def _section(self, name: str) -> Span:
+        span = self._sections.get(name)
+        if span is None or self._raw[span[0]] != ord('"'):
+            raise ParseResponseError(f"Content response has no {name} section")
+        return span
+
+    def _section_str(self, name: str) -> str:
+        start, end = self._section(name)
+        value: str = json.loads(self._raw[start:end])
+        return value
+
+
+def parse_lazy_content(raw: bytes) -> list[LazyContentResult | dict[str, Any]]:
+    """Split a content response body into its items without decoding their values.
+
+    Items that carry an ``error`` field are returned decoded, as dicts.
+    """
+    try:
+        pos = _skip(raw, 0)
+        if raw[pos : pos + 1] != b"[":
+            raise ParseResponseError("Response data is not a list of dictionaries")
+        items: list[LazyContentResult | dict[str, Any]] = []
+        for start, end in _elements(raw, pos):
+            if raw[start : start + 1] != b"{":
+                raise ParseResponseError("Response data is not a list of dictionaries")
+            fields = _members(raw, start)
+            if "error" in fields:
+                items.append(json.loads(raw[start:end]))
+                continue
+            content = fields.get("content")
+            if content is not None and raw[content[0] : content[0] + 1] == b"{":
+                sections = _members(raw, content[0])
+            else:
+                sections = {}
+            items.append(LazyContentResult(raw, fields, sections))
+        return items
+    except (IndexError, ValueError) as e:
+        raise ParseResponseError(f"Content response is not valid JSON: {e}") from e
+
+
+def _skip(raw: bytes, pos: int) -> int:
+    match = _WHITESPACE.match(raw, pos)
+    assert match is not None
+    return match.end()
+
+
+def _expect(raw: bytes, pos: int, char: bytes) -> int:
+    if raw[pos : pos + 1] != char:
+        raise ParseResponseError(f"Expected {char.decode()} at byte {pos} of content response")
+    return _skip(raw, pos + 1)
+
+
+def _string_end(raw: bytes, start: int) -> int:
+    # start is the opening quote; returns the index after the closing quote
+    pos = start + 1
+    while True:
+        end = raw.index(b'"', pos)
+        backslashes = 0
+        while raw[end - 1 - backslashes] == 0x5C:
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end + 1
+        pos = end + 1
+
+
+def _value_end(raw: bytes, start: int) -> int:
+    first = raw[start : start + 1]
+    if first == b'"':
+        return _string_end(raw, start)
+    if first not in (b"{", b"["):
+        match = _SCALAR_END.search(raw, start)
+        return match.start() if match is not None else len(raw)
+
+    depth = 0
+    pos = start
+    while True:
+        match = _STRUCTURE.search(raw, pos)
+        if match is None:
+            raise ParseResponseError("Unterminated value in content response")
+        char = match.group()
+        if char == b'"':
+            pos = _string_end(raw, match.start())
+            continue
+        depth += 1 if char in (b"{", b"[") else -1
+        pos = match.end()
+        if depth == 0:
+            return pos
+
+
+def _elements(raw: bytes, start: int) -> list[Span]:
+    # start is the opening bracket of an array
+    spans: list[Span] = []
+    pos = _skip(raw, start + 1)
+    if raw[pos : pos + 1] == b"]":
+        return spans
+    while True:
+        end = _value_end(raw, pos)
+        spans.append((pos, end))
+        pos = _skip(raw, end)
+        if raw[pos : pos + 1] == b"]":
+            return spans
+        pos = _expect(raw, pos, b",")
+
+
+def _members(raw: bytes, start: int) -> dict[str, Span]:
+    # start is the opening brace of an object
+    spans: dict[str, Span] = {}
+    pos = _skip(raw, start + 1)
+    if raw[pos : pos + 1] == b"}":
+        return spans
+    while True:
+        if raw[pos : pos + 1] != b'"':
+            raise ParseResponseError(f"Expected a key at byte {pos} of content response")
+        key_end = _string_end(raw, pos)
+        key = json.loads(raw[pos:key_end])
+        pos = _expect(raw, _skip(raw, key_end), b":")
+        end = _value_end(raw, pos)
+        spans[key] = (pos, end)
+        pos = _skip(raw, end)
+        if raw[pos : pos + 1] == b"}":
+            return spans
+        pos = _expect(raw, pos, b",")
+
+
+def _unescape(match: re.Match[bytes]) -> bytes:
+    high, low, simple = match.groups()
+    if simple is not None:
+        return _SIMPLE_ESCAPES[simple]
+    code = int(high, 16)
+    if low is not None:
+        second = int(low, 16)
+        if 0xD800 <= code < 0xDC00 and 0xDC00 <= second < 0xE000:
+            code = 0x10000 + ((code - 0xD800) << 10) + (second - 0xDC00)
+            return chr(code).encode("utf-8")
+        return _code_point(code) + _code_point(second)
+    return _code_point(code)
+
+
+def _code_point(code: int) -> bytes:
+    # Lone surrogates cannot be encoded; json.loads would keep them in the str
+    return chr(code).encode("utf-8", "surrogatepass")
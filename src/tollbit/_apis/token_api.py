@@ -17,8 +17,9 @@ from tollbit._apis.errors import (
     BadRequestError,
     ServerError,
     UnknownError,
+    RateLimitedError,
 )
-from tollbit._environment import Environment
+from tollbit._apis.transport import Transport
 from tollbit._logging import get_sdk_logger
 
 CREATE_CONTENT_TOKEN_PATH = "/dev/v2/tokens/content"
@@ -31,10 +32,13 @@ T = TypeVar("T", bound=BaseModel)
 
 
 class TokenAPI:
-    def __init__(self, api_key: str, user_agent: str, env: Environment):
+    def __init__(
+        self, api_key: str, user_agent: str, env: Environment, transport: Transport | None = None
+    ):
         self.api_key = api_key
         self.user_agent = user_agent
         self._base_url = env.developer_api_base_url
+        self._transport = transport or Transport(env)
 
     def get_content_token(
         self, req: CreateSubdomainAccessTokenRequest
@@ -73,9 +77,13 @@ class TokenAPI:
 
         return _handle_response(response, CreateCrawlAccessTokenResponse)
 
+    def close(self) -> None:
+        """Release any resources held by this client."""
+        self._transport.close()
+
     def _post_model(self, path: str, headers: dict[str, str], body: BaseModel) -> requests.Response:
         payload = body.model_dump(mode="json")
-        response = requests.post(f"{self._base_url}{path}", headers=headers, json=payload)
+        response = self._transport.post(path, headers=headers, json=payload)
         return response
 
     def _headers(self) -> dict[str, str]:
@@ -99,6 +107,9 @@ def _handle_response(response: requests.Response, success_model: Type[T]) -> T:
             raise BadRequestError(
                 "Bad Request: Check your request details; most likely an invalid domain."
             )
+        case 429:
+            logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
+            raise RateLimitedError("Too Many Requests: Tollbit is throttling requests")
         case code if 500 <= code <= 599:
             logger.error(f"HTTP ERROR {response.status_code}: {response.text}")
             raise ServerError(f"An error occurred on Tollbit's servers: {response.status_code}")
@@ -0,0 +1,252 @@
+from __future__ import annotations
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any, Callable, Protocol
+from tollbit._apis.models import (
+    CreateSubdomainAccessTokenRequest,
+    CreateSubdomainAccessTokenResponse,
+    CreateCrawlAccessTokenRequest,
+    CreateCrawlAccessTokenResponse,
+)
+from tollbit._logging import get_sdk_logger
+from tollbit.metrics import Metrics
+from tollbit.tokens import token_expiry
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_DEFAULT_REFRESH_MARGIN_SECONDS = 30.0
+_DEFAULT_IDLE_TIMEOUT_SECONDS = 300.0
+_DEFAULT_TOKEN_TTL_SECONDS = 300.0
+_RETRY_DELAY_SECONDS = 1.0
+
+_TokenRequest = CreateSubdomainAccessTokenRequest | CreateCrawlAccessTokenRequest
+_TokenResponse = CreateSubdomainAccessTokenResponse | CreateCrawlAccessTokenResponse
+
+# Every live refresher, so that forked children can drop the state inherited from the parent.
+_refreshers: weakref.WeakSet[TokenRefresher] = weakref.WeakSet()
+
+
+class TokenProvider(Protocol):
+    """Anything that can mint content and crawl tokens, e.g. ``TokenAPI``."""
+
+    @property
+    def user_agent(self) -> str: ...
+
+    def get_content_token(
+        self, req: CreateSubdomainAccessTokenRequest
+    ) -> CreateSubdomainAccessTokenResponse: ...
+
+    def get_crawl_token(
+        self, req: CreateCrawlAccessTokenRequest
+    ) -> CreateCrawlAccessTokenResponse: ...
+
+    def close(self) -> None: ...
+
+
+@dataclass
+class _Entry:
+    mint: Callable[[], _TokenResponse]
+    response: _TokenResponse
+    # All times are time.monotonic() based
+    refresh_at: float
+    expires_at: float
+    last_used: float
+
+
+class TokenRefresher:
+    """Reuses minted tokens and re-mints them in the background before they expire.
+
+    Tokens that have been used within ``idle_timeout`` seconds are replaced
+    ``refresh_margin`` seconds before they expire, so callers are handed a valid token
+    without waiting on the token endpoints. Tokens that are no longer used are dropped
+    once they expire. Call ``close`` to stop the background thread.
+
+    Tokens are never shared across processes: a forked child or an unpickled copy starts
+    with no tokens and its own background thread.
+    """
+
+    _entries: dict[str, _Entry]
+    _cond: threading.Condition
+    _thread: threading.Thread | None
+    _closed: bool
+
+    def __init__(
+        self,
+        token_api: TokenProvider,
+        refresh_margin: float = _DEFAULT_REFRESH_MARGIN_SECONDS,
+        idle_timeout: float = _DEFAULT_IDLE_TIMEOUT_SECONDS,
+        default_ttl: float = _DEFAULT_TOKEN_TTL_SECONDS,
+        metrics: Metrics | None = None,
+    ):
+        self.token_api = token_api
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self.default_ttl = default_ttl
+        self.metrics = metrics or Metrics()
+        self._reset()
+        _refreshers.add(self)
+
+    @property
+    def user_agent(self) -> str:
+        return self.token_api.user_agent
+
+    def get_content_token(
+        self, req: CreateSubdomainAccessTokenRequest
+    ) -> CreateSubdomainAccessTokenResponse:
+        resp = self._get("content", req, lambda: self.token_api.get_content_token(req))
+        assert isinstance(resp, CreateSubdomainAccessTokenResponse)
+        return resp
+
+    def get_crawl_token(self, req: CreateCrawlAccessTokenRequest) -> CreateCrawlAccessTokenResponse:
+        resp = self._get("crawl", req, lambda: self.token_api.get_crawl_token(req))
+        assert isinstance(resp, CreateCrawlAccessTokenResponse)
+        return resp
+
+    def close(self) -> None:
+        """Stop the background refresh thread and forget all tokens."""
+        with self._cond:
+            self._closed = True
+            self._entries.clear()
+            self._cond.notify_all()
+            thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.token_api.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "token_api": self.token_api,
+            "refresh_margin": self.refresh_margin,
+            "idle_timeout": self.idle_timeout,
+            "default_ttl": self.default_ttl,
+            "metrics": self.metrics,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset()
+        _refreshers.add(self)
+
+    def _reset(self) -> None:
+        self._entries = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def _get(
+        self, kind: str, req: _TokenRequest, mint: Callable[[], _TokenResponse]
+    ) -> _TokenResponse:
+        key = f"{kind}:{req.model_dump_json()}"
+        now = time.monotonic()
+        with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                entry.last_used = now
+                return entry.response
+
+        response = mint()
+        refresh_at, expires_at = self._schedule(response.token)
+        with self._cond:
+            if not self._closed:
+                self._entries[key] = _Entry(
+                    mint, response, refresh_at, expires_at, time.monotonic()
+                )
+                self._ensure_thread()
+                self._cond.notify_all()
+        return response
+
+    def _schedule(self, token: str) -> tuple[float, float]:
+        """Return when a freshly minted token should be refreshed and when it expires."""
+        ttl = self.default_ttl
+        exp = token_expiry(token)
+        if exp is not None:
+            ttl = exp - time.time()
+        now = time.monotonic()
+        if ttl <= 0:
+            # Most likely the clock is skewed. Retry later rather than minting in a busy loop.
+            logger.warning("Minted a token that has already expired")
+            return now + _RETRY_DELAY_SECONDS, now + ttl
+        # Short-lived tokens are refreshed half way through their life rather than
+        # continuously.
+        return now + max(ttl - self.refresh_margin, ttl / 2), now + ttl
+
+    def _ensure_thread(self) -> None:
+        # Called with self._cond held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="tollbit-token-refresher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                due = self._due_entries()
+                if not due:
+                    self._cond.wait(timeout=self._seconds_until_next_refresh())
+                    continue
+
+            for key, entry in due:
+                self._refresh(key, entry)
+
+    def _due_entries(self) -> list[tuple[str, _Entry]]:
+        # Called with self._cond held. Drops idle tokens and returns those due a refresh.
+        now = time.monotonic()
+        due = []
+        for key, entry in list(self._entries.items()):
+            if entry.refresh_at > now:
+                continue
+            if now - entry.last_used > self.idle_timeout:
+                if entry.expires_at <= now:
+                    del self._entries[key]
+                continue
+            due.append((key, entry))
+        return due
+
+    def _seconds_until_next_refresh(self) -> float | None:
+        # Called with self._cond held
+        now = time.monotonic()
+        waits = []
+        for entry in self._entries.values():
+            refresh_at = entry.refresh_at
+            if now - entry.last_used > self.idle_timeout:
+                # Idle tokens are dropped once both due and expired
+                refresh_at = max(refresh_at, entry.expires_at)
+            waits.append(refresh_at - now)
+        return max(min(waits), 0.0) if waits else None
+
+    def _refresh(self, key: str, entry: _Entry) -> None:
+        try:
+            response = entry.mint()
+        except Exception as e:
+            logger.warning(f"Unable to refresh token, will retry: {e}")
+            self.metrics.inc(
+                "tollbit_retries_total", operation="token_refresh", reason=type(e).__name__
+            )
+            with self._cond:
+                self._cond.wait(timeout=_RETRY_DELAY_SECONDS)
+            return
+
+        refresh_at, expires_at = self._schedule(response.token)
+        with self._cond:
+            current = self._entries.get(key)
+            if current is entry:
+                current.response = response
+                current.refresh_at = refresh_at
+                current.expires_at = expires_at
+
+
+def _after_fork_in_child() -> None:
+    # The background thread does not survive a fork, and the lock may have been held.
+    for refresher in list(_refreshers):
+        refresher._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,390 @@
+from __future__ import annotations
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, MaxRetryError, NewConnectionError
+from tollbit._environment import Environment
+from tollbit._logging import get_sdk_logger
+from tollbit.hedging import HedgeBudget, HedgePolicy, LatencyTracker
+from tollbit.metrics import Metrics
+from tollbit.traffic import TrafficJournal
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_DEFAULT_POOL_MAXSIZE = 10
+_WARMUP_TIMEOUT_SECONDS = 10.0
+# Weight of the latest request in a gateway's average latency
+_LATENCY_EWMA_WEIGHT = 0.2
+# How long a failing gateway is avoided, doubling with each consecutive failure
+_DOWN_SECONDS = 1.0
+_MAX_DOWN_SECONDS = 60.0
+
+# Every live transport, so that forked children can drop the state inherited from the parent.
+_transports: weakref.WeakSet[Transport] = weakref.WeakSet()
+
+
+@dataclass
+class _Gateway:
+    """Health and latency of one gateway base URL."""
+
+    url: str
+    # Exponentially weighted moving average of request latency, once measured
+    latency: float | None = None
+    failures: int = 0
+    down_until: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def succeeded(self, elapsed: float) -> None:
+        with self.lock:
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += _LATENCY_EWMA_WEIGHT * (elapsed - self.latency)
+            self.failures = 0
+            self.down_until = 0.0
+
+    def failed(self) -> None:
+        with self.lock:
+            self.failures += 1
+            backoff = _DOWN_SECONDS * 2 ** (self.failures - 1)
+            self.down_until = time.monotonic() + min(backoff, _MAX_DOWN_SECONDS)
+
+
+class Transport:
+    """Sends requests to the Tollbit developer API over a pooled HTTP session.
+
+    The session is created lazily and is only ever used by the process that created it.
+    A forked child, or a copy unpickled in another process, opens its own connections
+    rather than sharing the parent's sockets. Pickling a transport only keeps its
+    configuration.
+
+    When the environment lists several gateways, each request goes to the healthy gateway
+    with the lowest average latency, and gateways that have not been measured yet are
+    tried after the measured ones, in the order given. A request that cannot connect to a
+    gateway is sent to the next one, and the failing gateway is avoided for a backoff
+    period that grows while it keeps failing. Requests made with ``idempotent=True`` are
+    also sent to the next gateway after any other error or a 5xx response; other requests,
+    such as token mints and content fetches, may already have taken effect by then and are
+    not repeated.
+
+    With a ``hedging`` policy, ``GET`` requests made with ``hedge=True`` are sent a second
+    time when they are slow; see ``tollbit.hedging``. Only pass ``hedge=True`` for
+    requests that are safe to repeat.
+
+    Every request is counted in ``metrics``, labelled by ``endpoint``, which defaults to
+    the request path. With a ``journal``, every attempt is also recorded there; see
+    ``tollbit.traffic``.
+    """
+
+    base_url: str
+    base_urls: tuple[str, ...]
+    pool_maxsize: int
+    metrics: Metrics
+    hedging: HedgePolicy | None
+    journal: TrafficJournal | None
+    _lock: threading.Lock
+    _session: requests.Session | None
+    _pid: int | None
+    _gateways: list[_Gateway]
+    _latencies: LatencyTracker | None
+    _hedge_budget: HedgeBudget | None
+
+    def __init__(
+        self,
+        env: Environment,
+        pool_maxsize: int = _DEFAULT_POOL_MAXSIZE,
+        metrics: Metrics | None = None,
+        hedging: HedgePolicy | None = None,
+        journal: TrafficJournal | None = None,
+    ):
+        self.base_urls = env.base_urls
+        self.base_url = self.base_urls[0]
+        self.pool_maxsize = pool_maxsize
+        self.metrics = metrics or Metrics()
+        self.hedging = hedging
+        self.journal = journal
+        self._reset()
+        _transports.add(self)
+
+    def get(
+        self,
+        path: str,
+        headers: dict[str, str],
+        endpoint: str | None = None,
+        hedge: bool = False,
+        idempotent: bool = False,
+    ) -> requests.Response:
+        def request(session: requests.Session, url: str) -> requests.Response:
+            return session.get(url, headers=headers)
+
+        if hedge and self._hedge_budget is not None:
+            return self._send_hedged(request, path, endpoint or path, idempotent)
+        return self._send(request, path, endpoint or path, idempotent=idempotent)
+
+    def post(
+        self, path: str, headers: dict[str, str], json: Any, endpoint: str | None = None
+    ) -> requests.Response:
+        return self._send(
+            lambda session, url: session.post(url, headers=headers, json=json),
+            path,
+            endpoint or path,
+            method="POST",
+        )
+
+    def warmup(self, connections: int = 1) -> int:
+        """Open up to ``connections`` pooled connections to the developer API ahead of time.
+
+        Each connection is established (DNS, TCP and TLS) by a ``HEAD`` request to the
+        preferred gateway and then returned to the pool, so that later requests skip the
+        handshakes. At most ``pool_maxsize`` connections are kept. Failures are logged
+        rather than raised. Returns the number of connections opened.
+        """
+        connections = min(connections, self.pool_maxsize)
+        if connections < 1:
+            return 0
+        url = self._ranked()[0].url
+        # Hold every response open until all have been made, so that each request gets a
+        # connection of its own rather than reusing one that another request just released
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            responses = list(pool.map(lambda _: self._open_connection(url), range(connections)))
+        opened = 0
+        for response in responses:
+            if response is not None:
+                # Reading the (empty) body returns the connection to the pool
+                response.content
+                opened += 1
+        logger.debug("Warmed up connections", extra={"url": url, "opened": opened})
+        return opened
+
+    def session(self) -> requests.Session:
+        """Return this process's session, creating it if needed."""
+        session = self._session
+        if session is not None and self._pid == os.getpid():
+            return session
+
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                self._session = self._new_session()
+                self._pid = os.getpid()
+            return self._session
+
+    def close(self) -> None:
+        """Close any pooled connections. The transport can still be used afterwards."""
+        with self._lock:
+            session, self._session = self._session, None
+            owned = self._pid == os.getpid()
+        if session is not None and owned:
+            session.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "base_urls": self.base_urls,
+            "pool_maxsize": self.pool_maxsize,
+            "metrics": self.metrics,
+            "hedging": self.hedging,
+            "journal": self.journal,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.base_urls = state["base_urls"]
+        self.base_url = self.base_urls[0]
+        self.pool_maxsize = state["pool_maxsize"]
+        self.metrics = state["metrics"]
+        self.hedging = state["hedging"]
+        self.journal = state["journal"]
+        self._reset()
+        _transports.add(self)
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self.pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _send(
+        self,
+        request: Callable[[requests.Session, str], requests.Response],
+        path: str,
+        endpoint: str,
+        method: str = "GET",
+        idempotent: bool = False,
+    ) -> requests.Response:
+        gateways = self._ranked()
+        for i, gateway in enumerate(gateways):
+            last = i == len(gateways) - 1
+            sent_at = time.time()
+            start = time.perf_counter()
+            try:
+                response = request(self.session(), f"{gateway.url}{path}")
+            except requests.RequestException as e:
+                self._record_failure(endpoint)
+                if self.journal is not None:
+                    self.journal.record_failure(
+                        method, endpoint, path, e, sent_at, time.perf_counter() - start
+                    )
+                gateway.failed()
+                if last or not (idempotent or _never_sent(e)):
+                    raise
+                logger.warning(f"Request to {gateway.url} failed, trying another gateway: {e}")
+                self.metrics.inc(
+                    "tollbit_retries_total", operation=endpoint, reason=type(e).__name__
+                )
+                continue
+
+            elapsed = time.perf_counter() - start
+            self._record(endpoint, response, elapsed)
+            if self.journal is not None:
+                self.journal.record_response(method, endpoint, path, response, sent_at, elapsed)
+            if response.status_code < 500:
+                gateway.succeeded(elapsed)
+                if self._latencies is not None:
+                    self._latencies.add(endpoint, elapsed)
+                return response
+            gateway.failed()
+            if last or not idempotent:
+                return response
+            logger.warning(
+                f"Gateway {gateway.url} returned {response.status_code}, trying another gateway"
+            )
+            self.metrics.inc(
+                "tollbit_retries_total", operation=endpoint, reason=str(response.status_code)
+            )
+        raise AssertionError("A transport always has at least one gateway")
+
+    def _send_hedged(
+        self,
+        request: Callable[[requests.Session, str], requests.Response],
+        path: str,
+        endpoint: str,
+        idempotent: bool,
+    ) -> requests.Response:
+        budget = self._hedge_budget
+        assert self._latencies is not None and budget is not None
+        budget.count_request()
+        delay = self._latencies.threshold(endpoint)
+        if delay is None:
+            return self._send(request, path, endpoint, idempotent=idempotent)
+
+        # Each attempt runs on a thread of its own, so that callers never queue behind each
+        # other for a pool, and the caller waits for whichever attempt succeeds first
+        lock = threading.Lock()
+        outcome: Future[tuple[requests.Response, bool]] = Future()
+        pending = 0
+
+        def attempt(hedged: bool) -> None:
+            nonlocal pending
+            try:
+                response = self._send(request, path, endpoint, idempotent=idempotent)
+            except Exception as e:
+                with lock:
+                    pending -= 1
+                    # Only give up once every attempt has failed
+                    if pending == 0 and not outcome.done():
+                        outcome.set_exception(e)
+                return
+            with lock:
+                pending -= 1
+                if not outcome.done():
+                    outcome.set_result((response, hedged))
+
+        def start(hedged: bool) -> None:
+            # Called with lock held
+            nonlocal pending
+            pending += 1
+            threading.Thread(
+                target=attempt, args=(hedged,), name="tollbit-hedge", daemon=True
+            ).start()
+
+        with lock:
+            start(False)
+        done, _ = wait([outcome], timeout=delay)
+        if not done:
+            with lock:
+                if not outcome.done() and budget.try_hedge():
+                    self.metrics.inc("tollbit_hedges_total", endpoint=endpoint)
+                    start(True)
+
+        # The losing attempt cannot be interrupted; it is left to finish in the background,
+        # after which its connection is reused
+        response, hedged = outcome.result()
+        if hedged:
+            self.metrics.inc("tollbit_hedge_wins_total", endpoint=endpoint)
+        return response
+
+    def _ranked(self) -> list[_Gateway]:
+        """Return the gateways in the order they should be tried."""
+        now = time.monotonic()
+        healthy = [gateway for gateway in self._gateways if gateway.down_until <= now]
+        down = [gateway for gateway in self._gateways if gateway.down_until > now]
+        # Unmeasured gateways go after measured ones, and sorting is stable, so they keep
+        # their configured order
+        healthy.sort(key=lambda gateway: (gateway.latency is None, gateway.latency or 0.0))
+        down.sort(key=lambda gateway: gateway.down_until)
+        return healthy + down
+
+    def _open_connection(self, url: str) -> requests.Response | None:
+        try:
+            return self.session().head(
+                url, stream=True, allow_redirects=False, timeout=_WARMUP_TIMEOUT_SECONDS
+            )
+        except requests.RequestException as e:
+            logger.warning(f"Unable to open a connection to {url}: {e}")
+            return None
+
+    def _record(self, endpoint: str, response: requests.Response, elapsed: float) -> None:
+        metrics = self.metrics
+        metrics.observe("tollbit_request_seconds", elapsed, endpoint=endpoint)
+        metrics.inc("tollbit_requests_total", endpoint=endpoint, status=str(response.status_code))
+        # Stand-in responses, such as those used in tests, may not carry a body or request
+        body = getattr(getattr(response, "request", None), "body", None)
+        if body:
+            metrics.inc("tollbit_request_bytes_total", len(body), endpoint=endpoint)
+        content = getattr(response, "content", None)
+        if content:
+            metrics.inc("tollbit_response_bytes_total", len(content), endpoint=endpoint)
+
+    def _record_failure(self, endpoint: str) -> None:
+        self.metrics.inc("tollbit_requests_total", endpoint=endpoint, status="error")
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self._gateways = [_Gateway(url) for url in self.base_urls]
+        if self.hedging is not None:
+            self._latencies = LatencyTracker(self.hedging)
+            self._hedge_budget = HedgeBudget(self.hedging.max_ratio)
+        else:
+            self._latencies = None
+            self._hedge_budget = None
+
+
+def _never_sent(error: requests.RequestException) -> bool:
+    """Return whether a request failed before a connection was made, so nothing was sent."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError) or not error.args:
+        return False
+    cause = error.args[0]
+    if isinstance(cause, MaxRetryError):
+        cause = cause.reason
+    return isinstance(cause, (NewConnectionError, ConnectTimeoutError))
+
+
+def _after_fork_in_child() -> None:
+    # The parent's sockets (and possibly a held lock) were copied into the child. Forget
+    # them without closing, since the parent is still using those connections.
+    for transport in list(_transports):
+        transport._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -9,9 +9,22 @@ _DEFAULT_DEVELOPER_API_BASE_URL = "https://gateway.tollbit.com"
 @dataclass(frozen=True)
 class Environment:
     developer_api_base_url: str
+    # Further gateways serving the same API, such as other regions or a local caching proxy
+    fallback_base_urls: tuple[str, ...] = ()
+
+    @property
+    def base_urls(self) -> tuple[str, ...]:
+        return (self.developer_api_base_url, *self.fallback_base_urls)
 
 
 def env_from_vars() -> Environment:
-    """Create an Environment from environment variables."""
-    developer_api_base_url = os.getenv(_DEVELOPER_API_BASE_URL_ENV, _DEFAULT_DEVELOPER_API_BASE_URL)
-    return Environment(developer_api_base_url=developer_api_base_url)
+    """Create an Environment from environment variables.
+
+    The base URL variable may hold several comma-separated gateway URLs, the first of
+    which is the primary.
+    """
+    value = os.getenv(_DEVELOPER_API_BASE_URL_ENV, _DEFAULT_DEVELOPER_API_BASE_URL)
+    base_urls = [url.strip() for url in value.split(",") if url.strip()]
+    if not base_urls:
+        base_urls = [_DEFAULT_DEVELOPER_API_BASE_URL]
+    return Environment(developer_api_base_url=base_urls[0], fallback_base_urls=tuple(base_urls[1:]))
@@ -0,0 +1,300 @@
+"""Caches for rate and token lookups.
+
+A cache maps string keys to string values that expire at a given unix time. The SDK
+stores rates and tokens in a cache through ``get_or_compute``, which guarantees that
+concurrent lookups of the same missing key only compute it once:
+
+- ``MemoryCache`` is private to a single process.
+- ``SQLiteCache`` is backed by a SQLite database in WAL mode and can be shared by every
+  process on a host, so that a whole node does each lookup once.
+"""
+
+from __future__ import annotations
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Protocol
+from tollbit._logging import get_sdk_logger
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_DEFAULT_LEASE_SECONDS = 30.0
+_DEFAULT_POLL_INTERVAL_SECONDS = 0.05
+_PURGE_EVERY_N_WRITES = 1000
+
+# A computed value and the unix time at which it expires
+Computed = tuple[str, float]
+
+
+class Cache(Protocol):
+    def get(self, key: str) -> str | None:
+        """Return the value for ``key``, or None if it is missing or expired."""
+        ...
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        """Store ``value`` under ``key`` until the unix time ``expires_at``."""
+        ...
+
+    def get_or_compute(self, key: str, compute: Callable[[], Computed]) -> str:
+        """Return the value for ``key``, calling ``compute`` to fill it if needed.
+
+        Concurrent callers that miss on the same key wait for a single call to
+        ``compute`` rather than each making their own. If ``compute`` raises, the error
+        is raised to its caller and one of the waiting callers tries again.
+        """
+        ...
+
+    def items(self, prefix: str = "") -> Iterator[tuple[str, str, float]]:
+        """Yield ``(key, value, expires_at)`` for unexpired keys starting with ``prefix``."""
+        ...
+
+
+class MemoryCache:
+    """An in-process cache.
+
+    Pickling a ``MemoryCache`` produces an empty cache, so entries are never shared
+    between processes by accident.
+    """
+
+    _lock: threading.Lock
+    _entries: dict[str, tuple[str, float]]
+    _pending: dict[str, threading.Event]
+
+    def __init__(self) -> None:
+        self._reset()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Computed]) -> str:
+        while True:
+            with self._lock:
+                value = self._get(key)
+                if value is not None:
+                    return value
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()
+
+        try:
+            value, expires_at = compute()
+            self.set(key, value, expires_at)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def items(self, prefix: str = "") -> Iterator[tuple[str, str, float]]:
+        now = time.time()
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, (value, expires_at) in entries:
+            if key.startswith(prefix) and expires_at > now:
+                yield key, value, expires_at
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self._reset()
+
+    def _get(self, key: str) -> str | None:
+        # Called with self._lock held
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._pending = {}
+
+
+class SQLiteCache:
+    """A cache stored in a SQLite database that every process on a host can share.
+
+    ``get_or_compute`` takes a lease on a missing key before computing it. Other callers,
+    in any process, wait for the value to appear instead of computing it themselves. If
+    the lease holder dies, its lease lapses after ``lease_seconds`` and another caller
+    takes over.
+
+    Each thread in each process uses its own connection, so a single instance can be
+    shared by threads and pickled to worker processes.
+    """
+
+    path: str
+    lease_seconds: float
+    poll_interval: float
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        lease_seconds: float = _DEFAULT_LEASE_SECONDS,
+        poll_interval: float = _DEFAULT_POLL_INTERVAL_SECONDS,
+    ):
+        self.path = os.fspath(path)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._reset()
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            """)
+
+    def get(self, key: str) -> str | None:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return None if row is None else str(row[0])
+
+    def set(self, key: str, value: str, expires_at: float) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, expires_at),
+        )
+        self._count_write()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Computed]) -> str:
+        owner = uuid.uuid4().hex
+        while True:
+            value, leased = self._get_or_lease(key, owner)
+            if value is not None:
+                return value
+            if leased:
+                break
+            time.sleep(self.poll_interval)
+
+        try:
+            value, expires_at = compute()
+        except BaseException:
+            self._release(key, owner)
+            raise
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+        self._count_write()
+        return value
+
+    def items(self, prefix: str = "") -> Iterator[tuple[str, str, float]]:
+        rows = self._connect().execute(
+            "SELECT key, value, expires_at FROM entries "
+            "WHERE substr(key, 1, ?) = ? AND expires_at > ?",
+            (len(prefix), prefix, time.time()),
+        )
+        for key, value, expires_at in rows:
+            yield str(key), str(value), float(expires_at)
+
+    def purge(self) -> None:
+        """Delete expired entries and lapsed leases."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "path": self.path,
+            "lease_seconds": self.lease_seconds,
+            "poll_interval": self.poll_interval,
+        }
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset()
+
+    def _count_write(self) -> None:
+        # Expired entries are purged every so often, rather than on every write
+        with self._lock:
+            self._writes += 1
+            due = self._writes % _PURGE_EVERY_N_WRITES == 0
+        if due:
+            self.purge()
+
+    def _get_or_lease(self, key: str, owner: str) -> tuple[str | None, bool]:
+        """Return the cached value, or take the lease on the key if nobody holds it."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is not None:
+                return str(row[0]), False
+
+            lease = conn.execute(
+                "SELECT 1 FROM leases WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if lease is not None:
+                return None, False
+
+            conn.execute(
+                "INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + self.lease_seconds),
+            )
+            return None, True
+
+    def _release(self, key: str, owner: str) -> None:
+        try:
+            self._connect().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+        except sqlite3.Error as e:
+            # The lease will lapse on its own
+            logger.warning(f"Unable to release cache lease: {e}")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn: sqlite3.Connection | None = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.lease_seconds, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _reset(self) -> None:
+        self._local = threading.local()
+        # Guards the write count, which is shared by every thread using the cache
+        self._lock = threading.Lock()
+        self._writes = 0
@@ -0,0 +1,354 @@
+"""The ``tollbit`` command, for bulk rate lookups and purchases without writing Python.
+
+URLs are read one per line from a file, or from standard input when the file is ``-`` or
+left out. Blank lines and lines starting with ``#`` are skipped. Each result is written as
+a line of JSON to standard output or ``--output`` as soon as it is ready, and a summary of
+progress, throughput and spend is printed to standard error every few seconds::
+
+    tollbit rates urls.txt > rates.jsonl
+    tollbit fetch urls.txt --max-price-micros 5000 --concurrency 64 --adaptive -o content.jsonl
+    tollbit rates urls.txt --max-rps 20 > rates.jsonl
+
+``tollbit sidecar`` serves rates and content to other local services over HTTP; see
+``tollbit.sidecar``. ``tollbit replay`` replays a traffic journal against a local stand-in
+gateway and prints the latency of each endpoint; see ``tollbit.replay``.
+
+The API key and user agent are read from ``TOLLBIT_ORG_API_KEY`` and ``TOLLBIT_USER_AGENT``
+unless given as options. Several comma-separated API keys spread token minting across keys.
+The command exits with status 1 if any URL failed.
+"""
+
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from enum import Enum
+from typing import IO, Any, ContextManager, Iterable, Iterator, Sequence
+from tollbit import __version__
+from tollbit.content_formats import Format
+from tollbit.currencies import Currency
+from tollbit.licences import LicenceType
+from tollbit.caching import Cache, MemoryCache, SQLiteCache
+from tollbit.replay import StandInGateway, replay, replay_client, summarize
+from tollbit.sidecar import DEFAULT_PORT, Sidecar
+from tollbit.traffic import read_traffic
+from tollbit.use_content import create_client
+from tollbit.use_content.client import UseContentClient
+from tollbit.use_content.limiter import AdaptiveLimiter
+
+_API_KEY_ENV = "TOLLBIT_ORG_API_KEY"
+_USER_AGENT_ENV = "TOLLBIT_USER_AGENT"
+
+_DEFAULT_CONCURRENCY = 16
+_DEFAULT_PROGRESS_SECONDS = 2.0
+_DEFAULT_SIDECAR_CONCURRENCY = 64
+_DEFAULT_REPLAY_CONCURRENCY = 64
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = _parser().parse_args(argv)
+    if args.command == "replay":
+        return _replay(args)
+
+    api_key = args.api_key or os.getenv(_API_KEY_ENV) or ""
+    user_agent = args.user_agent or os.getenv(_USER_AGENT_ENV)
+    keys = [key.strip() for key in api_key.split(",") if key.strip()]
+    if not keys or not user_agent:
+        print(
+            f"tollbit: an API key and user agent are required; set {_API_KEY_ENV} and "
+            f"{_USER_AGENT_ENV} or pass --api-key and --user-agent",
+            file=sys.stderr,
+        )
+        return 2
+
+    if args.command == "sidecar":
+        return _serve(args, keys, user_agent)
+
+    limiter = None
+    if args.adaptive:
+        limiter = AdaptiveLimiter(
+            initial_limit=min(4, args.concurrency), max_limit=args.concurrency
+        )
+    with (
+        _open_input(args.input) as input_file,
+        _open_output(args.output) as output,
+        create_client(secret_key=keys, user_agent=user_agent) as client,
+    ):
+        urls = _read_urls(input_file)
+        if args.max_rps is not None:
+            urls = _paced(urls, args.max_rps)
+        results = (
+            _rates(client, urls, args.concurrency, limiter)
+            if args.command == "rates"
+            else _fetch(client, urls, args, limiter)
+        )
+        summary = _Summary(args.progress_interval)
+        for row in results:
+            output.write(json.dumps(row) + "\n")
+            summary.record(row)
+        output.flush()
+        summary.report(final=True)
+    return 1 if summary.failed else 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="tollbit", description="Look up rates and buy content through Tollbit in bulk."
+    )
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    auth = argparse.ArgumentParser(add_help=False)
+    auth.add_argument("--api-key", help=f"API key(s), comma-separated; default ${_API_KEY_ENV}")
+    auth.add_argument("--user-agent", help=f"user agent; default ${_USER_AGENT_ENV}")
+    common = argparse.ArgumentParser(add_help=False, parents=[auth])
+    common.add_argument(
+        "input", nargs="?", default="-", help="file of URLs, one per line; - for stdin"
+    )
+    common.add_argument("-o", "--output", default="-", help="JSONL output file; - for stdout")
+    common.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=_DEFAULT_CONCURRENCY,
+        help="most requests in flight at once",
+    )
+    common.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="adapt concurrency to the gateway's latency and errors, up to --concurrency",
+    )
+    common.add_argument(
+        "--max-rps",
+        type=_positive_float,
+        help="most URLs to start on per second; no limit if not given",
+    )
+    common.add_argument(
+        "--progress-interval",
+        type=float,
+        default=_DEFAULT_PROGRESS_SECONDS,
+        help="seconds between progress summaries on stderr; 0 for none",
+    )
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rates", parents=[common], help="look up the rates for each URL")
+    fetch = commands.add_parser("fetch", parents=[common], help="buy the content of each URL")
+    fetch.add_argument(
+        "--max-price-micros", type=int, required=True, help="most to pay for one page"
+    )
+    fetch.add_argument(
+        "--currency", type=Currency, default=Currency.USD, metavar=_choices(Currency)
+    )
+    fetch.add_argument(
+        "--license-type",
+        type=LicenceType,
+        default=LicenceType.ON_DEMAND_LICENSE,
+        metavar=_choices(LicenceType),
+    )
+    fetch.add_argument("--license-id", help="license CUID, for custom licenses")
+    fetch.add_argument("--format", type=Format, default=Format.markdown, metavar=_choices(Format))
+
+    sidecar = commands.add_parser(
+        "sidecar", parents=[auth], help="serve rates and content to local services over HTTP"
+    )
+    sidecar.add_argument("--port", type=int, default=DEFAULT_PORT)
+    sidecar.add_argument(
+        "--addr", default="127.0.0.1", help="address to listen on; callers are not authenticated"
+    )
+    sidecar.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=_DEFAULT_SIDECAR_CONCURRENCY,
+        help="most upstream requests in flight at once",
+    )
+    sidecar.add_argument(
+        "--cache", help="SQLite file to cache rates and tokens in; in memory if not given"
+    )
+
+    replayer = commands.add_parser(
+        "replay", help="replay a traffic journal against a local stand-in gateway"
+    )
+    replayer.add_argument("journal", help="traffic journal recorded by the SDK")
+    replayer.add_argument("-o", "--output", default="-", help="JSONL summary file; - for stdout")
+    replayer.add_argument(
+        "--speed", type=float, default=1.0, help="how many times faster than recorded to replay"
+    )
+    replayer.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=_DEFAULT_REPLAY_CONCURRENCY,
+        help="most requests in flight at once",
+    )
+    replayer.add_argument(
+        "--pool-size", type=_positive_int, help="connections the client keeps open"
+    )
+    return parser
+
+
+def _choices(enum: type[Enum]) -> str:
+    return "{" + ",".join(str(member.value) for member in enum) + "}"
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError("must be positive")
+    return number
+
+
+def _serve(args: argparse.Namespace, keys: list[str], user_agent: str) -> int:
+    cache: Cache = SQLiteCache(args.cache) if args.cache else MemoryCache()
+    with create_client(
+        secret_key=keys, user_agent=user_agent, cache=cache, refresh_tokens=True
+    ) as client:
+        limiter = AdaptiveLimiter(
+            initial_limit=min(4, args.concurrency), max_limit=args.concurrency
+        )
+        with Sidecar(client, port=args.port, addr=args.addr, limiter=limiter) as sidecar:
+            host, port = sidecar.address
+            print(f"tollbit: sidecar listening on http://{host}:{port}", file=sys.stderr)
+            try:
+                sidecar.serve_forever()
+            except KeyboardInterrupt:
+                pass
+    return 0
+
+
+def _replay(args: argparse.Namespace) -> int:
+    if args.speed <= 0:
+        print("tollbit: --speed must be positive", file=sys.stderr)
+        return 2
+    records = list(read_traffic(args.journal))
+    with (
+        StandInGateway(records, speed=args.speed).start() as gateway,
+        replay_client(gateway, pool_maxsize=args.pool_size) as client,
+    ):
+        results = replay(records, client, speed=args.speed, max_workers=args.concurrency)
+    with _open_output(args.output) as output:
+        for endpoint, row in summarize(results).items():
+            output.write(json.dumps({"endpoint": endpoint, **row}) + "\n")
+        output.flush()
+    print(f"tollbit: replayed {len(results)} requests", file=sys.stderr)
+    if gateway.unmatched:
+        print(
+            f"tollbit: {gateway.unmatched} requests matched no recorded response",
+            file=sys.stderr,
+        )
+    return 0
+
+
+def _rates(
+    client: UseContentClient,
+    urls: Iterable[str],
+    concurrency: int,
+    limiter: AdaptiveLimiter | None,
+) -> Iterator[dict[str, Any]]:
+    for url, rates in client.iter_rates(urls, max_in_flight=concurrency, limiter=limiter):
+        if isinstance(rates, Exception):
+            yield _error_row(url, rates)
+        else:
+            yield {"url": url, "rates": [rate.model_dump(mode="json") for rate in rates]}
+
+
+def _fetch(
+    client: UseContentClient,
+    urls: Iterable[str],
+    args: argparse.Namespace,
+    limiter: AdaptiveLimiter | None,
+) -> Iterator[dict[str, Any]]:
+    results = client.iter_sanctioned_content(
+        urls,
+        max_price_micros=args.max_price_micros,
+        currency=args.currency,
+        license_type=args.license_type,
+        license_id=args.license_id,
+        format=args.format,
+        max_in_flight=args.concurrency,
+        limiter=limiter,
+    )
+    for url, result in results:
+        if isinstance(result, Exception):
+            yield _error_row(url, result)
+        else:
+            yield {"url": url, "content": result.model_dump(mode="json", by_alias=True)}
+
+
+def _error_row(url: str, error: Exception) -> dict[str, Any]:
+    return {"url": url, "error": {"type": type(error).__name__, "message": str(error)}}
+
+
+class _Summary:
+    """Counts results and spend, and prints progress to stderr."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.succeeded = 0
+        self.failed = 0
+        self.spend: dict[str, int] = {}
+        self._start = self._last_report = time.monotonic()
+
+    def record(self, row: dict[str, Any]) -> None:
+        if "error" in row:
+            self.failed += 1
+        else:
+            self.succeeded += 1
+        if "content" in row:
+            price = row["content"]["rate"]["price"]
+            currency = price["currency"]
+            self.spend[currency] = self.spend.get(currency, 0) + int(price["priceMicros"])
+        if self.interval > 0 and time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        now = time.monotonic()
+        self._last_report = now
+        done = self.succeeded + self.failed
+        rate = done / max(now - self._start, 1e-9)
+        spend = ", ".join(f"{micros / 1_000_000:.6f} {c}" for c, micros in self.spend.items())
+        print(
+            f"tollbit: {'finished' if final else 'progress'}: {done} URLs "
+            f"({self.succeeded} ok, {self.failed} failed), {rate:.1f}/s"
+            + (f", spent {spend}" if spend else ""),
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+def _read_urls(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        url = line.strip()
+        if url and not url.startswith("#"):
+            yield url
+
+
+def _paced(urls: Iterable[str], per_second: float) -> Iterator[str]:
+    # URLs are read as workers become free, so handing them out no faster than
+    # ``per_second`` caps the rate at which lookups or purchases start
+    interval = 1 / per_second
+    next_at = time.monotonic()
+    for url in urls:
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_at = max(next_at, time.monotonic()) + interval
+        yield url
+
+
+def _open_input(path: str) -> ContextManager[IO[str]]:
+    # Standard streams are left open for the rest of the process
+    return contextlib.nullcontext(sys.stdin) if path == "-" else open(path, encoding="utf-8")
+
+
+def _open_output(path: str) -> ContextManager[IO[str]]:
+    return contextlib.nullcontext(sys.stdout) if path == "-" else open(path, "w", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""A compact index of content that has already been bought.
+
+Syndicated articles are often served under many URLs. A ``DedupIndex`` remembers, for
+everything bought so far, a 64-bit hash of the URL, of the article's main content and of
+its metadata (title, author and published date). A ``UseContentClient`` with an index
+skips buying a URL whose URL, or whose article metadata when known up front, is already
+in the index, raising ``DuplicateContentError`` instead.
+
+Hashes are kept in flat open-addressed tables of 64-bit integers rather than Python
+sets, so tens of millions of entries fit comfortably in memory. Indexes can be saved to
+and loaded from disk.
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import struct
+import sys
+import threading
+from array import array
+from dataclasses import dataclass
+from typing import Any, BinaryIO
+from tollbit._apis.models import DeveloperContentResponseSuccess, LazyContentResult
+
+_FILE_MAGIC = b"TBDEDUP1"
+_INITIAL_CAPACITY = 1024
+# Tables grow once they are two thirds full
+_MAX_LOAD_NUMERATOR = 2
+_MAX_LOAD_DENOMINATOR = 3
+
+
+class DuplicateContentError(RuntimeError):
+    """Raised instead of buying content that is already held."""
+
+    pass
+
+
+@dataclass(frozen=True)
+class ArticleKey:
+    """Metadata that identifies an article regardless of the URL it was served under."""
+
+    title: str
+    author: str | None = None
+    published: str | None = None
+
+
+class DedupIndex:
+    """Remembers which URLs, articles and content bodies have been bought."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._urls = _HashSet()
+        self._articles = _HashSet()
+        self._contents = _HashSet()
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def add(
+        self, content_path: str, result: DeveloperContentResponseSuccess | LazyContentResult
+    ) -> bool:
+        """Record a purchase. Returns True if the article was already in the index."""
+        article = article_key(result)
+        if isinstance(result, LazyContentResult):
+            main: str | bytes = result.main_bytes()
+        else:
+            main = result.content.main
+        with self._lock:
+            seen = self._contents.add(_hash(main))
+            if article is not None:
+                seen = self._articles.add(_article_hash(article)) or seen
+            self._urls.add(_hash(content_path))
+        return seen
+
+    def contains_url(self, content_path: str) -> bool:
+        with self._lock:
+            return _hash(content_path) in self._urls
+
+    def contains_article(self, article: ArticleKey) -> bool:
+        with self._lock:
+            return _article_hash(article) in self._articles
+
+    def contains_content(self, main: str) -> bool:
+        with self._lock:
+            return _hash(main) in self._contents
+
+    def __getstate__(self) -> dict[str, Any]:
+        with self._lock:
+            return {"_urls": self._urls, "_articles": self._articles, "_contents": self._contents}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Write the index to ``path``, replacing it atomically."""
+        tmp_path = f"{os.fspath(path)}.tmp"
+        with self._lock, open(tmp_path, "wb") as f:
+            f.write(_FILE_MAGIC)
+            for table in (self._urls, self._articles, self._contents):
+                table.write(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str]) -> DedupIndex:
+        index = cls()
+        with open(path, "rb") as f:
+            if f.read(len(_FILE_MAGIC)) != _FILE_MAGIC:
+                raise ValueError(f"{os.fspath(path)} is not a dedup index file")
+            index._urls = _HashSet.read(f)
+            index._articles = _HashSet.read(f)
+            index._contents = _HashSet.read(f)
+        return index
+
+
+def article_key(result: DeveloperContentResponseSuccess | LazyContentResult) -> ArticleKey | None:
+    """Return the article key for a result, or None if it has no title."""
+    metadata = result.metadata
+    if not metadata.title:
+        return None
+    return ArticleKey(metadata.title, metadata.author, metadata.published)
+
+
+def _article_hash(article: ArticleKey) -> int:
+    # Normalise case and whitespace, which commonly differ between syndicated copies
+    fields = (article.title, article.author, article.published)
+    parts = (" ".join((field or "").split()).casefold() for field in fields)
+    return _hash("\x1f".join(parts))
+
+
+def _hash(value: str | bytes) -> int:
+    data = value.encode("utf-8") if isinstance(value, str) else value
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    # 0 marks an empty slot in _HashSet
+    return int.from_bytes(digest, "little") or 1
+
+
+class _HashSet:
+    """An open-addressed set of non-zero 64-bit integers stored in a flat array."""
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self._slots = array("Q", bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, value: int) -> bool:
+        slots, mask = self._slots, self._mask
+        i = value & mask
+        while True:
+            slot = slots[i]
+            if slot == value:
+                return True
+            if slot == 0:
+                return False
+            i = (i + 1) & mask
+
+    def add(self, value: int) -> bool:
+        """Add ``value``, returning True if it was already present."""
+        if (self._size + 1) * _MAX_LOAD_DENOMINATOR > len(self._slots) * _MAX_LOAD_NUMERATOR:
+            self._grow()
+        slots, mask = self._slots, self._mask
+        i = value & mask
+        while True:
+            slot = slots[i]
+            if slot == value:
+                return True
+            if slot == 0:
+                slots[i] = value
+                self._size += 1
+                return False
+            i = (i + 1) & mask
+
+    def write(self, f: BinaryIO) -> None:
+        values = array("Q", (v for v in self._slots if v))
+        if sys.byteorder == "big":
+            values.byteswap()
+        f.write(struct.pack("<Q", len(values)))
+        values.tofile(f)
+
+    @classmethod
+    def read(cls, f: BinaryIO) -> _HashSet:
+        (count,) = struct.unpack("<Q", f.read(8))
+        values = array("Q")
+        values.fromfile(f, count)
+        if sys.byteorder == "big":
+            values.byteswap()
+        capacity = _INITIAL_CAPACITY
+        while count * _MAX_LOAD_DENOMINATOR >= capacity * _MAX_LOAD_NUMERATOR:
+            capacity *= 2
+        table = cls(capacity)
+        for value in values:
+            table.add(value)
+        return table
+
+    def _grow(self) -> None:
+        old = self._slots
+        self._slots = array("Q", bytes(16 * len(old)))
+        self._mask = len(self._slots) - 1
+        self._size = 0
+        for value in old:
+            if value:
+                self.add(value)
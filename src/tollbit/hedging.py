@@ -0,0 +1,94 @@
+"""Hedged requests, which trade a little extra load for a shorter latency tail.
+
+With a ``HedgePolicy``, a safe-to-repeat request (a rate lookup, or a content download with
+a token that has already been minted) that has not answered within the ``percentile``
+latency recently seen for its endpoint is sent a second time. Whichever attempt succeeds
+first is used and the other is abandoned. At most ``max_ratio`` of requests are hedged, so
+a gateway that is slow across the board is not sent twice the traffic::
+
+    client = use_content.create_client(..., hedging=HedgePolicy(percentile=95))
+"""
+
+from __future__ import annotations
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+_RECOMPUTE_EVERY = 32
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """When to send a second attempt of a request.
+
+    ``min_samples`` requests to an endpoint are measured before any are hedged, and the
+    percentile is taken over the latest ``window`` of them. ``min_delay`` puts a floor
+    under the hedging delay.
+    """
+
+    percentile: float = 95.0
+    max_ratio: float = 0.05
+    min_samples: int = 50
+    window: int = 512
+    min_delay: float = 0.005
+
+    def __post_init__(self) -> None:
+        if not 0 < self.percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+        if not 0 <= self.max_ratio <= 1:
+            raise ValueError("max_ratio must be between 0 and 1")
+        if self.window < self.min_samples or self.min_samples < 1:
+            raise ValueError("window must be at least min_samples, which must be at least 1")
+
+
+class LatencyTracker:
+    """The recent latency percentile of each endpoint."""
+
+    def __init__(self, policy: HedgePolicy):
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque[float]] = {}
+        self._thresholds: dict[str, float] = {}
+        self._since_recompute: dict[str, int] = {}
+
+    def add(self, endpoint: str, elapsed: float) -> None:
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.policy.window)
+            samples.append(elapsed)
+            count = self._since_recompute.get(endpoint, 0) + 1
+            if len(samples) >= self.policy.min_samples and (
+                count >= _RECOMPUTE_EVERY or endpoint not in self._thresholds
+            ):
+                ordered = sorted(samples)
+                index = min(int(len(ordered) * self.policy.percentile / 100), len(ordered) - 1)
+                self._thresholds[endpoint] = max(ordered[index], self.policy.min_delay)
+                count = 0
+            self._since_recompute[endpoint] = count
+
+    def threshold(self, endpoint: str) -> float | None:
+        """How long to wait before hedging, or None if too few requests were measured."""
+        with self._lock:
+            return self._thresholds.get(endpoint)
+
+
+class HedgeBudget:
+    """Caps hedges at a fraction of requests."""
+
+    def __init__(self, max_ratio: float):
+        self.max_ratio = max_ratio
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+
+    def count_request(self) -> None:
+        with self._lock:
+            self._requests += 1
+
+    def try_hedge(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self._requests * self.max_ratio:
+                return False
+            self._hedges += 1
+            return True
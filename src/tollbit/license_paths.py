@@ -0,0 +1,125 @@
+"""A client-side index of the path prefixes that licenses cover.
+
+A rate's ``licensePath`` is the path prefix on the publisher's site that the license
+applies to. A ``LicensePathIndex`` remembers the rates seen for each domain and prefix, in
+a trie keyed by domain and path segment, so that a ``UseContentClient`` with an index can
+answer ``get_rate`` for any other URL under a known prefix without a request, until the
+rates' ``validUntil``. For a publisher with a site-wide license, the first lookup answers
+every later one.
+
+A page might be covered by a license under a deeper prefix that has not been seen yet. To
+catch this, ``verify_rate`` of the lookups answered locally are also sent to Tollbit; if the
+answers differ, the domain is forgotten and relearned.
+"""
+
+from __future__ import annotations
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlsplit
+from tollbit._apis.models import ContentRate
+
+
+@dataclass
+class _Node:
+    children: dict[str, _Node] = field(default_factory=dict)
+    # Rates whose license path ends at this node
+    rates: list[ContentRate] = field(default_factory=list)
+
+
+class LicensePathIndex:
+    """Rates by domain and license path prefix."""
+
+    def __init__(self, verify_rate: float = 0.01):
+        if not 0 <= verify_rate <= 1:
+            raise ValueError("verify_rate must be between 0 and 1")
+        self.verify_rate = verify_rate
+        self._lock = threading.Lock()
+        self._domains: dict[str, _Node] = {}
+
+    def lookup(self, content_path: str) -> list[ContentRate] | None:
+        """Return the rates for ``content_path``, or None if no known prefix covers it."""
+        domain, segments = _split(content_path)
+        now = time.time()
+        rates: list[ContentRate] = []
+        with self._lock:
+            node = self._domains.get(domain)
+            # Every node on the way down holds rates for a prefix of the path
+            for segment in [*segments, None]:
+                if node is None:
+                    break
+                rates.extend(
+                    rate for rate in node.rates if rate.license.validUntil.timestamp() > now
+                )
+                node = node.children.get(segment) if segment is not None else None
+        return rates or None
+
+    def should_verify(self) -> bool:
+        """Whether a lookup answered locally should also be checked with Tollbit."""
+        return random.random() < self.verify_rate
+
+    def learn(self, content_path: str, rates: list[ContentRate]) -> None:
+        """Index the rates returned for ``content_path``.
+
+        Nothing is indexed unless every rate has a license path that covers
+        ``content_path``, since otherwise the rates cannot be explained by path prefixes.
+        """
+        domain, segments = _split(content_path)
+        covered: list[tuple[list[str], ContentRate]] = []
+        for rate in rates:
+            if rate.error:
+                continue
+            prefix = _license_segments(domain, rate.license.licensePath)
+            if prefix is None or segments[: len(prefix)] != prefix:
+                return
+            covered.append((prefix, rate))
+
+        with self._lock:
+            for prefix, rate in covered:
+                node = self._domains.setdefault(domain, _Node())
+                for segment in prefix:
+                    node = node.children.setdefault(segment, _Node())
+                # Replace an earlier copy of the same license rather than adding to it
+                key = _license_key(rate)
+                node.rates = [existing for existing in node.rates if _license_key(existing) != key]
+                node.rates.append(rate)
+
+    def forget(self, domain: str) -> None:
+        """Drop everything known about ``domain``."""
+        with self._lock:
+            self._domains.pop(domain, None)
+
+    def __getstate__(self) -> dict[str, Any]:
+        with self._lock:
+            return {"verify_rate": self.verify_rate, "_domains": self._domains}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def _license_key(rate: ContentRate) -> tuple[str, str]:
+    # Rates from the subdomain API do not carry the license's CUID, so licenses of one type
+    # and currency under the same path are taken to be the same license
+    return rate.license.licenseType, rate.price.currency
+
+
+def _split(content_path: str) -> tuple[str, list[str]]:
+    domain, _, path = content_path.partition("/")
+    return domain, [segment for segment in path.split("/") if segment]
+
+
+def _license_segments(domain: str, license_path: str) -> list[str] | None:
+    """Return the path segments a license covers, or None if it is not a path on ``domain``."""
+    if "://" in license_path:
+        parts = urlsplit(license_path)
+        # Compare hosts without their ports; IPv6 hosts are in brackets and contain colons
+        if parts.hostname != urlsplit(f"//{domain}").hostname:
+            return None
+        license_path = parts.path
+    if not license_path.startswith("/"):
+        return None
+    license_path = license_path.rstrip("*")
+    return [segment for segment in license_path.split("/") if segment]
@@ -0,0 +1,232 @@
+"""In-process metrics for SDK throughput, latency and spend.
+
+A ``Metrics`` instance is shared by a client and its transport, and records:
+
+- ``tollbit_requests_total{endpoint, status}``: requests sent to the developer API
+- ``tollbit_request_seconds{endpoint}``: a latency histogram for those requests
+- ``tollbit_request_bytes_total`` and ``tollbit_response_bytes_total{endpoint}``
+- ``tollbit_cache_requests_total{kind, result}``: rate and token cache hits and misses
+- ``tollbit_retries_total{operation, reason}``: operations retried after a failure
+- ``tollbit_purchases_total`` and ``tollbit_spend_micros_total{currency, license_type}``
+
+Counters are kept in per-thread shards, so recording a value never takes a lock; shards
+are only merged when a snapshot is taken, and those of exited threads are folded together.
+Use ``UseContentClient.stats`` for a snapshot, ``prometheus_text`` to render one in the
+Prometheus text format, or ``start_prometheus_server`` to serve it over HTTP.
+"""
+
+from __future__ import annotations
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_Labels = tuple[tuple[str, str], ...]
+_Key = tuple[str, _Labels]
+
+# Every live Metrics, so that forked children start counting from zero.
+_registries: weakref.WeakSet[Metrics] = weakref.WeakSet()
+
+
+@dataclass
+class _Shard:
+    counters: dict[_Key, float] = field(default_factory=dict)
+    # Per-bucket counts (the last bucket being +Inf) followed by the sum of observations
+    histograms: dict[_Key, list[float]] = field(default_factory=dict)
+
+
+class Metrics:
+    """Counters and histograms for one client.
+
+    Metrics are per process: a forked child or an unpickled copy starts from zero.
+    """
+
+    buckets: tuple[float, ...]
+    _base: _Shard
+    # The shard of each thread that has recorded something, with the thread
+    _shards: list[tuple[threading.Thread, _Shard]]
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._reset()
+        _registries.add(self)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add ``value`` to a counter."""
+        counters = self._shard().counters
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record an observation in a histogram."""
+        histograms = self._shard().histograms
+        key = (name, tuple(sorted(labels.items())))
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = [0.0] * (len(self.buckets) + 2)
+        histogram[bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the current value of every counter and histogram.
+
+        The result is JSON serialisable::
+
+            {
+                "counters": {name: [{"labels": {...}, "value": 3.0}, ...]},
+                "histograms": {
+                    name: [{"labels": {...}, "buckets": [[0.005, 1], ...], "sum": 0.4, "count": 3}]
+                },
+            }
+
+        Histogram buckets are cumulative, as in Prometheus, ending with ``"+Inf"``.
+        """
+        merged = _Shard()
+        with self._lock:
+            self._fold_dead_shards()
+            _merge(merged, self._base)
+            shards = [shard for _, shard in self._shards]
+        for shard in shards:
+            _merge(merged, shard)
+        counters, histograms = merged.counters, merged.histograms
+
+        result: dict[str, Any] = {"counters": {}, "histograms": {}}
+        for (name, labels), value in sorted(counters.items()):
+            result["counters"].setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), histogram in sorted(histograms.items()):
+            cumulative = 0.0
+            buckets: list[list[Any]] = []
+            for bound, count in zip((*self.buckets, "+Inf"), histogram[:-1]):
+                cumulative += count
+                buckets.append([bound, cumulative])
+            result["histograms"].setdefault(name, []).append(
+                {
+                    "labels": dict(labels),
+                    "buckets": buckets,
+                    "sum": histogram[-1],
+                    "count": cumulative,
+                }
+            )
+        return result
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"buckets": self.buckets}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.buckets = state["buckets"]
+        self._reset()
+        _registries.add(self)
+
+    def _shard(self) -> _Shard:
+        shard: _Shard | None = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._fold_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _fold_dead_shards(self) -> None:
+        # Called with self._lock held. Threads come and go with each worker pool, so the
+        # shards of threads that have exited are merged into one, keeping their counts.
+        live: list[tuple[threading.Thread, _Shard]] = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _merge(self._base, shard)
+        self._shards = live
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Counts from threads that have exited
+        self._base = _Shard()
+        self._shards = []
+
+
+def _merge(into: _Shard, shard: _Shard) -> None:
+    # Copying a dict is atomic with respect to other threads updating it
+    for key, value in dict(shard.counters).items():
+        into.counters[key] = into.counters.get(key, 0) + value
+    for key, histogram in dict(shard.histograms).items():
+        merged = into.histograms.setdefault(key, [0.0] * len(histogram))
+        for i, value in enumerate(list(histogram)):
+            merged[i] += value
+
+
+def prometheus_text(snapshot: dict[str, Any]) -> str:
+    """Render a ``Metrics.snapshot`` in the Prometheus text exposition format."""
+    lines: list[str] = []
+    for name, samples in snapshot["counters"].items():
+        lines.append(f"# TYPE {name} counter")
+        for sample in samples:
+            lines.append(
+                f"{name}{_format_labels(sample['labels'])} {_format_value(sample['value'])}"
+            )
+    for name, samples in snapshot["histograms"].items():
+        lines.append(f"# TYPE {name} histogram")
+        for sample in samples:
+            labels = sample["labels"]
+            for bound, count in sample["buckets"]:
+                le = bound if isinstance(bound, str) else _format_value(bound)
+                bucket_labels = _format_labels({**labels, "le": le})
+                lines.append(f"{name}_bucket{bucket_labels} {_format_value(count)}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(sample['count'])}")
+    return "\n".join(lines) + "\n"
+
+
+def start_prometheus_server(
+    metrics: Metrics, port: int, addr: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """Serve ``metrics`` for Prometheus to scrape from a background thread.
+
+    Returns the server; call its ``shutdown`` method to stop it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = prometheus_text(metrics.snapshot()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(
+        target=server.serve_forever, name="tollbit-prometheus-exporter", daemon=True
+    ).start()
+    return server
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _after_fork_in_child() -> None:
+    for metrics in list(_registries):
+        metrics._reset()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
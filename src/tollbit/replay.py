@@ -0,0 +1,381 @@
+"""Replaying recorded traffic offline, against a local stand-in for the Tollbit gateway.
+
+A ``StandInGateway`` answers each request with the status, payload size and timing recorded
+for it in a traffic journal (see ``tollbit.traffic``), and ``replay`` makes the recorded
+requests through a client at the recorded times. Together they reproduce the production
+mix of URLs, payload sizes, error rates and latencies, so that performance problems and
+changes to the SDK's configuration can be tried out without touching the real gateway::
+
+    records = list(read_traffic("traffic.jsonl"))
+    with StandInGateway(records, speed=2.0).start() as gateway:
+        with replay_client(gateway, pool_maxsize=32) as client:
+            results = replay(records, client, speed=2.0)
+    print(summarize(results))
+
+or from the command line, ``tollbit replay traffic.jsonl --speed 2``.
+
+Responses carry the recorded body when the journal has one, and otherwise a stand-in body
+of the recorded size that the client can parse. Token mints are replayed for the recorded
+page URL. Requests that got no response in the journal have their connection closed by
+the stand-in without one. Every recorded attempt is replayed as a request of its own,
+including retries and hedged requests, so replay with a single gateway and without
+hedging to reproduce the recorded traffic exactly.
+"""
+
+from __future__ import annotations
+import json
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterable, NamedTuple
+from pydantic import BaseModel
+from tollbit._apis.content_api import _GET_CONTENT_PATH, _GET_RATE_PATH, ContentAPI
+from tollbit._apis.models import (
+    CreateCrawlAccessTokenRequest,
+    CreateSubdomainAccessTokenRequest,
+    Format,
+)
+from tollbit._apis.token_api import CREATE_CONTENT_TOKEN_PATH, CREATE_CRAWL_TOKEN_PATH, TokenAPI
+from tollbit._apis.transport import Transport
+from tollbit._environment import Environment
+from tollbit._logging import get_sdk_logger
+from tollbit.hedging import HedgePolicy
+from tollbit.metrics import Metrics
+from tollbit.tokens import TollbitToken
+from tollbit.traffic import TrafficRecord
+from tollbit.use_content.client import UseContentClient
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_DEFAULT_MAX_WORKERS = 64
+_REPLAY_USER_AGENT = "tollbit-replay"
+_REPLAY_TOKEN = "replay"
+_RATE_PREFIX = _GET_RATE_PATH.replace("<PATH>", "")
+_CONTENT_PREFIX = _GET_CONTENT_PATH.replace("<PATH>", "")
+_STAND_IN_URL = "https://example.com/"
+_VALID_UNTIL = "2999-01-01T00:00:00Z"
+
+
+class ReplayResult(NamedTuple):
+    record: TrafficRecord
+    # How long the client took to make the request, in seconds
+    seconds: float
+    # What the client raised, if the request failed
+    error: Exception | None = None
+
+
+class StandInGateway:
+    """A local HTTP server that plays back the responses recorded in a traffic journal.
+
+    Requests are matched to records by method and path, in the order they were recorded.
+    Requests that match no record left get a 404. Delays are divided by ``speed``.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[TrafficRecord],
+        speed: float = 1.0,
+        port: int = 0,
+        addr: str = "127.0.0.1",
+    ):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.speed = speed
+        self.unmatched = 0
+        self._lock = threading.Lock()
+        self._records: dict[tuple[str, str], deque[TrafficRecord]] = {}
+        for record in records:
+            self._records.setdefault((record.method, record.path), deque()).append(record)
+        self._server = ThreadingHTTPServer((addr, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{str(host)}:{int(port)}"
+
+    def start(self) -> StandInGateway:
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="tollbit-stand-in-gateway", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def shutdown(self) -> None:
+        """Stop serving and close the listening socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self) -> StandInGateway:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.shutdown()
+
+    def _next(self, method: str, path: str) -> TrafficRecord | None:
+        with self._lock:
+            queue = self._records.get((method, path))
+            if not queue:
+                self.unmatched += 1
+                return None
+            return queue.popleft()
+
+
+def replay_client(
+    gateway: StandInGateway,
+    pool_maxsize: int | None = None,
+    hedging: HedgePolicy | None = None,
+    metrics: Metrics | None = None,
+) -> UseContentClient:
+    """Create a client whose requests all go to ``gateway``.
+
+    Any client can be used with ``replay``; this one takes the transport settings most
+    worth comparing between replays.
+    """
+    env = Environment(developer_api_base_url=gateway.url)
+    metrics = metrics or Metrics()
+    if pool_maxsize is None:
+        transport = Transport(env, metrics=metrics, hedging=hedging)
+    else:
+        transport = Transport(env, pool_maxsize=pool_maxsize, metrics=metrics, hedging=hedging)
+    return UseContentClient(
+        content_api=ContentAPI(user_agent=_REPLAY_USER_AGENT, env=env, transport=transport),
+        token_api=TokenAPI(
+            api_key=_REPLAY_TOKEN, user_agent=_REPLAY_USER_AGENT, env=env, transport=transport
+        ),
+        metrics=metrics,
+    )
+
+
+def replay(
+    records: Iterable[TrafficRecord],
+    client: UseContentClient,
+    speed: float = 1.0,
+    max_workers: int = _DEFAULT_MAX_WORKERS,
+) -> list[ReplayResult]:
+    """Make each recorded request through ``client`` at its recorded time, divided by ``speed``.
+
+    Requests are started on schedule, with up to ``max_workers`` in flight, and the results
+    are returned in the order the requests were recorded. Failures are returned in each
+    result rather than raised.
+    """
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    ordered = sorted(records, key=lambda record: record.time)
+    if not ordered:
+        return []
+
+    first = ordered[0].time
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures: list[Future[ReplayResult]] = []
+        for record in ordered:
+            delay = start + (record.time - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(_call, client, record))
+        return [future.result() for future in futures]
+
+
+def summarize(results: Iterable[ReplayResult]) -> dict[str, dict[str, Any]]:
+    """Return the number of requests, errors and latency percentiles of a replay, by endpoint."""
+    by_endpoint: dict[str, list[ReplayResult]] = {}
+    for result in results:
+        by_endpoint.setdefault(result.record.endpoint, []).append(result)
+
+    summary: dict[str, dict[str, Any]] = {}
+    for endpoint, endpoint_results in by_endpoint.items():
+        seconds = sorted(result.seconds for result in endpoint_results)
+        recorded = sorted(result.record.total_seconds for result in endpoint_results)
+        summary[endpoint] = {
+            "requests": len(endpoint_results),
+            "errors": sum(result.error is not None for result in endpoint_results),
+            "p50_seconds": _percentile(seconds, 50),
+            "p99_seconds": _percentile(seconds, 99),
+            "recorded_p50_seconds": _percentile(recorded, 50),
+            "recorded_p99_seconds": _percentile(recorded, 99),
+        }
+    return summary
+
+
+def _call(client: UseContentClient, record: TrafficRecord) -> ReplayResult:
+    start = time.perf_counter()
+    try:
+        _request(client, record)
+    except Exception as e:
+        return ReplayResult(record, time.perf_counter() - start, e)
+    return ReplayResult(record, time.perf_counter() - start)
+
+
+def _request(client: UseContentClient, record: TrafficRecord) -> None:
+    if record.endpoint == _GET_RATE_PATH:
+        client.content_api.get_rate(record.path.removeprefix(_RATE_PREFIX))
+    elif record.endpoint == _GET_CONTENT_PATH:
+        client.content_api.get_content(
+            TollbitToken(_REPLAY_TOKEN), record.path.removeprefix(_CONTENT_PREFIX)
+        )
+    elif record.endpoint == CREATE_CONTENT_TOKEN_PATH:
+        client.token_api.get_content_token(_content_token_request(client, record))
+    elif record.endpoint == CREATE_CRAWL_TOKEN_PATH:
+        client.token_api.get_crawl_token(_crawl_token_request(client, record))
+    else:
+        raise ValueError(f"Requests to {record.endpoint} cannot be replayed")
+
+
+def _content_token_request(
+    client: UseContentClient, record: TrafficRecord
+) -> CreateSubdomainAccessTokenRequest:
+    if record.request_body:
+        return CreateSubdomainAccessTokenRequest.model_validate_json(record.request_body)
+
+    def request(url: str) -> CreateSubdomainAccessTokenRequest:
+        return CreateSubdomainAccessTokenRequest(
+            url=url,  # type: ignore
+            userAgent=client.token_api.user_agent,
+            maxPriceMicros=0,
+            currency="USD",
+            licenseType="ON_DEMAND_LICENSE",
+            licenseCuid="",
+            format=Format.markdown,
+        )
+
+    if record.page_url is not None:
+        return request(record.page_url)
+    return request(_padded_url(request(_STAND_IN_URL), record))
+
+
+def _crawl_token_request(
+    client: UseContentClient, record: TrafficRecord
+) -> CreateCrawlAccessTokenRequest:
+    if record.request_body:
+        return CreateCrawlAccessTokenRequest.model_validate_json(record.request_body)
+
+    def request(url: str) -> CreateCrawlAccessTokenRequest:
+        return CreateCrawlAccessTokenRequest(
+            url=url,  # type: ignore
+            userAgent=client.token_api.user_agent,
+        )
+
+    if record.page_url is not None:
+        return request(record.page_url)
+    return request(_padded_url(request(_STAND_IN_URL), record))
+
+
+def _padded_url(req: BaseModel, record: TrafficRecord) -> str:
+    # A stand-in page URL long enough for the request to be the recorded size, for journals
+    # that did not record the page URL
+    padding = max(record.request_bytes - len(json.dumps(req.model_dump(mode="json"))), 0)
+    return f"{_STAND_IN_URL}{'x' * padding}"
+
+
+def _stand_in_body(endpoint: str, status: int, size: int) -> bytes:
+    def body(padding: str) -> bytes:
+        data: Any
+        if status != 200:
+            data = {"error": padding}
+        elif endpoint == _GET_RATE_PATH:
+            data = [
+                {
+                    "price": {"priceMicros": 0, "currency": "USD"},
+                    "license": {
+                        "licenseType": "ON_DEMAND_LICENSE",
+                        "licensePath": f"/{padding}",
+                        "permissions": [],
+                        "validUntil": _VALID_UNTIL,
+                    },
+                    "error": "",
+                }
+            ]
+        elif endpoint == _GET_CONTENT_PATH:
+            data = [
+                {
+                    "content": {"header": "", "main": padding, "footer": ""},
+                    "metadata": {
+                        "title": None,
+                        "description": None,
+                        "imageUrl": None,
+                        "author": None,
+                        "published": None,
+                        "modified": None,
+                    },
+                    "rate": {
+                        "price": {"priceMicros": 0, "currency": "USD"},
+                        "license": {
+                            "cuid": "",
+                            "licenseType": "ON_DEMAND_LICENSE",
+                            "licensePath": "/",
+                            "permissions": [],
+                            "validUntil": _VALID_UNTIL,
+                        },
+                        "error": "",
+                    },
+                }
+            ]
+        else:
+            data = {"token": padding}
+        return json.dumps(data).encode("utf-8")
+
+    return body("x" * max(size - len(body("")), 0))
+
+
+def _percentile(values: list[float], percentile: int) -> float | None:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+def _handler(gateway: StandInGateway) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            self._respond("GET")
+
+        def do_POST(self) -> None:
+            self._respond("POST")
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _respond(self, method: str) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            record = gateway._next(method, self.path)
+            if record is None:
+                self._send(404, b'{"error": "No recorded response"}', 0.0)
+                return
+
+            time.sleep(record.headers_seconds / gateway.speed)
+            if not isinstance(record.status, int):
+                # The recorded request got no response
+                self.close_connection = True
+                return
+            if record.response_body is not None:
+                body = record.response_body.encode("utf-8")
+            else:
+                body = _stand_in_body(record.endpoint, record.status, record.response_bytes)
+            download = max(record.total_seconds - record.headers_seconds, 0.0)
+            self._send(record.status, body, download / gateway.speed)
+
+        def _send(self, status: int, body: bytes, delay: float) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if delay > 0:
+                time.sleep(delay)
+            self.wfile.write(body)
+
+    return Handler
@@ -0,0 +1,189 @@
+"""Cheap change detection for re-crawling content that has already been bought.
+
+A ``Revalidator`` keeps, for every URL bought, the ``modified`` value from the content's
+metadata along with the ``ETag`` and ``Last-Modified`` validators served by the
+publisher's page. Before buying a URL again, ``UseContentClient.refresh_sanctioned_content``
+sends a conditional ``HEAD`` request to the publisher's page and only mints a token and
+downloads the content when the page has changed since it was last bought.
+
+Records can be persisted to an append-only JSON lines file so that they survive restarts.
+"""
+
+from __future__ import annotations
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any
+import requests
+from tollbit._apis.models import DeveloperContentResponseSuccess, LazyContentResult
+from tollbit._logging import get_sdk_logger
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_DEFAULT_TIMEOUT_SECONDS = 5.0
+
+
+@dataclass(frozen=True)
+class Validators:
+    """What was known about a URL's content when it was last bought or checked."""
+
+    modified: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class Revalidator:
+    """Tracks validators per URL and checks publisher pages for changes.
+
+    ``path``, if given, is an append-only JSON lines file that records are loaded from
+    and written to. Call ``compact`` to rewrite it with only the latest record per URL.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str] | None = None,
+        timeout: float = _DEFAULT_TIMEOUT_SECONDS,
+    ):
+        self.path = os.fspath(path) if path is not None else None
+        self.timeout = timeout
+        self._reset()
+
+    def get(self, content_path: str) -> Validators | None:
+        with self._lock:
+            return self._records.get(content_path)
+
+    def record(self, content_path: str, validators: Validators) -> None:
+        with self._lock:
+            if self._records.get(content_path) == validators:
+                return
+            self._records[content_path] = validators
+            if self.path is not None:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": content_path, **asdict(validators)}) + "\n")
+
+    def record_purchase(
+        self,
+        content_path: str,
+        result: DeveloperContentResponseSuccess | LazyContentResult,
+        validators: Validators | None = None,
+    ) -> None:
+        """Record the content just bought, with the page validators seen by ``check``."""
+        validators = validators or self.get(content_path) or Validators()
+        self.record(content_path, replace(validators, modified=result.metadata.modified))
+
+    def check(self, url: str, content_path: str, user_agent: str) -> tuple[bool, Validators]:
+        """Check whether the page at ``url`` is unchanged since it was last recorded.
+
+        Returns whether it is unchanged, and the validators the page is now serving. A
+        page is treated as changed when no ``ETag`` or ``Last-Modified`` it served has been
+        recorded, or it cannot be checked, so that the caller falls back to buying the
+        content. The new validators of a changed page are not recorded until
+        ``record_purchase`` is called, so a failed purchase is retried on the next check.
+        """
+        validators = self.get(content_path) or Validators()
+
+        # Only validators the page served are sent. Without any, the page is still fetched
+        # for the validators it serves now, but is treated as changed.
+        headers = {"User-Agent": user_agent}
+        if validators.etag:
+            headers["If-None-Match"] = validators.etag
+        if validators.last_modified:
+            headers["If-Modified-Since"] = validators.last_modified
+        conditional = len(headers) > 1
+
+        try:
+            response = self._get_session().head(
+                url, headers=headers, allow_redirects=True, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            logger.warning(f"Unable to check {url} for changes: {e}")
+            return False, validators
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 304:
+            unchanged = conditional
+        elif 200 <= response.status_code < 300:
+            # The content's metadata date is the publisher's own and may not follow the
+            # page's Last-Modified, so only validators served by the page are compared
+            unchanged = (etag is not None and etag == validators.etag) or _not_after(
+                last_modified, validators.last_modified
+            )
+        else:
+            unchanged = False
+
+        if unchanged:
+            validators = replace(
+                validators,
+                etag=etag or validators.etag,
+                last_modified=last_modified or validators.last_modified,
+            )
+            self.record(content_path, validators)
+            return True, validators
+        return False, replace(validators, etag=etag, last_modified=last_modified)
+
+    def compact(self) -> None:
+        """Rewrite the records file with only the latest record for each URL."""
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for key, validators in self._records.items():
+                    f.write(json.dumps({"key": key, **asdict(validators)}) + "\n")
+            os.replace(tmp_path, self.path)
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"path": self.path, "timeout": self.timeout}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._records: dict[str, Validators] = {}
+        self._session: requests.Session | None = None
+        self._pid: int | None = None
+        if self.path is not None and os.path.exists(self.path):
+            self._load(self.path)
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None or self._pid != os.getpid():
+            self._session = requests.Session()
+            self._pid = os.getpid()
+        return self._session
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    key = row.pop("key")
+                    self._records[key] = Validators(**row)
+                except (ValueError, KeyError, TypeError):
+                    # A torn final line from a crash mid-write
+                    logger.warning("Skipping unreadable revalidation record", extra={"path": path})
+
+
+def _parse_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _not_after(last_modified: str | None, recorded: str | None) -> bool:
+    page = _parse_datetime(last_modified)
+    bought = _parse_datetime(recorded)
+    return page is not None and bought is not None and page <= bought
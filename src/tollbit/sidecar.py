@@ -0,0 +1,357 @@
+"""A local HTTP server that shares one client between every service on a host.
+
+Services written in other languages, or simply run as separate processes, can ask a sidecar
+for rates and content instead of each keeping their own connections, tokens and caches. The
+sidecar makes every upstream request through a single ``UseContentClient``, so the host has
+one pool of gateway connections and one cache, identical requests that arrive together are
+made once, content bought recently is served again instead of being bought twice, and the
+number of upstream requests in flight is capped by an ``AdaptiveLimiter``::
+
+    client = use_content.create_client(..., cache=caching.MemoryCache(), refresh_tokens=True)
+    with Sidecar(client, port=8742) as sidecar:
+        sidecar.serve_forever()
+
+or from the command line, ``tollbit sidecar --port 8742``.
+
+Endpoints, all returning JSON unless noted:
+
+- ``GET /v1/rate?url=...`` returns ``{"url": ..., "rates": [...]}``
+- ``POST /v1/content`` with a JSON body of ``url``, ``max_price_micros``, ``currency``,
+  ``license_type``, and optionally ``license_id`` and ``format``, returns
+  ``{"url": ..., "content": {...}}``
+- ``GET /healthz`` returns ``ok`` as plain text
+- ``GET /metrics`` returns the client's metrics in the Prometheus text format
+
+Errors are returned as ``{"error": {"type": ..., "message": ...}}`` with status 400 for bad
+requests, 409 for content already bought according to the client's dedup index, 429 when
+Tollbit is throttling requests and 502 for other upstream failures.
+
+The sidecar does not authenticate its callers, so it only listens on the loopback
+interface unless given another ``addr``.
+"""
+
+from __future__ import annotations
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Hashable, TypeVar
+from urllib.parse import parse_qs, urlsplit
+from pydantic import ValidationError
+from tollbit._apis.errors import BadRequestError, RateLimitedError
+from tollbit._logging import get_sdk_logger
+from tollbit.content_formats import Format
+from tollbit.currencies import Currency
+from tollbit.dedup import DuplicateContentError
+from tollbit.licences import LicenceType
+from tollbit.metrics import prometheus_text
+from tollbit.urls import content_target
+from tollbit.use_content.client import UseContentClient
+from tollbit.use_content.limiter import AdaptiveLimiter
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+DEFAULT_PORT = 8742
+_DEFAULT_MAX_IN_FLIGHT = 64
+_DEFAULT_CONTENT_TTL_SECONDS = 300.0
+_DEFAULT_MAX_RECENT_CONTENT = 1024
+_MAX_BODY_BYTES = 64 * 1024
+
+R = TypeVar("R")
+
+
+class Sidecar:
+    """Serves rates and content to local clients through one shared ``UseContentClient``.
+
+    Content bought through the sidecar is kept for ``content_ttl`` seconds, up to
+    ``max_recent_content`` results, and returned to later requests for the same URL and
+    terms without buying it again. Pass ``port=0`` to listen on any free port, and read
+    it back from ``address``.
+    """
+
+    def __init__(
+        self,
+        client: UseContentClient,
+        port: int = DEFAULT_PORT,
+        addr: str = "127.0.0.1",
+        limiter: AdaptiveLimiter | None = None,
+        content_ttl: float = _DEFAULT_CONTENT_TTL_SECONDS,
+        max_recent_content: int = _DEFAULT_MAX_RECENT_CONTENT,
+    ):
+        self.client = client
+        self.limiter = limiter or AdaptiveLimiter(max_limit=_DEFAULT_MAX_IN_FLIGHT)
+        self.content_ttl = content_ttl
+        self.max_recent_content = max_recent_content
+        self._coalescer = _Coalescer()
+        self._recent_lock = threading.Lock()
+        self._recent: OrderedDict[Hashable, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._server = ThreadingHTTPServer((addr, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+        self._serving = False
+
+    @property
+    def address(self) -> tuple[str, int]:
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    def start(self) -> Sidecar:
+        """Serve requests from a background thread."""
+        self._serving = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="tollbit-sidecar", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests from the calling thread until ``shutdown`` is called."""
+        host, port = self.address
+        logger.info(f"Tollbit sidecar listening on http://{host}:{port}")
+        self._serving = True
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop serving and close the listening socket. The client is left open."""
+        if self._serving:
+            self._server.shutdown()
+            self._serving = False
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> Sidecar:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.shutdown()
+
+    def rate(self, url: str) -> dict[str, Any]:
+        """Answer a ``/v1/rate`` request."""
+        content_path = _content_path(url)
+        rates = self._upstream("rate", content_path, lambda: self.client.get_rate(url))
+        return {"url": url, "rates": [rate.model_dump(mode="json") for rate in rates]}
+
+    def content(self, body: dict[str, Any]) -> dict[str, Any]:
+        """Answer a ``/v1/content`` request with the JSON ``body`` given."""
+        url = _required(body, "url", str)
+        max_price_micros = _required(body, "max_price_micros", int)
+        license_id = body.get("license_id")
+        if license_id is not None and not isinstance(license_id, str):
+            raise BadRequestError("license_id must be a string")
+        try:
+            currency = Currency(body.get("currency", Currency.USD.value))
+            license_type = LicenceType(_required(body, "license_type", str))
+            format = Format(body.get("format", Format.markdown.value))
+        except ValueError as e:
+            raise BadRequestError(str(e)) from e
+
+        key = (
+            _content_path(url),
+            max_price_micros,
+            currency,
+            license_type,
+            license_id,
+            format,
+        )
+        recent = self._recent_content(key)
+        if recent is not None:
+            self.client.metrics.inc("tollbit_sidecar_recent_content_total", result="hit")
+            return {"url": url, "content": recent}
+        self.client.metrics.inc("tollbit_sidecar_recent_content_total", result="miss")
+
+        def buy() -> dict[str, Any]:
+            result = self.client.get_sanctioned_content(
+                url, max_price_micros, currency, license_type, license_id, format
+            )
+            content = result.model_dump(mode="json", by_alias=True)
+            self._remember_content(key, content)
+            return content
+
+        return {"url": url, "content": self._upstream("content", key, buy)}
+
+    def _upstream(self, kind: str, key: Hashable, fn: Callable[[], R]) -> R:
+        # Identical requests in flight are made once, and all are subject to the limiter
+        result, coalesced = self._coalescer.run((kind, key), lambda: self.limiter.run(fn))
+        if coalesced:
+            self.client.metrics.inc("tollbit_sidecar_coalesced_total", kind=kind)
+        return result
+
+    def _recent_content(self, key: Hashable) -> dict[str, Any] | None:
+        with self._recent_lock:
+            entry = self._recent.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._recent[key]
+                return None
+            self._recent.move_to_end(key)
+            return entry[1]
+
+    def _remember_content(self, key: Hashable, content: dict[str, Any]) -> None:
+        if self.max_recent_content <= 0 or self.content_ttl <= 0:
+            return
+        with self._recent_lock:
+            self._recent[key] = (time.monotonic() + self.content_ttl, content)
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_recent_content:
+                self._recent.popitem(last=False)
+
+
+class _Coalescer:
+    """Runs one call at a time for each key, sharing its outcome with concurrent callers."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future[Any]] = {}
+
+    def run(self, key: Hashable, fn: Callable[[], R]) -> tuple[R, bool]:
+        """Return ``fn()`` and whether it was shared from a call already in flight."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            result: R = future.result()
+            return result, True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def _handler(sidecar: Sidecar) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            parts = urlsplit(self.path)
+            if parts.path == "/healthz":
+                self._send(200, b"ok", "text/plain; charset=utf-8")
+            elif parts.path == "/metrics":
+                body = prometheus_text(sidecar.client.metrics.snapshot()).encode("utf-8")
+                self._send(200, body, "text/plain; version=0.0.4; charset=utf-8")
+            elif parts.path == "/v1/rate":
+                urls = parse_qs(parts.query).get("url")
+                self._call("rate", lambda: sidecar.rate(urls[0]) if urls else _missing("url"))
+            else:
+                self._send_error(404, "NotFound", f"No such endpoint: {parts.path}")
+
+        def do_POST(self) -> None:
+            if urlsplit(self.path).path != "/v1/content":
+                self._discard_body()
+                self._send_error(404, "NotFound", f"No such endpoint: {self.path}")
+                return
+            self._call("content", lambda: sidecar.content(self._read_json()))
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _call(self, endpoint: str, fn: Callable[[], dict[str, Any]]) -> None:
+            try:
+                result = fn()
+            except Exception as e:
+                status = _status(e)
+                if status >= 500:
+                    logger.warning(f"Sidecar {endpoint} request failed: {e}")
+                self._send_error(status, type(e).__name__, str(e))
+            else:
+                status = 200
+                self._send(200, json.dumps(result).encode("utf-8"), "application/json")
+            sidecar.client.metrics.inc(
+                "tollbit_sidecar_requests_total", endpoint=endpoint, status=str(status)
+            )
+
+        def _read_json(self) -> dict[str, Any]:
+            length = self._content_length()
+            if length > _MAX_BODY_BYTES:
+                self.close_connection = True
+                raise BadRequestError("Request body is too large")
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                raise BadRequestError(f"Request body is not JSON: {e}") from e
+            if not isinstance(body, dict):
+                raise BadRequestError("Request body must be a JSON object")
+            return body
+
+        def _content_length(self) -> int:
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                # The end of the body is unknown, so the connection cannot be reused
+                self.close_connection = True
+                raise BadRequestError("Content-Length must be a non-negative integer")
+            return length
+
+        def _discard_body(self) -> None:
+            # Reading the body keeps the connection usable for the caller's next request
+            try:
+                length = self._content_length()
+            except BadRequestError:
+                return
+            if length > _MAX_BODY_BYTES:
+                self.close_connection = True
+            else:
+                self.rfile.read(length)
+
+        def _send_error(self, status: int, error_type: str, message: str) -> None:
+            body = json.dumps({"error": {"type": error_type, "message": message}})
+            self._send(status, body.encode("utf-8"), "application/json")
+
+        def _send(self, status: int, body: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def _status(error: Exception) -> int:
+    if isinstance(error, (BadRequestError, ValidationError)):
+        return 400
+    if isinstance(error, DuplicateContentError):
+        return 409
+    if isinstance(error, RateLimitedError):
+        return 429
+    return 502
+
+
+def _required(body: dict[str, Any], name: str, kind: type[R]) -> R:
+    value = body.get(name)
+    # bool is an int, but never a valid price
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise BadRequestError(f"{name} must be given as a {kind.__name__}")
+    return value
+
+
+def _content_path(url: str) -> str:
+    try:
+        return content_target(url).content_path
+    except ValueError as e:
+        raise BadRequestError(f"Invalid URL {url!r}: {e}") from e
+
+
+def _missing(name: str) -> dict[str, Any]:
+    raise BadRequestError(f"The {name} query parameter is required")
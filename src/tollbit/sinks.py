@@ -0,0 +1,258 @@
+"""Sinks that write purchased content to files in large batches.
+
+Results are buffered and written ``batch_size`` rows at a time, and a new file is started
+whenever the current one reaches ``max_file_bytes``. Every row has the columns in
+``COLUMNS``.
+
+A sink can be fed directly with ``write``, or placed after one of the client's streaming
+APIs with ``consume``, which writes the successful results and passes every result on::
+
+    with sinks.JSONLSink("out/") as sink:
+        for url, result in sink.consume(client.iter_sanctioned_content(urls, ...)):
+            ...
+"""
+
+from __future__ import annotations
+import abc
+import gzip
+import io
+import json
+import os
+from typing import Any, Iterable, Iterator
+from tollbit._apis.models import DeveloperContentResponseSuccess
+from tollbit._logging import get_sdk_logger
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+COLUMNS = (
+    "url",
+    "title",
+    "description",
+    "image_url",
+    "author",
+    "published",
+    "modified",
+    "price_micros",
+    "currency",
+    "license_cuid",
+    "license_type",
+    "license_path",
+    "header",
+    "main",
+    "footer",
+)
+
+_DEFAULT_BATCH_SIZE = 1000
+_DEFAULT_MAX_FILE_BYTES = 256 * 1024 * 1024
+
+Result = tuple[str, DeveloperContentResponseSuccess | Exception]
+
+
+class _Sink(abc.ABC):
+    """Buffers rows and hands them to ``_write_batch``, rotating files by size."""
+
+    extension: str
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        prefix: str = "content",
+        batch_size: int = _DEFAULT_BATCH_SIZE,
+        max_file_bytes: int = _DEFAULT_MAX_FILE_BYTES,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.directory = os.fspath(directory)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.max_file_bytes = max_file_bytes
+        self.files: list[str] = []
+        self._rows: list[dict[str, Any]] = []
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, url: str, result: DeveloperContentResponseSuccess) -> None:
+        self._rows.append(_row(url, result))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def consume(self, results: Iterable[Result]) -> Iterator[Result]:
+        """Write every successful result, passing all results through unchanged."""
+        for url, result in results:
+            if isinstance(result, DeveloperContentResponseSuccess):
+                self.write(url, result)
+            yield url, result
+
+    def flush(self) -> None:
+        """Write any buffered rows."""
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        if not self._is_open():
+            self._open(self._next_path())
+        self._write_batch(rows)
+        if self._size() >= self.max_file_bytes:
+            self._close_file()
+
+    def close(self) -> None:
+        """Write any buffered rows and close the current file."""
+        self.flush()
+        if self._is_open():
+            self._close_file()
+
+    def __enter__(self) -> _Sink:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _next_path(self) -> str:
+        path = os.path.join(self.directory, f"{self.prefix}-{len(self.files):05d}{self.extension}")
+        self.files.append(path)
+        logger.debug("Opening sink file", extra={"path": path})
+        return path
+
+    @abc.abstractmethod
+    def _is_open(self) -> bool: ...
+
+    @abc.abstractmethod
+    def _open(self, path: str) -> None: ...
+
+    @abc.abstractmethod
+    def _write_batch(self, rows: list[dict[str, Any]]) -> None: ...
+
+    @abc.abstractmethod
+    def _size(self) -> int: ...
+
+    @abc.abstractmethod
+    def _close_file(self) -> None: ...
+
+
+class JSONLSink(_Sink):
+    """Writes one JSON object per line, gzip compressed unless ``compress`` is False.
+
+    File sizes are measured after compression, so files may run slightly over
+    ``max_file_bytes`` while the compressor's buffer is flushed.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        prefix: str = "content",
+        batch_size: int = _DEFAULT_BATCH_SIZE,
+        max_file_bytes: int = _DEFAULT_MAX_FILE_BYTES,
+        compress: bool = True,
+        compresslevel: int = 6,
+    ):
+        self.compress = compress
+        self.compresslevel = compresslevel
+        self.extension = ".jsonl.gz" if compress else ".jsonl"
+        self._raw: io.BufferedWriter | None = None
+        self._out: io.BufferedIOBase | None = None
+        super().__init__(directory, prefix, batch_size, max_file_bytes)
+
+    def _is_open(self) -> bool:
+        return self._out is not None
+
+    def _open(self, path: str) -> None:
+        self._raw = open(path, "wb")
+        if self.compress:
+            self._out = gzip.GzipFile(
+                fileobj=self._raw, mode="wb", compresslevel=self.compresslevel
+            )
+        else:
+            self._out = self._raw
+
+    def _write_batch(self, rows: list[dict[str, Any]]) -> None:
+        assert self._out is not None
+        lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+        lines.append("")
+        self._out.write("\n".join(lines).encode("utf-8"))
+
+    def _size(self) -> int:
+        assert self._raw is not None
+        return self._raw.tell()
+
+    def _close_file(self) -> None:
+        assert self._raw is not None and self._out is not None
+        if self._out is not self._raw:
+            self._out.close()
+        self._raw.close()
+        self._raw = self._out = None
+
+
+class ParquetSink(_Sink):
+    """Writes columnar Parquet files, one row group per batch. Requires ``pyarrow``."""
+
+    extension = ".parquet"
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        prefix: str = "content",
+        batch_size: int = _DEFAULT_BATCH_SIZE,
+        max_file_bytes: int = _DEFAULT_MAX_FILE_BYTES,
+        compression: str = "zstd",
+    ):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("ParquetSink requires pyarrow: pip install pyarrow") from e
+
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.compression = compression
+        self._schema = pyarrow.schema(
+            [
+                (column, pyarrow.int64() if column == "price_micros" else pyarrow.string())
+                for column in COLUMNS
+            ]
+        )
+        self._path: str | None = None
+        self._writer: Any = None
+        super().__init__(directory, prefix, batch_size, max_file_bytes)
+
+    def _is_open(self) -> bool:
+        return self._writer is not None
+
+    def _open(self, path: str) -> None:
+        self._path = path
+        self._writer = self._pq.ParquetWriter(path, self._schema, compression=self.compression)
+
+    def _write_batch(self, rows: list[dict[str, Any]]) -> None:
+        columns = {column: [row[column] for row in rows] for column in COLUMNS}
+        self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+
+    def _size(self) -> int:
+        assert self._path is not None
+        return os.path.getsize(self._path)
+
+    def _close_file(self) -> None:
+        self._writer.close()
+        self._writer = None
+        self._path = None
+
+
+def _row(url: str, result: DeveloperContentResponseSuccess) -> dict[str, Any]:
+    metadata = result.metadata
+    price = result.rate.price
+    license = result.rate.license
+    content = result.content
+    return {
+        "url": url,
+        "title": metadata.title,
+        "description": metadata.description,
+        "image_url": metadata.image_url,
+        "author": metadata.author,
+        "published": metadata.published,
+        "modified": metadata.modified,
+        "price_micros": price.price_micros,
+        "currency": price.currency,
+        "license_cuid": license.cuid,
+        "license_type": license.license_type,
+        "license_path": license.license_path,
+        "header": content.header,
+        "main": content.main,
+        "footer": content.footer,
+    }
@@ -0,0 +1,166 @@
+"""Binary snapshots of known rates, for starting new workers warm.
+
+A worker that starts with an empty cache has to look up every publisher's rates again
+before it can plan purchases. ``export_rate_snapshot`` writes the rates held in a cache to a
+compact file, and a client given a ``RateSnapshot`` of that file answers ``get_rate`` from
+it until the rates expire::
+
+    snapshots.export_rate_snapshot(cache, "/shared/rates.snap")
+
+    # In each new worker
+    client = use_content.create_client(..., rate_snapshot=RateSnapshot("/shared/rates.snap"))
+
+The file is memory-mapped and searched in place, so opening it costs the same however many
+rates it holds, and a rate is only parsed when it is looked up. Entries whose rates have
+expired are never returned.
+
+Layout, little-endian: a 12-byte header of magic and version plus the entry count, then one
+fixed-size index record per entry sorted by content path, then the keys and values. Each
+value is the rates' JSON as returned by the developer API.
+"""
+
+from __future__ import annotations
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Any, Iterable
+from tollbit.caching import Cache
+from tollbit._logging import get_sdk_logger
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_MAGIC = b"TBRS"
+_VERSION = 1
+# Magic, version and entry count
+_HEADER = struct.Struct("<4sHxxI")
+# Key offset, key length, value offset, value length and expiry of one entry
+_RECORD = struct.Struct("<QIQId")
+
+# Prefix of the cache keys that hold rates; see UseContentClient._get_rate
+_RATE_KEY_PREFIX = "rate:"
+
+
+class SnapshotFormatError(ValueError):
+    """Raised when a file is not a rate snapshot this version of the SDK can read."""
+
+
+def export_rate_snapshot(cache: Cache, path: str | os.PathLike[str]) -> int:
+    """Write the unexpired rates in ``cache`` to a snapshot at ``path``.
+
+    Returns the number of entries written. The file is replaced atomically, so workers
+    opening it meanwhile see either the old snapshot or the new one.
+    """
+    entries = (
+        (key[len(_RATE_KEY_PREFIX) :], value, expires_at)
+        for key, value, expires_at in cache.items(_RATE_KEY_PREFIX)
+    )
+    return write_rate_snapshot(path, entries)
+
+
+def write_rate_snapshot(
+    path: str | os.PathLike[str], entries: Iterable[tuple[str, str, float]]
+) -> int:
+    """Write ``(content_path, rates_json, expires_at)`` entries to a snapshot at ``path``."""
+    encoded = sorted(
+        (content.encode(), value.encode(), expires_at) for content, value, expires_at in entries
+    )
+
+    offset = _HEADER.size + _RECORD.size * len(encoded)
+    records = bytearray()
+    for key, value, expires_at in encoded:
+        records += _RECORD.pack(offset, len(key), offset + len(key), len(value), expires_at)
+        offset += len(key) + len(value)
+
+    directory = os.path.dirname(os.fspath(path)) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".rates-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(encoded)))
+            f.write(records)
+            for key, value, _ in encoded:
+                f.write(key)
+                f.write(value)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    logger.debug(f"Wrote {len(encoded)} rates to {os.fspath(path)}")
+    return len(encoded)
+
+
+class RateSnapshot:
+    """A memory-mapped rate snapshot written by ``export_rate_snapshot``.
+
+    Pickling a snapshot copies its path, and the receiving process maps the file again.
+    """
+
+    path: str
+    _map: mmap.mmap
+    _count: int
+
+    def __init__(self, path: str | os.PathLike[str]):
+        self.path = os.fspath(path)
+        self._open()
+
+    def get(self, content_path: str) -> str | None:
+        """Return the rates' JSON for ``content_path``, or None if missing or expired."""
+        key = content_path.encode()
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            key_offset, key_length, value_offset, value_length, expires_at = self._record(middle)
+            probe = self._map[key_offset : key_offset + key_length]
+            if probe < key:
+                low = middle + 1
+            elif probe > key:
+                high = middle
+            elif expires_at <= time.time():
+                return None
+            else:
+                return self._map[value_offset : value_offset + value_length].decode()
+        return None
+
+    def __len__(self) -> int:
+        """The number of entries that have not expired."""
+        now = time.time()
+        return sum(1 for i in range(self._count) if self._record(i)[4] > now)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> RateSnapshot:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._open()
+
+    def _record(self, index: int) -> tuple[int, int, int, int, float]:
+        record: tuple[int, int, int, int, float] = _RECORD.unpack_from(
+            self._map, _HEADER.size + index * _RECORD.size
+        )
+        return record
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                raise SnapshotFormatError(f"{self.path} is empty") from e
+        if len(self._map) < _HEADER.size:
+            self._map.close()
+            raise SnapshotFormatError(f"{self.path} is not a rate snapshot")
+        magic, version, count = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC or version != _VERSION:
+            self._map.close()
+            raise SnapshotFormatError(f"{self.path} is not a version {_VERSION} rate snapshot")
+        self._count = count
@@ -1,3 +1,23 @@
+import base64
+import binascii
+import json
 from typing import TypeAlias, NewType
 
 TollbitToken = NewType("TollbitToken", str)
+
+
+def token_expiry(token: str) -> float | None:
+    """Return the ``exp`` claim of a token as a unix timestamp, if it has one.
+
+    The signature is not checked; this is only used to decide when to refresh or evict
+    a token.
+    """
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4))
+        exp = json.loads(payload).get("exp")
+    except (binascii.Error, ValueError, AttributeError):
+        return None
+    return float(exp) if isinstance(exp, (int, float)) else None
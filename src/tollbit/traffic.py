@@ -0,0 +1,266 @@
+"""Recording the traffic between the SDK and the Tollbit gateway.
+
+A ``TrafficJournal`` given to ``create_client`` (or to a ``Transport``) appends one line of
+JSON to a file for every request attempt the client makes, including retries against
+other gateways and hedged requests::
+
+    with TrafficJournal("traffic.jsonl") as journal:
+        client = use_content.create_client(..., journal=journal)
+        ...
+
+Each record holds the request's method, endpoint and path, the response status (or
+``"error"`` with the exception type if no response was received), the request and response
+payload sizes in bytes, and its timings in seconds: ``headers``, until the response headers
+arrived, and ``total``, until the body had been read. Token mints also record the page URL
+the token was minted for, so that they can be replayed for the same page. Request headers,
+which carry API keys and tokens, are never recorded. Bodies are only recorded with
+``record_bodies``, after being passed through ``redact``, which by default replaces the
+value of every ``token`` field.
+
+Journals can be read back with ``read_traffic`` and replayed offline against a stand-in
+gateway; see ``tollbit.replay``.
+"""
+
+from __future__ import annotations
+import json
+import os
+import threading
+import weakref
+from typing import Any, Callable, Iterator, NamedTuple
+import requests
+from tollbit._logging import get_sdk_logger
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_REDACTED = "REDACTED"
+
+# Every open journal, so that forked children can drop a lock held by the parent.
+_journals: weakref.WeakSet[TrafficJournal] = weakref.WeakSet()
+
+Redactor = Callable[[bytes], bytes]
+
+
+class TrafficRecord(NamedTuple):
+    # When the request was sent, in seconds since the epoch
+    time: float
+    method: str
+    endpoint: str
+    path: str
+    # The response status code, or "error" if no response was received
+    status: int | str
+    request_bytes: int
+    response_bytes: int
+    headers_seconds: float
+    total_seconds: float
+    # The exception type, for requests that got no response
+    error: str | None = None
+    request_body: str | None = None
+    response_body: str | None = None
+    # The page URL that a token was minted for
+    page_url: str | None = None
+
+
+def redact_fields(*names: str) -> Redactor:
+    """Return a redactor that replaces the values of the named fields in JSON bodies.
+
+    Fields are replaced at any depth. Bodies that are not JSON are left as they are.
+    """
+    return _FieldRedactor(frozenset(names))
+
+
+class _FieldRedactor:
+    # A class rather than a closure, so that journals using it can be pickled
+
+    def __init__(self, fields: frozenset[str]):
+        self.fields = fields
+
+    def __call__(self, body: bytes) -> bytes:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return body
+        return json.dumps(_redacted(data, self.fields), separators=(",", ":")).encode("utf-8")
+
+
+class TrafficJournal:
+    """Appends a compact record of each request attempt to a file of JSON lines.
+
+    Records are written as they happen, one ``write`` per record, so several threads, or
+    processes sharing the journal file, never interleave their records. Pickled copies
+    append to the same file.
+    """
+
+    path: str
+    record_bodies: bool
+    redact: Redactor | None
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        record_bodies: bool = False,
+        redact: Redactor | None = redact_fields("token"),
+    ):
+        self.path = os.fspath(path)
+        self.record_bodies = record_bodies
+        self.redact = redact
+        self._open()
+
+    def record_response(
+        self,
+        method: str,
+        endpoint: str,
+        path: str,
+        response: requests.Response,
+        start: float,
+        elapsed: float,
+    ) -> None:
+        """Record a request that got a response after ``elapsed`` seconds.
+
+        ``start`` is when it was sent, in seconds since the epoch.
+        """
+        # Stand-in responses, such as those used in tests, may not carry a body, request
+        # or timings
+        request_body = _as_bytes(getattr(getattr(response, "request", None), "body", None))
+        content = getattr(response, "content", None)
+        response_body = content if isinstance(content, bytes) else b""
+        headers_elapsed = getattr(response, "elapsed", None)
+        headers_seconds = elapsed
+        if headers_elapsed is not None and hasattr(headers_elapsed, "total_seconds"):
+            headers_seconds = min(headers_elapsed.total_seconds(), elapsed)
+        record: dict[str, Any] = {
+            "time": start,
+            "method": method,
+            "endpoint": endpoint,
+            "path": path,
+            "status": response.status_code,
+            "request_bytes": len(request_body),
+            "response_bytes": len(response_body),
+            "headers_seconds": round(headers_seconds, 6),
+            "total_seconds": round(elapsed, 6),
+        }
+        page_url = _page_url(request_body)
+        if page_url is not None:
+            record["page_url"] = page_url
+        if self.record_bodies:
+            record["request_body"] = self._body(request_body)
+            record["response_body"] = self._body(response_body)
+        self._write(record)
+
+    def record_failure(
+        self,
+        method: str,
+        endpoint: str,
+        path: str,
+        error: BaseException,
+        start: float,
+        elapsed: float,
+    ) -> None:
+        """Record a request that failed without a response after ``elapsed`` seconds."""
+        record: dict[str, Any] = {
+            "time": start,
+            "method": method,
+            "endpoint": endpoint,
+            "path": path,
+            "status": "error",
+            "request_bytes": 0,
+            "response_bytes": 0,
+            "headers_seconds": round(elapsed, 6),
+            "total_seconds": round(elapsed, 6),
+            "error": type(error).__name__,
+        }
+        page_url = _page_url(_as_bytes(getattr(getattr(error, "request", None), "body", None)))
+        if page_url is not None:
+            record["page_url"] = page_url
+        self._write(record)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self) -> TrafficJournal:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"path": self.path, "record_bodies": self.record_bodies, "redact": self.redact}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._open()
+
+    def _open(self) -> None:
+        self._lock = threading.Lock()
+        # Unbuffered, so that each record reaches the file in a single write
+        self._file = open(self.path, "ab", buffering=0)
+        _journals.add(self)
+
+    def _body(self, body: bytes) -> str:
+        if body and self.redact is not None:
+            body = self.redact(body)
+        return body.decode("utf-8", "replace")
+
+    def _write(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._file.write(line)
+            except OSError as e:
+                logger.warning(f"Unable to write to traffic journal {self.path}: {e}")
+
+
+def read_traffic(path: str | os.PathLike[str]) -> Iterator[TrafficRecord]:
+    """Yield the records of a traffic journal in the order they were written.
+
+    Lines that cannot be read, such as one cut short by a crash, are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+                yield TrafficRecord(**record)
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Skipping unreadable line {number} of traffic journal: {e}")
+
+
+def _redacted(data: Any, fields: frozenset[str]) -> Any:
+    if isinstance(data, dict):
+        return {
+            key: _REDACTED if key in fields else _redacted(value, fields)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [_redacted(value, fields) for value in data]
+    return data
+
+
+def _page_url(request_body: bytes) -> str | None:
+    # Token requests name the page in their JSON body's "url" field
+    if not request_body.startswith(b"{"):
+        return None
+    try:
+        url = json.loads(request_body).get("url")
+    except ValueError:
+        return None
+    return url if isinstance(url, str) else None
+
+
+def _as_bytes(body: bytes | str | None) -> bytes:
+    if body is None:
+        return b""
+    return body.encode("utf-8") if isinstance(body, str) else body
+
+
+def _after_fork_in_child() -> None:
+    # The lock may have been held by another thread of the parent
+    for journal in list(_journals):
+        journal._lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,99 @@
+"""Canonical forms of content URLs.
+
+Every part of the SDK that builds a request, cache key, dedup key or batch group from a URL
+goes through ``content_target``, so URLs that address the same content map to the same key.
+Canonicalisation:
+
+- assumes ``https`` for URLs without an http(s) scheme and lowercases the scheme and host
+- encodes internationalised hosts with IDNA and drops a trailing dot from the host
+- drops default ports, user info and fragments
+- decodes percent-escapes of unreserved characters, uppercases the remaining escapes and
+  encodes characters that are not allowed in a path
+- resolves ``.`` and ``..`` path segments and drops trailing slashes
+
+Query strings are dropped as well: Tollbit addresses content by host and path, and rates
+and tokens apply to every query string of a page.
+
+Results are memoised, so repeated URLs cost a dictionary lookup.
+"""
+
+from __future__ import annotations
+import functools
+import re
+from typing import NamedTuple
+from urllib.parse import quote, urlsplit
+
+_CACHE_SIZE = 65536
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_SCHEME = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://")
+_ESCAPE = re.compile(r"%([0-9A-Fa-f]{2})")
+_UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+# Characters left as they are in a path, besides unreserved ones and escapes
+_PATH_SAFE = "/%:@!$&'()*+,;="
+
+
+class ContentTarget(NamedTuple):
+    """Where a URL's content is bought and fetched."""
+
+    # The canonical URL of the page, used when minting tokens
+    page_url: str
+    # Host, port if not the default, and path; used to address the content on the gateway
+    content_path: str
+    # The host alone, used to group requests by publisher
+    domain: str
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def content_target(url: str) -> ContentTarget:
+    """Return the canonical page URL, content path and domain of ``url``."""
+    url = url.strip()
+    if not _SCHEME.match(url):
+        url = f"https://{url.lstrip('/')}"
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS:
+        scheme = "https"
+
+    domain = _host(parts.hostname or "")
+    netloc = f"[{domain}]" if ":" in domain else domain
+    port = parts.port
+    if port is not None and port != _DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    path = _path(parts.path)
+    return ContentTarget(f"{scheme}://{netloc}{path}", f"{netloc}{path}", domain)
+
+
+def canonicalize(url: str) -> str:
+    """Return the canonical form of ``url``."""
+    return content_target(url).page_url
+
+
+def _host(host: str) -> str:
+    host = host.rstrip(".").lower()
+    if host.isascii():
+        return host
+    try:
+        return host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return host
+
+
+def _path(path: str) -> str:
+    path = _ESCAPE.sub(_normalize_escape, path)
+    path = quote(path, safe=_PATH_SAFE)
+
+    segments: list[str] = []
+    for segment in path.split("/")[1:]:
+        if segment == "..":
+            if segments:
+                segments.pop()
+        elif segment != ".":
+            segments.append(segment)
+    while segments and segments[-1] == "":
+        segments.pop()
+    return "".join(f"/{segment}" for segment in segments)
+
+
+def _normalize_escape(match: re.Match[str]) -> str:
+    char = chr(int(match.group(1), 16))
+    return char if char in _UNRESERVED else f"%{match.group(1).upper()}"
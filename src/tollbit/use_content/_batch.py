@@ -0,0 +1,148 @@
+from __future__ import annotations
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import zip_longest
+from typing import Protocol, TypeVar
+import asyncio
+import threading
+
+K = TypeVar("K")
+R = TypeVar("R")
+R_co = TypeVar("R_co", covariant=True)
+
+
+def fan_out(
+    groups: dict[str, list[K]],
+    fn: Callable[[K], R],
+    max_workers: int,
+    max_per_group: int,
+) -> dict[K, R | Exception]:
+    """Run ``fn`` over every key in ``groups`` using a shared thread pool.
+
+    Each group (usually a publisher domain) is drained by at most ``max_per_group``
+    workers at a time, so a single large group cannot take every slot in the pool.
+    Exceptions raised by ``fn`` are captured and returned in place of a result.
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1")
+    if max_per_group < 1:
+        raise ValueError("max_per_group must be at least 1")
+
+    results: dict[K, R | Exception] = {}
+    lock = threading.Lock()
+
+    def drain(queue: deque[K]) -> None:
+        while True:
+            try:
+                key = queue.popleft()
+            except IndexError:
+                return
+            try:
+                result: R | Exception = fn(key)
+            except Exception as e:
+                result = e
+            with lock:
+                results[key] = result
+
+    # One drainer per slot, interleaved across groups so that every group gets
+    # started before any group gets its second worker.
+    drainers: list[list[deque[K]]] = []
+    for keys in groups.values():
+        queue = deque(keys)
+        drainers.append([queue] * min(max_per_group, len(keys)))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [
+            pool.submit(drain, queue)
+            for round_ in zip_longest(*drainers)
+            for queue in round_
+            if queue is not None
+        ]
+        for future in futures:
+            future.result()
+
+    return results
+
+
+def iter_as_completed(
+    items: Iterable[K],
+    fn: Callable[[K], R],
+    max_in_flight: int,
+) -> Iterator[tuple[K, R | Exception]]:
+    """Yield ``(item, fn(item))`` for every item, in the order the calls finish.
+
+    Items are pulled from ``items`` lazily and at most ``max_in_flight`` calls run at
+    once, so memory use does not grow with the number of items. Exceptions raised by
+    ``fn`` are yielded in place of a result.
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+
+    pool = ThreadPoolExecutor(max_workers=max_in_flight)
+    in_flight: dict[Future[R], K] = {}
+    try:
+        for item in items:
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            else:
+                # Calls that finished while waiting for ``items`` are yielded straight away
+                done = {f for f in in_flight if f.done()}
+            yield from ((in_flight.pop(f), _outcome(f)) for f in done)
+            in_flight[pool.submit(fn, item)] = item
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from ((in_flight.pop(f), _outcome(f)) for f in done)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+async def aiter_as_completed(
+    items: Iterable[K] | AsyncIterable[K],
+    fn: Callable[[K], R],
+    max_in_flight: int,
+) -> AsyncIterator[tuple[K, R | Exception]]:
+    """Async version of ``iter_as_completed``; ``fn`` is run in worker threads."""
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+
+    in_flight: dict[asyncio.Future[R], K] = {}
+    try:
+        async for item in _aiter(items):
+            if len(in_flight) >= max_in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for f in done:
+                    yield in_flight.pop(f), _outcome(f)
+            in_flight[asyncio.ensure_future(asyncio.to_thread(fn, item))] = item
+        while in_flight:
+            done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for f in done:
+                yield in_flight.pop(f), _outcome(f)
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+class _Done(Protocol[R_co]):
+    def result(self) -> R_co: ...
+
+    def exception(self) -> BaseException | None: ...
+
+
+def _outcome(future: _Done[R]) -> R | Exception:
+    """Return the result or exception of a finished future; anything else is re-raised."""
+    exc = future.exception()
+    if exc is None:
+        return future.result()
+    if isinstance(exc, Exception):
+        return exc
+    raise exc
+
+
+async def _aiter(items: Iterable[K] | AsyncIterable[K]) -> AsyncIterator[K]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -1,52 +1,297 @@
 from __future__ import annotations
+import functools
+import hashlib
+import time
 from .types import ContentRate
-from tollbit.tokens import TollbitToken
-from typing import Any
+from tollbit.tokens import TollbitToken, token_expiry
+from tollbit.caching import Cache, Computed
+from tollbit.dedup import ArticleKey, DedupIndex, DuplicateContentError
+from tollbit.hedging import HedgePolicy
+from tollbit.license_paths import LicensePathIndex
+from tollbit.metrics import Metrics
+from tollbit.revalidation import Revalidator
+from tollbit.snapshots import RateSnapshot
+from tollbit.traffic import TrafficJournal
+from tollbit.urls import content_target
+from typing import (
+    Any,
+    AsyncIterable,
+    Callable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    Sequence,
+    TYPE_CHECKING,
+    TypeVar,
+)
 from tollbit._apis.content_api import ContentAPI
 from tollbit._apis.token_api import TokenAPI
-from urllib.parse import urlparse
-from tollbit._apis.models import CreateSubdomainAccessTokenRequest
+from tollbit._apis.key_pool import KeyPool
+from tollbit._apis.transport import Transport
+from tollbit._apis.token_refresher import TokenProvider, TokenRefresher
+from tollbit._apis.models import (
+    CreateSubdomainAccessTokenRequest,
+    DeveloperContentResponseSuccess,
+    LazyContentResult,
+)
 from tollbit.content_formats import Format
 from tollbit.currencies import Currency
 from tollbit.licences import LicenceType
-from pydantic import AnyUrl
+from pydantic import AnyUrl, TypeAdapter
 from tollbit._environment import env_from_vars
+from tollbit._logging import get_sdk_logger
+from ._batch import K, R, aiter_as_completed, fan_out, iter_as_completed
+from .limiter import AdaptiveLimiter
+from .rate_table import RateTable
+
+if TYPE_CHECKING:
+    from .prefetch import Prefetcher
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+# How long to cache lookups whose responses do not say when they expire
+_DEFAULT_RATE_CACHE_SECONDS = 60.0
+_DEFAULT_TOKEN_CACHE_SECONDS = 60.0
+# Cached tokens are evicted this long before they actually expire
+_TOKEN_EXPIRY_MARGIN_SECONDS = 5.0
+
+_DEFAULT_PREWARM_CONNECTIONS = 4
+
+_CONTENT_RATES = TypeAdapter(list[ContentRate])
+
+# A content result, decoded up front or lazily
+C = TypeVar("C", DeveloperContentResponseSuccess, LazyContentResult)
 
 
 def create_client(
-    secret_key: str,
+    secret_key: str | Sequence[str],
     user_agent: str,
+    refresh_tokens: bool = False,
+    cache: Cache | None = None,
+    dedup_index: DedupIndex | None = None,
+    revalidator: Revalidator | None = None,
+    metrics: Metrics | None = None,
+    prewarm: bool = False,
+    prewarm_connections: int = _DEFAULT_PREWARM_CONNECTIONS,
+    hedging: HedgePolicy | None = None,
+    license_index: LicensePathIndex | None = None,
+    rate_snapshot: RateSnapshot | None = None,
+    journal: TrafficJournal | None = None,
 ) -> UseContentClient:
+    """Create a client for the Tollbit content APIs.
+
+    ``secret_key`` may be several API keys, in which case token minting is spread across
+    them and keys that are throttled or failing are rested; see ``KeyPool``.
+
+    With ``refresh_tokens`` set, minted tokens are reused and replaced in the background
+    shortly before they expire. Close the client to stop the background refresher.
+
+    Rates and tokens are stored in ``cache`` when one is given, e.g. a
+    ``tollbit.caching.SQLiteCache`` shared by every process on the host. Cached tokens
+    are keyed by a hash of the API keys, so clients using other keys never share them.
+
+    With a ``dedup_index``, content that is already held is not bought again; see
+    ``tollbit.dedup``.
+
+    With a ``revalidator``, ``refresh_sanctioned_content`` only buys content again when
+    the publisher's page has changed; see ``tollbit.revalidation``.
+
+    Requests, cache hits and spend are counted in ``metrics``, which can be shared by
+    several clients; see ``UseContentClient.stats`` and ``tollbit.metrics``.
+
+    With ``prewarm`` set, ``prewarm_connections`` connections to the developer API are
+    opened before the client is returned; see ``UseContentClient.warmup``.
+
+    With a ``hedging`` policy, slow rate lookups and content downloads are sent a second
+    time to cut tail latency; see ``tollbit.hedging``.
+
+    With a ``license_index``, rates for pages under a license path that has already been
+    seen are answered without a request; see ``tollbit.license_paths``.
+
+    With a ``rate_snapshot``, rates exported by another client are used until they expire;
+    see ``tollbit.snapshots``. Closing the client closes the snapshot.
+
+    With a ``journal``, every request to the gateway is recorded for offline replay; see
+    ``tollbit.traffic`` and ``tollbit.replay``.
+    """
     env = env_from_vars()
+    metrics = metrics or Metrics()
+    transport = Transport(env, metrics=metrics, hedging=hedging, journal=journal)
 
-    return UseContentClient(
+    secret_keys = [secret_key] if isinstance(secret_key, str) else list(secret_key)
+    token_apis = [
+        TokenAPI(api_key=key, user_agent=user_agent, env=env, transport=transport)
+        for key in secret_keys
+    ]
+    token_api: TokenProvider = (
+        token_apis[0] if len(token_apis) == 1 else KeyPool(token_apis, metrics=metrics)
+    )
+    if refresh_tokens:
+        token_api = TokenRefresher(token_api, metrics=metrics)
+
+    client = UseContentClient(
         content_api=ContentAPI(
             user_agent=user_agent,
             env=env,
+            transport=transport,
         ),
-        token_api=TokenAPI(
-            api_key=secret_key,
-            user_agent=user_agent,
-            env=env,
-        ),
+        token_api=token_api,
+        cache=cache,
+        dedup_index=dedup_index,
+        revalidator=revalidator,
+        metrics=metrics,
+        license_index=license_index,
+        rate_snapshot=rate_snapshot,
     )
+    if prewarm:
+        client.warmup(prewarm_connections)
+    return client
 
 
 class UseContentClient:
+    """Client for pricing and buying content through Tollbit.
+
+    Clients can be pickled and sent to other processes. Only configuration is copied;
+    connections, tokens and other runtime state are rebuilt in the receiving process, and
+    likewise in a child forked from a process that is using the client.
+    """
+
     content_api: ContentAPI
-    token_api: TokenAPI
+    token_api: TokenProvider
+    cache: Cache | None
+    dedup_index: DedupIndex | None
+    revalidator: Revalidator | None
+    metrics: Metrics
+    license_index: LicensePathIndex | None
+    rate_snapshot: RateSnapshot | None
+    # Attached by a Prefetcher for as long as it is open; see tollbit.use_content.prefetch
+    prefetcher: Prefetcher | None
 
     def __init__(
         self,
         content_api: ContentAPI,
-        token_api: TokenAPI,
+        token_api: TokenProvider,
+        cache: Cache | None = None,
+        dedup_index: DedupIndex | None = None,
+        revalidator: Revalidator | None = None,
+        metrics: Metrics | None = None,
+        license_index: LicensePathIndex | None = None,
+        rate_snapshot: RateSnapshot | None = None,
     ):
         self.content_api = content_api
         self.token_api = token_api
+        self.cache = cache
+        self.dedup_index = dedup_index
+        self.revalidator = revalidator
+        if metrics is None:
+            # Count in the same place as the transport, so that stats cover its requests
+            transport = getattr(content_api, "_transport", None)
+            metrics = transport.metrics if isinstance(transport, Transport) else Metrics()
+        self.metrics = metrics
+        self.license_index = license_index
+        self.rate_snapshot = rate_snapshot
+        self.prefetcher = None
+
+    def __getstate__(self) -> dict[str, Any]:
+        # A prefetcher's threads and tokens stay with the process that started it
+        return {**self.__dict__, "prefetcher": None}
+
+    def __enter__(self) -> UseContentClient:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop any background work and release resources held by the client."""
+        self.token_api.close()
+        self.content_api.close()
+        if self.rate_snapshot is not None:
+            self.rate_snapshot.close()
+
+    def stats(self) -> dict[str, Any]:
+        """Return a snapshot of this client's request, cache and spend counters.
+
+        Render it with ``tollbit.metrics.prometheus_text`` to expose it to Prometheus.
+        """
+        return self.metrics.snapshot()
+
+    def warmup(self, connections: int = _DEFAULT_PREWARM_CONNECTIONS) -> int:
+        """Open pooled connections to the developer API ahead of the first request.
+
+        Each connection is fully established, so the first requests made afterwards do
+        not wait on DNS, TCP or TLS. Clients made by ``create_client`` share these
+        connections between content and token requests. Returns the number of
+        connections opened; failures are logged rather than raised.
+        """
+        return self.content_api.warmup(connections)
 
     def get_rate(self, url: str) -> list[ContentRate]:
-        parsed_url = urlparse(url)
-        return self.content_api.get_rate(f"{parsed_url.netloc}{parsed_url.path}")
+        return self._get_rate(content_target(url).content_path)
+
+    def get_rates(
+        self,
+        urls: Iterable[str],
+        max_workers: int = 16,
+        max_per_domain: int = 4,
+        limiter: AdaptiveLimiter | None = None,
+    ) -> dict[str, list[ContentRate] | Exception]:
+        """Look up the rates for many URLs in parallel.
+
+        URLs with the same canonical form are only looked up once; see ``tollbit.urls``.
+        Lookups are grouped by publisher domain and at most ``max_per_domain`` run against
+        a single domain at a time. With a ``limiter``, the number of lookups in flight
+        adapts to how the gateway is coping, up to ``max_workers``. Failures, including URLs
+        that cannot be parsed, are returned in place of the rates for that URL rather than
+        raised.
+        """
+        paths: dict[str, str | ValueError] = {}
+        seen: set[str] = set()
+        by_domain: dict[str, list[str]] = {}
+        for url in urls:
+            try:
+                target = content_target(url)
+            except ValueError as e:
+                paths[url] = e
+                continue
+            path = target.content_path
+            paths[url] = path
+            if path not in seen:
+                seen.add(path)
+                by_domain.setdefault(target.domain, []).append(path)
+
+        results = fan_out(by_domain, _limited(self._get_rate, limiter), max_workers, max_per_domain)
+        return {
+            url: path if isinstance(path, ValueError) else results[path]
+            for url, path in paths.items()
+        }
+
+    def iter_rates(
+        self,
+        urls: Iterable[str],
+        max_in_flight: int = 16,
+        limiter: AdaptiveLimiter | None = None,
+    ) -> Iterator[tuple[str, list[ContentRate] | Exception]]:
+        """Look up the rates for each URL, yielding ``(url, rates)`` as each one finishes.
+
+        Like ``iter_sanctioned_content``, URLs are read lazily, at most ``max_in_flight``
+        lookups run at once, and failures are yielded in place of the rates.
+        """
+        return iter_as_completed(urls, _limited(self.get_rate, limiter), max_in_flight)
+
+    def get_rate_table(
+        self,
+        urls: Iterable[str],
+        max_workers: int = 16,
+        max_per_domain: int = 4,
+        limiter: AdaptiveLimiter | None = None,
+    ) -> RateTable:
+        """Look up the rates for many URLs like ``get_rates``, as a columnar ``RateTable``.
+
+        URLs whose lookup failed are left out; see ``tollbit.use_content.rate_table``.
+        """
+        return RateTable.from_rates(self.get_rates(urls, max_workers, max_per_domain, limiter))
 
     def get_sanctioned_content(
         self,
@@ -56,13 +301,316 @@ class UseContentClient:
         license_type: LicenceType,
         license_id: str | None = None,
         format: Format = Format.markdown,
-    ) -> Any:
-        parsed_url = urlparse(url)
-        if parsed_url.scheme not in ("http", "https"):
-            parsed_url = parsed_url._replace(scheme="https")
+        article: ArticleKey | None = None,
+    ) -> DeveloperContentResponseSuccess:
+        """Buy and fetch the content at ``url``.
 
-        req = CreateSubdomainAccessTokenRequest(
-            url=f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}",  # type: ignore
+        If the client has a dedup index, ``DuplicateContentError`` is raised without
+        buying anything when the URL has already been bought, or when ``article`` (if the
+        caller knows the article's metadata ahead of time) matches one already held.
+        """
+        return self._purchase(
+            self.content_api.get_content,
+            url,
+            max_price_micros,
+            currency,
+            license_type,
+            license_id,
+            format,
+            article,
+        )
+
+    def get_sanctioned_content_lazy(
+        self,
+        url: str,
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+        article: ArticleKey | None = None,
+    ) -> LazyContentResult:
+        """Buy and fetch the content at ``url`` like ``get_sanctioned_content``.
+
+        The result keeps the raw response and only decodes its metadata, rate and page
+        sections when they are first read, so callers that only need some of them do not
+        pay to parse the rest. ``main_bytes`` returns the page body as UTF-8 bytes.
+        """
+        return self._purchase(
+            self.content_api.get_content_lazy,
+            url,
+            max_price_micros,
+            currency,
+            license_type,
+            license_id,
+            format,
+            article,
+        )
+
+    def _purchase(
+        self,
+        fetch: Callable[..., list[C]],
+        url: str,
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+        article: ArticleKey | None = None,
+        on_token: Callable[[], None] | None = None,
+    ) -> C:
+        # get_sanctioned_content, fetching with fetch and calling on_token once a token has
+        # been minted
+        page_url, content_path, _ = content_target(url)
+
+        if self.dedup_index is not None:
+            if self.dedup_index.contains_url(content_path):
+                raise DuplicateContentError(f"Content at {url} has already been bought")
+            if article is not None and self.dedup_index.contains_article(article):
+                raise DuplicateContentError(f"Article at {url} is already held")
+
+        result = self._buy(
+            fetch,
+            page_url,
+            content_path,
+            max_price_micros,
+            currency,
+            license_type,
+            license_id,
+            format,
+            on_token,
+        )
+        if self.revalidator is not None:
+            self.revalidator.record_purchase(content_path, result)
+        return result
+
+    def refresh_sanctioned_content(
+        self,
+        url: str,
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+    ) -> DeveloperContentResponseSuccess | None:
+        """Buy the content at ``url`` again, but only if it has changed.
+
+        The client's revalidator first checks the publisher's page with a conditional
+        request. If the page is unchanged since the content was last bought, None is
+        returned without minting a token or downloading anything.
+        """
+        if self.revalidator is None:
+            raise ValueError("refresh_sanctioned_content requires a client with a revalidator")
+
+        page_url, content_path, _ = content_target(url)
+        unchanged, validators = self.revalidator.check(
+            page_url, content_path, self.token_api.user_agent
+        )
+        if unchanged:
+            return None
+
+        result = self._buy(
+            self.content_api.get_content,
+            page_url,
+            content_path,
+            max_price_micros,
+            currency,
+            license_type,
+            license_id,
+            format,
+        )
+        self.revalidator.record_purchase(content_path, result, validators)
+        return result
+
+    def iter_sanctioned_content(
+        self,
+        urls: Iterable[str],
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+        max_in_flight: int = 16,
+        limiter: AdaptiveLimiter | None = None,
+    ) -> Iterator[tuple[str, DeveloperContentResponseSuccess | Exception]]:
+        """Fetch content for each URL, yielding ``(url, result)`` as each one finishes.
+
+        URLs are read from ``urls`` lazily, so it can be a generator or a file of any
+        size, and at most ``max_in_flight`` fetches run at once, or fewer as set by
+        ``limiter``; see ``tollbit.use_content.limiter``. Failures are yielded in place
+        of the result for that URL rather than raised.
+        """
+        fetch = functools.partial(
+            self.get_sanctioned_content,
+            max_price_micros=max_price_micros,
+            currency=currency,
+            license_type=license_type,
+            license_id=license_id,
+            format=format,
+        )
+        return iter_as_completed(urls, _limited(fetch, limiter), max_in_flight)
+
+    def aiter_sanctioned_content(
+        self,
+        urls: Iterable[str] | AsyncIterable[str],
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+        max_in_flight: int = 16,
+        limiter: AdaptiveLimiter | None = None,
+    ) -> AsyncIterator[tuple[str, DeveloperContentResponseSuccess | Exception]]:
+        """Async version of ``iter_sanctioned_content``.
+
+        ``urls`` may also be an async iterable. Fetches run in worker threads so the event
+        loop is never blocked.
+        """
+        fetch = functools.partial(
+            self.get_sanctioned_content,
+            max_price_micros=max_price_micros,
+            currency=currency,
+            license_type=license_type,
+            license_id=license_id,
+            format=format,
+        )
+        return aiter_as_completed(urls, _limited(fetch, limiter), max_in_flight)
+
+    def _get_rate(self, content: str) -> list[ContentRate]:
+        if self.prefetcher is not None:
+            prefetched = self.prefetcher.take_rates(content)
+            if prefetched is not None:
+                return prefetched
+        return self._indexed_rate(content)
+
+    def _indexed_rate(self, content: str) -> list[ContentRate]:
+        index = self.license_index
+        if index is None:
+            return self._lookup_rate(content)
+
+        known = index.lookup(content)
+        if known is not None and not index.should_verify():
+            self.metrics.inc("tollbit_license_index_requests_total", result="hit")
+            return known
+
+        rates = self._lookup_rate(content)
+        if known is None:
+            self.metrics.inc("tollbit_license_index_requests_total", result="miss")
+        elif _rate_keys(known) == _rate_keys(rates):
+            self.metrics.inc("tollbit_license_index_requests_total", result="verified")
+        else:
+            logger.warning(f"Indexed rates for {content} are out of date, relearning its domain")
+            self.metrics.inc("tollbit_license_index_requests_total", result="mismatch")
+            index.forget(content.partition("/")[0])
+        index.learn(content, rates)
+        return rates
+
+    def _lookup_rate(self, content: str) -> list[ContentRate]:
+        if self.rate_snapshot is not None:
+            snapshot = self.rate_snapshot.get(content)
+            self.metrics.inc(
+                "tollbit_cache_requests_total",
+                kind="rate_snapshot",
+                result="miss" if snapshot is None else "hit",
+            )
+            if snapshot is not None:
+                return _CONTENT_RATES.validate_json(snapshot)
+        if self.cache is None:
+            return self.content_api.get_rate(content)
+        value = self._cached("rate", f"rate:{content}", lambda: self._fetch_rate(content))
+        return _CONTENT_RATES.validate_json(value)
+
+    def _fetch_rate(self, content: str) -> Computed:
+        rates = self.content_api.get_rate(content)
+        if rates:
+            expires_at = min(rate.license.validUntil.timestamp() for rate in rates)
+        else:
+            expires_at = time.time() + _DEFAULT_RATE_CACHE_SECONDS
+        return _CONTENT_RATES.dump_json(rates).decode(), expires_at
+
+    def _get_content_token(
+        self, req: CreateSubdomainAccessTokenRequest, content_path: str
+    ) -> TollbitToken:
+        if self.prefetcher is not None:
+            prefetched = self.prefetcher.take_token(content_path, req)
+            if prefetched is not None:
+                return TollbitToken(prefetched)
+        if self.cache is None:
+            return TollbitToken(self.token_api.get_content_token(req).token)
+        # Tokens are only shared between clients using the same API keys
+        key = f"token:content:{_key_fingerprint(self.token_api)}:{req.model_dump_json()}"
+        return TollbitToken(self._cached("token", key, lambda: self._mint_content_token(req)))
+
+    def _mint_content_token(self, req: CreateSubdomainAccessTokenRequest) -> Computed:
+        token = self.token_api.get_content_token(req).token
+        exp = token_expiry(token)
+        if exp is not None:
+            expires_at = exp - _TOKEN_EXPIRY_MARGIN_SECONDS
+        else:
+            expires_at = time.time() + _DEFAULT_TOKEN_CACHE_SECONDS
+        return token, expires_at
+
+    def _cached(self, kind: str, key: str, compute: Callable[[], Computed]) -> str:
+        assert self.cache is not None
+        computed = False
+
+        def counted() -> Computed:
+            nonlocal computed
+            computed = True
+            return compute()
+
+        value = self.cache.get_or_compute(key, counted)
+        self.metrics.inc(
+            "tollbit_cache_requests_total", kind=kind, result="miss" if computed else "hit"
+        )
+        return value
+
+    def _buy(
+        self,
+        fetch: Callable[..., list[C]],
+        page_url: str,
+        content_path: str,
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None,
+        format: Format,
+        on_token: Callable[[], None] | None = None,
+    ) -> C:
+        req = self._token_request(
+            page_url, max_price_micros, currency, license_type, license_id, format
+        )
+        token: TollbitToken = self._get_content_token(req, content_path)
+        if on_token is not None:
+            on_token()
+
+        results = fetch(content_url=content_path, token=token)
+
+        rate = results[0].rate
+        currency_code, licence = rate.price.currency, rate.license.license_type
+        self.metrics.inc("tollbit_purchases_total", currency=currency_code, license_type=licence)
+        self.metrics.inc(
+            "tollbit_spend_micros_total",
+            rate.price.price_micros,
+            currency=currency_code,
+            license_type=licence,
+        )
+
+        if self.dedup_index is not None:
+            self.dedup_index.add(content_path, results[0])
+        return results[0]
+
+    def _token_request(
+        self,
+        page_url: str,
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None,
+        format: Format,
+    ) -> CreateSubdomainAccessTokenRequest:
+        return CreateSubdomainAccessTokenRequest(
+            url=page_url,  # type: ignore
             userAgent=self.token_api.user_agent,
             maxPriceMicros=max_price_micros,
             currency=currency.value,
@@ -70,11 +618,25 @@ class UseContentClient:
             licenseCuid=license_id or "",
             format=format,
         )
-        token_resp = self.token_api.get_content_token(req)
-        token: TollbitToken = TollbitToken(token_resp.token)
 
-        results = self.content_api.get_content(
-            content_url=f"{parsed_url.netloc}{parsed_url.path}", token=token
-        )
 
-        return results[0]
+def _rate_keys(rates: list[ContentRate]) -> list[str]:
+    return sorted(rate.model_dump_json() for rate in rates if not rate.error)
+
+
+def _limited(fn: Callable[[K], R], limiter: AdaptiveLimiter | None) -> Callable[[K], R]:
+    return fn if limiter is None else functools.partial(limiter.run, fn)
+
+
+def _key_fingerprint(token_api: TokenProvider) -> str:
+    """A short hash of the API keys behind ``token_api``, safe to store in a cache key."""
+    return hashlib.sha256("\n".join(sorted(_api_keys(token_api))).encode()).hexdigest()[:16]
+
+
+def _api_keys(token_api: TokenProvider) -> list[str]:
+    if isinstance(token_api, TokenRefresher):
+        return _api_keys(token_api.token_api)
+    if isinstance(token_api, KeyPool):
+        return [key for api in token_api.token_apis for key in _api_keys(api)]
+    api_key = getattr(token_api, "api_key", None)
+    return [api_key] if isinstance(api_key, str) else []
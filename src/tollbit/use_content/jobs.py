@@ -0,0 +1,237 @@
+"""Bulk purchases that can be resumed after the process dies.
+
+A ``PurchaseJob`` buys the content of many URLs like ``iter_sanctioned_content``, and
+records how far it has got with each URL in a journal file. Run the same job with the same
+journal again after a crash or restart and it only works on the URLs it had not finished::
+
+    with PurchaseJob(client, "purchases.journal", max_price_micros=..., currency=...,
+                     license_type=...) as job:
+        for url, result in job.run(urls):
+            ...
+
+The journal is an append-only file of JSON lines, one per change of a URL's state:
+
+- ``pending`` when the URL is started
+- ``token_minted`` once a token to buy it has been minted
+- ``fetched`` once its content has been handed to the caller
+- ``failed``, with the error, if buying it failed
+
+Records are written in batches of ``flush_every``, or after ``flush_interval`` seconds,
+and synced to disk, so a crash can lose the last batch. A URL whose ``fetched`` record was
+lost is bought again on restart; everything recorded as fetched never is. URLs that failed
+are only tried again with ``retry_failed``.
+
+A URL left in the ``token_minted`` state was interrupted between minting its token and
+recording its content, so it may already have been charged for. Such URLs are bought again
+on restart, and listed in ``possibly_charged`` so that the spend can be reconciled.
+"""
+
+from __future__ import annotations
+import functools
+import json
+import os
+import threading
+import time
+from enum import Enum
+from typing import IO, Iterable, Iterator, NamedTuple
+from tollbit._apis.models import DeveloperContentResponseSuccess
+from tollbit.content_formats import Format
+from tollbit.currencies import Currency
+from tollbit.licences import LicenceType
+from tollbit.urls import canonicalize
+from tollbit._logging import get_sdk_logger
+from .client import UseContentClient, _limited
+from .limiter import AdaptiveLimiter
+from ._batch import iter_as_completed
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_DEFAULT_FLUSH_EVERY = 100
+_DEFAULT_FLUSH_INTERVAL_SECONDS = 1.0
+
+Result = tuple[str, DeveloperContentResponseSuccess | Exception]
+
+
+class UrlState(str, Enum):
+    PENDING = "pending"
+    TOKEN_MINTED = "token_minted"
+    FETCHED = "fetched"
+    FAILED = "failed"
+
+
+class JobEntry(NamedTuple):
+    state: UrlState
+    # Why the URL failed, for URLs in the failed state
+    error: str | None = None
+
+
+class PurchaseJob:
+    """Buys content for many URLs, journalling progress so that it can be resumed.
+
+    URLs are journalled by their canonical form, so equivalent URLs are only bought once;
+    see ``tollbit.urls``.
+    """
+
+    # Canonical URLs the journal left in the token_minted state when the job was opened
+    possibly_charged: frozenset[str]
+
+    def __init__(
+        self,
+        client: UseContentClient,
+        journal_path: str | os.PathLike[str],
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+        max_in_flight: int = 16,
+        limiter: AdaptiveLimiter | None = None,
+        retry_failed: bool = False,
+        flush_every: int = _DEFAULT_FLUSH_EVERY,
+        flush_interval: float = _DEFAULT_FLUSH_INTERVAL_SECONDS,
+    ):
+        self.client = client
+        self.journal_path = os.fspath(journal_path)
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter
+        self.retry_failed = retry_failed
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._purchase = functools.partial(
+            client._purchase,
+            client.content_api.get_content,
+            max_price_micros=max_price_micros,
+            currency=currency,
+            license_type=license_type,
+            license_id=license_id,
+            format=format,
+        )
+        self._lock = threading.Lock()
+        # Held while writing to the file, so that batches are written in order
+        self._file_lock = threading.Lock()
+        self._entries, complete = _load(self.journal_path)
+        self.possibly_charged = frozenset(
+            key for key, entry in self._entries.items() if entry.state is UrlState.TOKEN_MINTED
+        )
+        if self.possibly_charged:
+            logger.warning(
+                f"{len(self.possibly_charged)} URLs in journal {self.journal_path} were "
+                "interrupted after minting a token and may already have been charged"
+            )
+        # Start a new line after a record cut short by a crash
+        self._buffer: list[str] = [] if complete else ["\n"]
+        self._last_flush = time.monotonic()
+        self._file: IO[str] = open(self.journal_path, "a", encoding="utf-8")
+
+    def run(self, urls: Iterable[str]) -> Iterator[Result]:
+        """Buy the content of each unfinished URL, yielding ``(url, result)`` as each finishes.
+
+        URLs already fetched, or failed unless ``retry_failed`` is set, are skipped. A URL
+        is recorded as fetched once the loop consuming ``run`` has taken its result.
+        Failures are yielded in place of the result rather than raised.
+        """
+        results = iter_as_completed(
+            self._unfinished(urls), _limited(self._buy, self.limiter), self.max_in_flight
+        )
+        try:
+            for url, result in results:
+                try:
+                    yield url, result
+                finally:
+                    if not isinstance(result, Exception):
+                        self._record(canonicalize(url), UrlState.FETCHED)
+        finally:
+            self.flush()
+
+    def entries(self) -> dict[str, JobEntry]:
+        """Return the latest state of every URL in the journal, by canonical URL."""
+        with self._lock:
+            return dict(self._entries)
+
+    def flush(self) -> None:
+        """Write and sync the journal records not yet written."""
+        with self._file_lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._file_lock:
+            if self._file.closed:
+                return
+            self._flush()
+            self._file.close()
+
+    def __enter__(self) -> PurchaseJob:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _unfinished(self, urls: Iterable[str]) -> Iterator[str]:
+        started: set[str] = set()
+        for url in urls:
+            key = canonicalize(url)
+            with self._lock:
+                entry = self._entries.get(key)
+            if key in started or (entry is not None and not self._should_run(entry)):
+                continue
+            started.add(key)
+            self._record(key, UrlState.PENDING)
+            yield url
+
+    def _should_run(self, entry: JobEntry) -> bool:
+        if entry.state is UrlState.FETCHED:
+            return False
+        return entry.state is not UrlState.FAILED or self.retry_failed
+
+    def _buy(self, url: str) -> DeveloperContentResponseSuccess:
+        key = canonicalize(url)
+        try:
+            return self._purchase(url, on_token=lambda: self._record(key, UrlState.TOKEN_MINTED))
+        except Exception as e:
+            self._record(key, UrlState.FAILED, f"{type(e).__name__}: {e}")
+            raise
+
+    def _record(self, key: str, state: UrlState, error: str | None = None) -> None:
+        record = {"url": key, "state": state.value, "time": time.time()}
+        if error is not None:
+            record["error"] = error
+        with self._lock:
+            self._entries[key] = JobEntry(state, error)
+            self._buffer.append(json.dumps(record) + "\n")
+            due = (
+                len(self._buffer) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def _flush(self) -> None:
+        # Called with self._file_lock held. Other threads keep recording into a new buffer
+        # while this one is written and synced.
+        with self._lock:
+            self._last_flush = time.monotonic()
+            lines, self._buffer = self._buffer, []
+        if lines:
+            self._file.writelines(lines)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+
+def _load(path: str) -> tuple[dict[str, JobEntry], bool]:
+    """Return the latest entry for each URL, and whether the journal ends with a newline."""
+    entries: dict[str, JobEntry] = {}
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return entries, True
+    line = "\n"
+    with f:
+        for number, line in enumerate(f, 1):
+            try:
+                record = json.loads(line)
+                entries[record["url"]] = JobEntry(UrlState(record["state"]), record.get("error"))
+            except (ValueError, KeyError, TypeError):
+                # Most likely the last line, cut short by a crash
+                logger.warning(f"Skipping unreadable line {number} of journal {path}")
+    return entries, line.endswith("\n")
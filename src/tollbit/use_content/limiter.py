@@ -0,0 +1,118 @@
+"""Adaptive concurrency limits for the client's parallel operations.
+
+A fixed number of workers is either too timid or overloads the gateway, and the right
+number changes over time. An ``AdaptiveLimiter`` finds it as it goes, using additive
+increase and multiplicative decrease (AIMD): while requests keep their usual latency and
+the limit is being used, it grows by about one per round of requests; when latency grows
+well above its long-run average, or Tollbit reports a server error or throttles requests,
+it is cut back.
+
+Pass a limiter to ``get_rates``, ``iter_sanctioned_content``, ``aiter_sanctioned_content``
+or ``CrawlScheduler``. Their ``max_workers``/``max_in_flight`` setting becomes a ceiling,
+and a limiter shared between calls keeps what it has learned::
+
+    limiter = AdaptiveLimiter(max_limit=64)
+    for url, result in client.iter_sanctioned_content(urls, ..., max_in_flight=64, limiter=limiter):
+        ...
+"""
+
+from __future__ import annotations
+import threading
+import time
+from typing import Callable, TypeVar
+from tollbit._apis.errors import RateLimitedError, ServerError
+
+R = TypeVar("R")
+
+# Weights of the latest request in the short and long-run latency averages
+_SHORT_WEIGHT = 0.2
+_LONG_WEIGHT = 0.02
+
+
+class AdaptiveLimiter:
+    """Limits how many calls run at once, adapting the limit to observed latency and errors.
+
+    The limit is cut by ``backoff`` when the short-term average latency exceeds the
+    long-run average by more than ``tolerance`` times, and by ``error_backoff`` when a
+    call raises one of ``overload_errors``. It is cut at most once per average request
+    latency, so a burst of failures from one round of requests only counts once.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 256,
+        backoff: float = 0.9,
+        error_backoff: float = 0.5,
+        tolerance: float = 2.0,
+        overload_errors: tuple[type[BaseException], ...] = (ServerError, RateLimitedError),
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.error_backoff = error_backoff
+        self.tolerance = tolerance
+        self.overload_errors = overload_errors
+        self._cond = threading.Condition()
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._short_latency: float | None = None
+        self._long_latency: float | None = None
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        with self._cond:
+            return int(self._limit)
+
+    def acquire(self) -> None:
+        """Wait until a call may start."""
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, elapsed: float, error: BaseException | None = None) -> None:
+        """Record a finished call that took ``elapsed`` seconds."""
+        with self._cond:
+            saturated = self._in_flight >= int(self._limit)
+            self._in_flight -= 1
+            if error is not None and isinstance(error, self.overload_errors):
+                self._decrease(self.error_backoff)
+            elif error is None:
+                self._observe(elapsed, saturated)
+            self._cond.notify_all()
+
+    def run(self, fn: Callable[..., R], *args: object, **kwargs: object) -> R:
+        """Call ``fn`` once a slot is free, recording how it went."""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self.release(time.monotonic() - start, e)
+            raise
+        self.release(time.monotonic() - start)
+        return result
+
+    def _observe(self, elapsed: float, saturated: bool) -> None:
+        if self._short_latency is None or self._long_latency is None:
+            self._short_latency = self._long_latency = elapsed
+            return
+        self._short_latency += _SHORT_WEIGHT * (elapsed - self._short_latency)
+        self._long_latency += _LONG_WEIGHT * (elapsed - self._long_latency)
+        if self._short_latency > self._long_latency * self.tolerance:
+            self._decrease(self.backoff)
+        elif saturated:
+            # About one more slot per round of ``limit`` calls
+            self._limit = min(self._limit + 1 / self._limit, float(self.max_limit))
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self._short_latency or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(self._limit * factor, float(self.min_limit))
@@ -0,0 +1,325 @@
+"""Looking up rates and minting tokens for URLs before they are bought.
+
+When the URLs to buy are known some time before workers get to them, a ``Prefetcher``
+attached to the client resolves their rates in the background as they are enqueued, and
+mints content tokens ahead of time for those that can be bought within the price cap. A
+later ``get_rate`` is answered from the prefetched rates, and ``get_sanctioned_content``
+with the same terms uses the prefetched token, so it only has to fetch the content::
+
+    with Prefetcher(client, budget_micros=1_000_000, max_price_micros=5_000,
+                    currency=currencies.USD, license_type=licences.ON_DEMAND_LICENSE) as prefetcher:
+        for url in upcoming:
+            prefetcher.enqueue(url)
+        ...
+        client.get_sanctioned_content(url, 5_000, currencies.USD, licences.ON_DEMAND_LICENSE)
+
+Minting a token does not charge anything; only fetching content with it does. Tokens are
+minted while the prices of the URLs holding an unused token add up to no more than
+``budget_micros``, so the budget bounds what the pipeline is committed to at once. Rates and
+tokens that are not used before they expire are dropped, and so are those still held when
+the prefetcher is closed.
+"""
+
+from __future__ import annotations
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable
+from tollbit.content_formats import Format
+from tollbit.currencies import Currency
+from tollbit.licences import LicenceType
+from tollbit.urls import content_target
+from tollbit._apis.models import CreateSubdomainAccessTokenRequest
+from tollbit._logging import get_sdk_logger
+from .client import UseContentClient, _DEFAULT_RATE_CACHE_SECONDS, _limited
+from .limiter import AdaptiveLimiter
+from .types import ContentRate
+
+# Configure logging
+logger = get_sdk_logger(__name__)
+
+_DEFAULT_MAX_TOKENS = 1000
+_DEFAULT_MAX_PENDING = 10_000
+# Expired rates and tokens are swept out at most this often
+_SWEEP_INTERVAL_SECONDS = 1.0
+
+
+@dataclass
+class _Prefetched:
+    rates: list[ContentRate] | None
+    # All times are time.time() based
+    rates_expire_at: float
+    token: str | None = None
+    token_request: str | None = None
+    token_expires_at: float = 0.0
+    price_micros: int = 0
+
+
+class Prefetcher:
+    """Resolves rates and pre-mints content tokens for enqueued URLs in the background.
+
+    Tokens are minted for the terms given here; a purchase made with other terms mints
+    its own token as usual. At most ``max_tokens`` unused tokens are held, and at most
+    ``max_pending`` URLs are queued or held at once, the oldest prefetched URL being
+    dropped to make room for a new one. Creating a prefetcher attaches it to ``client``,
+    which can only have one at a time, and closing it detaches it again.
+    """
+
+    def __init__(
+        self,
+        client: UseContentClient,
+        budget_micros: int,
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+        max_tokens: int = _DEFAULT_MAX_TOKENS,
+        max_in_flight: int = 4,
+        limiter: AdaptiveLimiter | None = None,
+        max_pending: int = _DEFAULT_MAX_PENDING,
+    ):
+        if client.prefetcher is not None:
+            raise ValueError("The client already has a prefetcher; close it first")
+        self.client = client
+        self.budget_micros = budget_micros
+        self.max_price_micros = max_price_micros
+        self.currency = currency
+        self.license_type = license_type
+        self.license_id = license_id
+        self.format = format
+        self.max_tokens = max_tokens
+        self.max_pending = max_pending
+        self._get_rate = _limited(client._indexed_rate, limiter)
+        self._lock = threading.Lock()
+        self._queue: queue.Queue[str | None] = queue.Queue()
+        # Content paths queued or being prefetched, and those prefetched but not yet used
+        self._pending: set[str] = set()
+        self._entries: OrderedDict[str, _Prefetched] = OrderedDict()
+        self._reserved_micros = 0
+        self._tokens = 0
+        self._next_sweep = 0.0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._run, name="tollbit-prefetcher", daemon=True)
+            for _ in range(max_in_flight)
+        ]
+        for thread in self._threads:
+            thread.start()
+        client.prefetcher = self
+
+    @property
+    def reserved_micros(self) -> int:
+        """The prices of the URLs holding an unused token, added up."""
+        with self._lock:
+            return self._reserved_micros
+
+    def enqueue(self, url: str) -> bool:
+        """Queue ``url`` to be prefetched, returning False if it could not be queued."""
+        content_path = content_target(url).content_path
+        with self._lock:
+            if self._closed:
+                return False
+            if content_path in self._pending or content_path in self._entries:
+                return True
+            if len(self._pending) + len(self._entries) >= self.max_pending:
+                if not self._entries:
+                    self.client.metrics.inc("tollbit_prefetch_skipped_total", reason="queue_full")
+                    return False
+                _, oldest = self._entries.popitem(last=False)
+                self._drop_token(oldest)
+                self.client.metrics.inc("tollbit_prefetch_dropped_total", reason="evicted")
+            self._pending.add(content_path)
+        self._queue.put(url)
+        return True
+
+    def enqueue_many(self, urls: Iterable[str]) -> int:
+        """Queue each of ``urls``, returning how many were queued."""
+        return sum(self.enqueue(url) for url in urls)
+
+    def join(self) -> None:
+        """Wait until every URL queued so far has been prefetched."""
+        self._queue.join()
+
+    def take_rates(self, content_path: str) -> list[ContentRate] | None:
+        """Return and forget the prefetched rates for ``content_path``, if there are any."""
+        with self._lock:
+            self._sweep()
+            entry = self._entries.get(content_path)
+            rates = None
+            if entry is not None and entry.rates is not None:
+                if entry.rates_expire_at > time.time():
+                    rates = entry.rates
+                else:
+                    self.client.metrics.inc("tollbit_prefetch_dropped_total", reason="expired")
+                entry.rates = None
+                self._forget_if_used(content_path, entry)
+        self.client.metrics.inc(
+            "tollbit_prefetch_requests_total",
+            kind="rate",
+            result="miss" if rates is None else "hit",
+        )
+        return rates
+
+    def take_token(self, content_path: str, req: CreateSubdomainAccessTokenRequest) -> str | None:
+        """Return and forget the token minted ahead for ``req``, if there is one."""
+        token = None
+        with self._lock:
+            self._sweep()
+            entry = self._entries.get(content_path)
+            if (
+                entry is not None
+                and entry.token is not None
+                and entry.token_request == req.model_dump_json()
+            ):
+                if entry.token_expires_at > time.time():
+                    token = entry.token
+                else:
+                    self.client.metrics.inc("tollbit_prefetch_dropped_total", reason="expired")
+                self._drop_token(entry)
+                self._forget_if_used(content_path, entry)
+        self.client.metrics.inc(
+            "tollbit_prefetch_requests_total",
+            kind="token",
+            result="miss" if token is None else "hit",
+        )
+        return token
+
+    def close(self) -> None:
+        """Stop prefetching, drop every unused rate and token and detach from the client."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._entries.clear()
+            self._reserved_micros = 0
+            self._tokens = 0
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self.client.prefetcher is self:
+            self.client.prefetcher = None
+
+    def __enter__(self) -> Prefetcher:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            url = self._queue.get()
+            try:
+                if url is None:
+                    return
+                if not self._closed:
+                    self._prefetch(url)
+            except Exception as e:
+                logger.warning(f"Unable to prefetch {url}: {e}")
+                self.client.metrics.inc("tollbit_prefetch_errors_total", reason=type(e).__name__)
+            finally:
+                if url is not None:
+                    with self._lock:
+                        self._pending.discard(content_target(url).content_path)
+                self._queue.task_done()
+
+    def _prefetch(self, url: str) -> None:
+        page_url, content_path, _ = content_target(url)
+        rates = self._get_rate(content_path)
+        if rates:
+            expires_at = min(rate.license.validUntil.timestamp() for rate in rates)
+        else:
+            expires_at = time.time() + _DEFAULT_RATE_CACHE_SECONDS
+        entry = _Prefetched(rates, expires_at)
+
+        price = self._price(rates)
+        dedup_index = self.client.dedup_index
+        if price is None:
+            self.client.metrics.inc("tollbit_prefetch_skipped_total", reason="over_price")
+        elif dedup_index is not None and dedup_index.contains_url(content_path):
+            self.client.metrics.inc("tollbit_prefetch_skipped_total", reason="duplicate")
+        elif self._reserve(price):
+            try:
+                req = self.client._token_request(
+                    page_url,
+                    self.max_price_micros,
+                    self.currency,
+                    self.license_type,
+                    self.license_id,
+                    self.format,
+                )
+                entry.token, entry.token_expires_at = self.client._mint_content_token(req)
+                entry.token_request = req.model_dump_json()
+                entry.price_micros = price
+            except Exception:
+                self._release(price)
+                raise
+        else:
+            self.client.metrics.inc("tollbit_prefetch_skipped_total", reason="over_budget")
+
+        with self._lock:
+            # Anything minted after close is dropped; its budget was released by close
+            if not self._closed:
+                self._entries[content_path] = entry
+
+    def _price(self, rates: list[ContentRate]) -> int | None:
+        # The lowest price at which the URL can be bought on this prefetcher's terms
+        prices = [
+            rate.price.priceMicros
+            for rate in rates
+            if not rate.error
+            and rate.price.currency == self.currency.value
+            and rate.license.licenseType == self.license_type.value
+            and rate.price.priceMicros <= self.max_price_micros
+        ]
+        return min(prices) if prices else None
+
+    def _reserve(self, price: int) -> bool:
+        with self._lock:
+            self._sweep()
+            if self._closed or self._tokens >= self.max_tokens:
+                return False
+            if self._reserved_micros + price > self.budget_micros:
+                return False
+            self._reserved_micros += price
+            self._tokens += 1
+            return True
+
+    def _release(self, price: int) -> None:
+        with self._lock:
+            # Closing has already dropped every reservation
+            if self._closed:
+                return
+            self._reserved_micros -= price
+            self._tokens -= 1
+
+    def _drop_token(self, entry: _Prefetched) -> None:
+        # Called with self._lock held
+        if entry.token is None:
+            return
+        self._reserved_micros -= entry.price_micros
+        self._tokens -= 1
+        entry.token = None
+
+    def _forget_if_used(self, content_path: str, entry: _Prefetched) -> None:
+        # Called with self._lock held
+        if entry.rates is None and entry.token is None:
+            del self._entries[content_path]
+
+    def _sweep(self) -> None:
+        # Called with self._lock held. Drops expired rates and tokens, freeing their budget.
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + _SWEEP_INTERVAL_SECONDS
+        for content_path, entry in list(self._entries.items()):
+            if entry.rates is not None and entry.rates_expire_at <= now:
+                entry.rates = None
+                self.client.metrics.inc("tollbit_prefetch_dropped_total", reason="expired")
+            if entry.token is not None and entry.token_expires_at <= now:
+                self._drop_token(entry)
+                self.client.metrics.inc("tollbit_prefetch_dropped_total", reason="expired")
+            self._forget_if_used(content_path, entry)
@@ -0,0 +1,46 @@
+from __future__ import annotations
+import functools
+import multiprocessing.context
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+from .client import UseContentClient
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# The client for the current worker process, set once when the worker starts.
+_worker_client: UseContentClient | None = None
+
+
+def map_in_processes(
+    fn: Callable[[UseContentClient, T], R],
+    items: Iterable[T],
+    client: UseContentClient,
+    max_workers: int | None = None,
+    chunksize: int = 1,
+    mp_context: multiprocessing.context.BaseContext | None = None,
+) -> Iterator[R]:
+    """Call ``fn(client, item)`` for every item across a pool of worker processes.
+
+    Each worker process receives its own copy of ``client`` once, when it starts, and
+    reuses it (and its connections) for every item it handles. ``fn`` must be picklable,
+    i.e. defined at the top level of a module. Results are yielded in the order of
+    ``items``; an exception raised by ``fn`` is re-raised when its result is reached.
+    """
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(client,),
+    ) as pool:
+        yield from pool.map(functools.partial(_call, fn), items, chunksize=chunksize)
+
+
+def _init_worker(client: UseContentClient) -> None:
+    global _worker_client
+    _worker_client = client
+
+
+def _call(fn: Callable[[UseContentClient, T], R], item: T) -> R:
+    assert _worker_client is not None, "worker process was not initialised with a client"
+    return fn(_worker_client, item)
@@ -0,0 +1,253 @@
+"""A columnar table of rates for choosing licenses across many URLs at once.
+
+``get_rates`` returns a list of ``ContentRate`` models per URL, which is convenient for a
+handful of URLs but slow to sift through for a large crawl. ``RateTable`` holds the same
+rates as columns, one row per rate, so that filtering, picking the cheapest license for each
+URL and totalling costs run over arrays rather than models::
+
+    table = client.get_rate_table(urls)
+    affordable = table.filter(max_price_micros=5_000, currency="USD", valid_at=time.time())
+    for row in affordable.cheapest().rows():
+        ...
+
+The columns are NumPy arrays when NumPy is installed, and ``array.array`` otherwise. String
+columns (currency, license type and license path) hold indexes into ``strings``.
+"""
+
+from __future__ import annotations
+import array
+from enum import Enum
+from types import ModuleType
+from typing import Any, Iterator, Mapping, NamedTuple, Sequence
+from .types import ContentRate
+
+np: ModuleType | None
+try:
+    import numpy
+
+    np = numpy
+except ImportError:
+    np = None
+
+
+class RateRow(NamedTuple):
+    url: str
+    price_micros: int
+    currency: str
+    license_type: str
+    license_path: str
+    # When the rate expires, in seconds since the epoch
+    valid_until: float
+
+
+class RateTable:
+    """Rates for many URLs, stored column by column.
+
+    Tables are immutable; ``filter`` and ``cheapest`` return new tables that share the
+    URLs and strings of the table they were made from.
+    """
+
+    urls: list[str]
+    strings: list[str]
+    # The index of each value in strings
+    _codes: dict[str, int]
+    url_id: Any
+    price_micros: Any
+    currency: Any
+    license_type: Any
+    license_path: Any
+    valid_until: Any
+
+    def __init__(
+        self,
+        urls: list[str],
+        strings: list[str],
+        url_id: Any,
+        price_micros: Any,
+        currency: Any,
+        license_type: Any,
+        license_path: Any,
+        valid_until: Any,
+        *,
+        _codes: dict[str, int] | None = None,
+    ):
+        self.urls = urls
+        self.strings = strings
+        if _codes is None:
+            _codes = {value: code for code, value in enumerate(strings)}
+        self._codes = _codes
+        self.url_id = url_id
+        self.price_micros = price_micros
+        self.currency = currency
+        self.license_type = license_type
+        self.license_path = license_path
+        self.valid_until = valid_until
+
+    @classmethod
+    def from_rates(cls, rates: Mapping[str, Sequence[ContentRate] | Exception]) -> RateTable:
+        """Build a table from ``get_rates`` results, leaving out failures and rate errors."""
+        urls: list[str] = []
+        strings: list[str] = []
+        codes: dict[str, int] = {}
+
+        def code(value: str) -> int:
+            if value not in codes:
+                codes[value] = len(strings)
+                strings.append(value)
+            return codes[value]
+
+        columns = _Columns()
+        for url, url_rates in rates.items():
+            if isinstance(url_rates, Exception):
+                continue
+            url_id = len(urls)
+            urls.append(url)
+            for rate in url_rates:
+                if rate.error:
+                    continue
+                columns.url_id.append(url_id)
+                columns.price_micros.append(rate.price.priceMicros)
+                columns.currency.append(code(rate.price.currency))
+                columns.license_type.append(code(rate.license.licenseType))
+                columns.license_path.append(code(rate.license.licensePath))
+                columns.valid_until.append(rate.license.validUntil.timestamp())
+        return cls(urls, strings, *columns.finish(), _codes=codes)
+
+    def __len__(self) -> int:
+        return len(self.url_id)
+
+    def rows(self) -> Iterator[RateRow]:
+        """Yield the table's rows, decoded."""
+        for i in range(len(self)):
+            yield RateRow(
+                self.urls[int(self.url_id[i])],
+                int(self.price_micros[i]),
+                self.strings[int(self.currency[i])],
+                self.strings[int(self.license_type[i])],
+                self.strings[int(self.license_path[i])],
+                float(self.valid_until[i]),
+            )
+
+    def filter(
+        self,
+        max_price_micros: int | None = None,
+        currency: str | None = None,
+        license_type: str | None = None,
+        valid_at: float | None = None,
+    ) -> RateTable:
+        """Return the rows that match every condition given.
+
+        ``valid_at`` keeps rates that are still valid at that time, e.g. ``time.time()``.
+        """
+        currency_code = self._code(currency)
+        license_code = self._code(license_type)
+        if np is not None:
+            mask = np.ones(len(self), dtype=bool)
+            if max_price_micros is not None:
+                mask &= self.price_micros <= max_price_micros
+            if currency_code is not None:
+                mask &= self.currency == currency_code
+            if license_code is not None:
+                mask &= self.license_type == license_code
+            if valid_at is not None:
+                mask &= self.valid_until > valid_at
+            return self._take(np.flatnonzero(mask))
+
+        rows = [
+            i
+            for i in range(len(self))
+            if (max_price_micros is None or self.price_micros[i] <= max_price_micros)
+            and (currency_code is None or self.currency[i] == currency_code)
+            and (license_code is None or self.license_type[i] == license_code)
+            and (valid_at is None or self.valid_until[i] > valid_at)
+        ]
+        return self._take(rows)
+
+    def cheapest(self) -> RateTable:
+        """Return the cheapest rate for each URL, the first one listed on a tie.
+
+        Prices are compared regardless of currency; filter by currency first if the table
+        has several.
+        """
+        if np is not None:
+            # Sorted by URL, then price, keeping the original order of equal prices
+            order = np.lexsort((self.price_micros, self.url_id))
+            sorted_ids = self.url_id[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = sorted_ids[1:] != sorted_ids[:-1]
+            return self._take(order[first])
+
+        best: dict[int, int] = {}
+        for i in range(len(self)):
+            current = best.get(self.url_id[i])
+            if current is None or self.price_micros[i] < self.price_micros[current]:
+                best[self.url_id[i]] = i
+        return self._take(sorted(best.values(), key=lambda i: self.url_id[i]))
+
+    def total_cost(self) -> dict[str, int]:
+        """Return the sum of ``price_micros`` over every row, by currency."""
+        totals: dict[str, int] = {}
+        if np is not None:
+            for currency_code in np.unique(self.currency):
+                total = self.price_micros[self.currency == currency_code].sum()
+                totals[self.strings[int(currency_code)]] = int(total)
+            return totals
+
+        for i in range(len(self)):
+            currency = self.strings[self.currency[i]]
+            totals[currency] = totals.get(currency, 0) + self.price_micros[i]
+        return totals
+
+    def _code(self, value: str | None) -> int | None:
+        if value is None:
+            return None
+        if isinstance(value, Enum):
+            value = value.value
+        # -1 matches no row
+        return self._codes.get(value, -1)
+
+    def _take(self, rows: Any) -> RateTable:
+        if np is not None:
+            rows = np.asarray(rows, dtype=np.int64)
+            columns = [column[rows] for column in self._columns()]
+        else:
+            columns = [
+                array.array(column.typecode, (column[i] for i in rows))
+                for column in self._columns()
+            ]
+        return RateTable(self.urls, self.strings, *columns, _codes=self._codes)
+
+    def _columns(self) -> list[Any]:
+        return [
+            self.url_id,
+            self.price_micros,
+            self.currency,
+            self.license_type,
+            self.license_path,
+            self.valid_until,
+        ]
+
+
+class _Columns:
+    """Columns being filled, as arrays that can grow."""
+
+    def __init__(self) -> None:
+        self.url_id = array.array("q")
+        self.price_micros = array.array("q")
+        self.currency = array.array("i")
+        self.license_type = array.array("i")
+        self.license_path = array.array("i")
+        self.valid_until = array.array("d")
+
+    def finish(self) -> list[Any]:
+        columns = [
+            self.url_id,
+            self.price_micros,
+            self.currency,
+            self.license_type,
+            self.license_path,
+            self.valid_until,
+        ]
+        if np is None:
+            return columns
+        return [np.frombuffer(column, dtype=column.typecode).copy() for column in columns]
@@ -0,0 +1,220 @@
+"""Fair, prioritised scheduling of content fetches across publishers.
+
+A ``CrawlScheduler`` keeps a queue of jobs for each publisher domain and runs them on a
+shared pool of workers. At most ``max_per_domain`` fetches run against one domain at a
+time, and free workers are handed out in turn to every domain with work waiting, so one
+large publisher cannot starve the others or get the crawler throttled while the pool sits
+idle. Jobs with a higher ``priority`` run first, both within a domain and across domains::
+
+    scheduler = CrawlScheduler(client, max_price_micros=..., currency=..., license_type=...)
+    scheduler.submit_many(urls)
+    scheduler.submit("https://example.com/breaking", priority=10)
+    for url, result in scheduler.run():
+        ...
+
+Jobs may also be submitted from another thread, or from the loop consuming ``run``, while
+it is running.
+"""
+
+from __future__ import annotations
+import functools
+import heapq
+import itertools
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from tollbit._apis.models import DeveloperContentResponseSuccess
+from tollbit.content_formats import Format
+from tollbit.currencies import Currency
+from tollbit.licences import LicenceType
+from tollbit.urls import content_target
+from .client import UseContentClient, _limited
+from .limiter import AdaptiveLimiter
+from ._batch import _outcome
+
+Result = tuple[str, DeveloperContentResponseSuccess | Exception]
+
+
+@dataclass
+class _Domain:
+    name: str
+    limit: int
+    # (-priority, sequence, url), so the most urgent and then oldest job is first
+    jobs: list[tuple[int, int, str]] = field(default_factory=list)
+    in_flight: int = 0
+    # Changed whenever the domain enters or leaves the ready heap, invalidating old entries
+    version: int = 0
+
+
+class CrawlScheduler:
+    """Runs prioritised fetch jobs with per-domain concurrency limits.
+
+    ``domain_limits`` overrides ``max_per_domain`` for individual domains. With a
+    ``limiter``, the number of fetches in flight adapts to how the gateway is coping, up
+    to ``max_workers``.
+    """
+
+    def __init__(
+        self,
+        client: UseContentClient,
+        max_price_micros: int,
+        currency: Currency,
+        license_type: LicenceType,
+        license_id: str | None = None,
+        format: Format = Format.markdown,
+        max_workers: int = 16,
+        max_per_domain: int = 4,
+        domain_limits: dict[str, int] | None = None,
+        limiter: AdaptiveLimiter | None = None,
+    ):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_per_domain < 1 or any(limit < 1 for limit in (domain_limits or {}).values()):
+            raise ValueError("Domain limits must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_per_domain = max_per_domain
+        self.domain_limits = dict(domain_limits or {})
+        fetch = functools.partial(
+            client.get_sanctioned_content,
+            max_price_micros=max_price_micros,
+            currency=currency,
+            license_type=license_type,
+            license_id=license_id,
+            format=format,
+        )
+        self._fetch = _limited(fetch, limiter)
+        self._lock = threading.Lock()
+        self._domains: dict[str, _Domain] = {}
+        # (-priority of the domain's next job, turn, domain, version); domains that were
+        # served longer ago have an earlier turn, which rotates between equal priorities
+        self._ready: list[tuple[int, int, str, int]] = []
+        self._turns = itertools.count()
+        self._sequence = itertools.count()
+        self._versions = itertools.count(1)
+        self._pending = 0
+        # Submitted URLs that could not be parsed, waiting to be yielded by run
+        self._rejected: list[Result] = []
+        self._wake_pending = False
+        self._events: queue.Queue[tuple[str, Future[DeveloperContentResponseSuccess]] | None]
+        self._events = queue.Queue()
+
+    def __len__(self) -> int:
+        """The number of jobs waiting to run."""
+        with self._lock:
+            return self._pending
+
+    def submit(self, url: str, priority: int = 0) -> None:
+        """Queue a fetch of ``url``. Jobs with a higher ``priority`` run first.
+
+        A URL that cannot be parsed is yielded by ``run`` with its ``ValueError``, like any
+        other failed job.
+        """
+        try:
+            domain_name = content_target(url).domain
+        except ValueError as e:
+            with self._lock:
+                self._rejected.append((url, e))
+                self._pending += 1
+                wake, self._wake_pending = not self._wake_pending, True
+        else:
+            with self._lock:
+                domain = self._domains.get(domain_name)
+                if domain is None:
+                    limit = self.domain_limits.get(domain_name, self.max_per_domain)
+                    domain = self._domains[domain_name] = _Domain(domain_name, limit)
+                head = domain.jobs[0][0] if domain.jobs else None
+                heapq.heappush(domain.jobs, (-priority, next(self._sequence), url))
+                self._pending += 1
+                if head is None or -priority < head:
+                    self._make_ready(domain)
+                wake, self._wake_pending = not self._wake_pending, True
+        if wake:
+            # Wake up ``run`` in case it is waiting with free workers
+            self._events.put(None)
+
+    def submit_many(self, urls: Iterable[str], priority: int = 0) -> None:
+        for url in urls:
+            self.submit(url, priority)
+
+    def run(self) -> Iterator[Result]:
+        """Run queued jobs, yielding ``(url, result)`` as each one finishes.
+
+        Returns once every job has finished, including jobs submitted while running.
+        Failures are yielded in place of the result for that URL rather than raised.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        in_flight = 0
+        try:
+            while True:
+                yield from self._take_rejected()
+                while in_flight < self.max_workers:
+                    url = self._next_job()
+                    if url is None:
+                        break
+                    future = pool.submit(self._fetch, url)
+                    future.add_done_callback(functools.partial(self._done, url))
+                    in_flight += 1
+
+                if in_flight == 0 and len(self) == 0:
+                    return
+
+                event = self._events.get()
+                if event is None:
+                    with self._lock:
+                        self._wake_pending = False
+                    continue
+                url, future = event
+                in_flight -= 1
+                self._finish(url)
+                yield url, _outcome(future)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _done(self, url: str, future: Future[DeveloperContentResponseSuccess]) -> None:
+        self._events.put((url, future))
+
+    def _take_rejected(self) -> list[Result]:
+        with self._lock:
+            rejected, self._rejected = self._rejected, []
+            self._pending -= len(rejected)
+        return rejected
+
+    def _next_job(self) -> str | None:
+        with self._lock:
+            while self._ready:
+                _, _, domain_name, version = heapq.heappop(self._ready)
+                domain = self._domains.get(domain_name)
+                if domain is None or version != domain.version:
+                    continue
+                _, _, url = heapq.heappop(domain.jobs)
+                self._pending -= 1
+                domain.in_flight += 1
+                if domain.jobs and domain.in_flight < domain.limit:
+                    self._make_ready(domain)
+                else:
+                    # Out of the rotation until a job finishes or one is submitted
+                    domain.version = next(self._versions)
+                return url
+            return None
+
+    def _finish(self, url: str) -> None:
+        domain_name = content_target(url).domain
+        with self._lock:
+            domain = self._domains[domain_name]
+            domain.in_flight -= 1
+            if not domain.jobs:
+                if domain.in_flight == 0:
+                    del self._domains[domain_name]
+            elif domain.in_flight == domain.limit - 1:
+                self._make_ready(domain)
+
+    def _make_ready(self, domain: _Domain) -> None:
+        """Put ``domain`` in the ready heap, replacing any entry it already has."""
+        if domain.in_flight >= domain.limit:
+            return
+        domain.version = next(self._versions)
+        priority = domain.jobs[0][0]
+        heapq.heappush(self._ready, (priority, next(self._turns), domain.name, domain.version))
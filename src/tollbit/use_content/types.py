@@ -1,5 +1,7 @@
 from typing import TypeAlias, NewType
 from tollbit._apis.models import ContentRate as APIContentRate
+from tollbit._apis.models import LazyContentResult as APILazyContentResult
 
 ContentRate: TypeAlias = APIContentRate
 ContentRates: TypeAlias = list[ContentRate]
+LazyContentResult: TypeAlias = APILazyContentResult
@@ -5,6 +5,7 @@ from tollbit._apis.errors import (
     BadRequestError,
     ServerError,
     UnknownError,
+    RateLimitedError,
 )
 from tollbit._apis.models import ContentRate
 from tollbit.tokens import TollbitToken
@@ -27,21 +28,21 @@ class MockResponse:
         return self.body_text
 
 
-# Patch requests.get for testing
+# Patch requests.Session.get for testing
 @pytest.fixture()
 def patch_requests_get(monkeypatch):
     def _patch_requests_get(response: MockResponse):
-        monkeypatch.setattr(requests, "get", lambda url, headers=None: response)
+        monkeypatch.setattr(requests.Session, "get", lambda self, url, headers=None: response)
 
     return _patch_requests_get
 
 
 @pytest.fixture()
 def mock_server_down(monkeypatch):
-    def _raise_connection_error(url, headers=None):
+    def _raise_connection_error(self, url, headers=None):
         raise requests.ConnectionError("Unable to connect to the server")
 
-    monkeypatch.setattr(requests, "get", _raise_connection_error)
+    monkeypatch.setattr(requests.Session, "get", _raise_connection_error)
 
 
 # --- Tests ---
@@ -81,6 +82,13 @@ def test_get_rate_server_error(patch_requests_get, test_env):
         client.get_rate("example.com/path/to/content")
 
 
+def test_get_rate_rate_limited(patch_requests_get, test_env):
+    patch_requests_get(MockResponse(body_text="Slow down", status_code=429))
+    client = ContentAPI(user_agent="test-agent", env=test_env)
+    with pytest.raises(RateLimitedError):
+        client.get_rate("example.com/path/to/content")
+
+
 def test_get_rate_unknown_error(patch_requests_get, test_env):
     patch_requests_get(MockResponse(body_text="Teapots on the attack", status_code=418))
     client = ContentAPI(user_agent="test-agent", env=test_env)
@@ -0,0 +1,140 @@
+import pickle
+import threading
+import pytest
+import requests
+from unittest.mock import MagicMock
+from urllib3.exceptions import NewConnectionError
+from tollbit._apis.errors import BadRequestError, RateLimitedError, ServerError, UnauthorizedError
+from tollbit._apis.key_pool import KeyPool
+from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.models import (
+    CreateSubdomainAccessTokenRequest,
+    CreateSubdomainAccessTokenResponse,
+    Format,
+)
+
+
+def _content_request():
+    return CreateSubdomainAccessTokenRequest(
+        url="https://example.com/a",
+        userAgent="test-agent",
+        maxPriceMicros=1000000,
+        currency="USD",
+        licenseType="ON_DEMAND_LICENSE",
+        licenseCuid="",
+        format=Format.markdown,
+    )
+
+
+def _token_api(name, error=None):
+    token_api = MagicMock(spec=TokenAPI)
+    token_api.user_agent = "test-agent"
+    if error is not None:
+        token_api.get_content_token.side_effect = error
+    else:
+        token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(token=name)
+    return token_api
+
+
+def test_takes_turns_between_keys():
+    pool = KeyPool([_token_api("a"), _token_api("b"), _token_api("c")])
+
+    tokens = [pool.get_content_token(_content_request()).token for _ in range(6)]
+
+    assert tokens == ["a", "b", "c", "a", "b", "c"]
+
+
+def test_prefers_the_least_loaded_key():
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow(req):
+        started.set()
+        release.wait()
+        return CreateSubdomainAccessTokenResponse(token="a")
+
+    busy = _token_api("a")
+    busy.get_content_token.side_effect = slow
+    pool = KeyPool([busy, _token_api("b")])
+    thread = threading.Thread(target=pool.get_content_token, args=(_content_request(),))
+    thread.start()
+    started.wait()
+
+    # Key "a" has a call in flight, so "b" is used even when it is "a"'s turn again
+    tokens = [pool.get_content_token(_content_request()).token for _ in range(2)]
+    release.set()
+    thread.join()
+
+    assert tokens == ["b", "b"]
+
+
+@pytest.mark.parametrize("error", [RateLimitedError("slow down"), UnauthorizedError("bad key")])
+def test_rests_failing_keys_and_retries_with_another(error):
+    failing = _token_api("a", error=error)
+    pool = KeyPool([failing, _token_api("b")])
+
+    tokens = [pool.get_content_token(_content_request()).token for _ in range(3)]
+
+    assert tokens == ["b", "b", "b"]
+    assert failing.get_content_token.call_count == 1
+    (failure,) = pool.metrics.snapshot()["counters"]["tollbit_key_failures_total"]
+    assert failure["labels"] == {"key": "0", "reason": type(error).__name__}
+
+
+def _connection_error(cause):
+    error = ServerError("Unable to connect to the Tollbit server")
+    error.__cause__ = requests.ConnectionError(cause)
+    return error
+
+
+def test_retries_with_another_key_when_the_mint_was_never_sent():
+    failing = _token_api("a", error=_connection_error(NewConnectionError(None, "refused")))
+    pool = KeyPool([failing, _token_api("b")])
+
+    assert pool.get_content_token(_content_request()).token == "b"
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        ServerError("An error occurred on Tollbit's servers: 502"),
+        # The connection was reset after the request was sent
+        _connection_error("Connection reset by peer"),
+    ],
+)
+def test_server_errors_after_the_mint_was_sent_are_not_retried(error):
+    second = _token_api("b")
+    pool = KeyPool([_token_api("a", error=error), second])
+
+    with pytest.raises(ServerError):
+        pool.get_content_token(_content_request())
+    second.get_content_token.assert_not_called()
+
+
+def test_raises_when_every_key_fails():
+    pool = KeyPool(
+        [_token_api("a", RateLimitedError("slow")), _token_api("b", RateLimitedError("slow"))]
+    )
+
+    with pytest.raises(RateLimitedError):
+        pool.get_content_token(_content_request())
+
+
+def test_request_errors_are_not_retried():
+    first = _token_api("a", BadRequestError("bad request"))
+    second = _token_api("b")
+    pool = KeyPool([first, second])
+
+    with pytest.raises(BadRequestError):
+        pool.get_content_token(_content_request())
+    second.get_content_token.assert_not_called()
+
+
+def test_unpickled_pool_starts_healthy(test_env):
+    pool = KeyPool([TokenAPI("a", "test-agent", test_env), TokenAPI("b", "test-agent", test_env)])
+    pool._states[0].failures = 3
+
+    copy = pickle.loads(pickle.dumps(pool))
+
+    assert [token_api.api_key for token_api in copy.token_apis] == ["a", "b"]
+    assert copy._states[0].failures == 0
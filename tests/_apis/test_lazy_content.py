@@ -0,0 +1,73 @@
+import json
+import pytest
+from tollbit._apis.content_api import _parse_get_content_response, _parse_lazy_content_response
+from tollbit._apis.errors import ParseResponseError, UnauthorizedError
+from tollbit._apis.models import LazyContentResult
+from test_helpers.stub_api_responses import stub_content_response
+
+
+def _raw(main="<main>Main Content</main>", **overrides):
+    data = stub_content_response().model_dump(mode="json", by_alias=True)
+    data["content"]["main"] = main
+    data.update(overrides)
+    return json.dumps([data], indent=1).encode()
+
+
+@pytest.mark.parametrize(
+    "main",
+    [
+        "plain",
+        'quotes " and \\ backslashes \\" and {braces} [brackets]',
+        "line\nbreaks\tand\r\b\f controls /",
+        "unicode é 漢字 and emoji 😀",
+        "",
+    ],
+)
+def test_lazy_result_matches_eager_parse(main):
+    for ensure_ascii in (True, False):
+        data = stub_content_response().model_dump(mode="json", by_alias=True)
+        data["content"]["main"] = main
+        raw = json.dumps([data], ensure_ascii=ensure_ascii).encode()
+
+        [lazy] = _parse_lazy_content_response(raw)
+        [eager] = _parse_get_content_response(json.loads(raw))
+
+        assert lazy.main == main
+        assert lazy.main_bytes() == main.encode("utf-8")
+        assert lazy.section_bytes("header") == eager.content.header.encode("utf-8")
+        assert lazy.to_model() == eager
+
+
+def test_sections_are_decoded_on_first_access():
+    [lazy] = _parse_lazy_content_response(_raw())
+
+    assert "metadata" not in vars(lazy)
+    assert lazy.rate.price.price_micros == 0
+    assert "rate" in vars(lazy)
+    assert "content" not in vars(lazy) and "metadata" not in vars(lazy)
+    assert lazy.metadata.image_url == "https://example.com/image.png"
+
+
+def test_error_items_raise():
+    raw = json.dumps([{"error": "Error parsing content token"}]).encode()
+
+    with pytest.raises(UnauthorizedError):
+        _parse_lazy_content_response(raw)
+
+
+@pytest.mark.parametrize(
+    "raw", [b"", b"[]", b"{}", b'[{"content": "x"', b"[1]", b'[{"a" 1}]', b'[{"a": "x}]']
+)
+def test_malformed_responses_raise(raw):
+    with pytest.raises(ParseResponseError):
+        _parse_lazy_content_response(raw)
+
+
+def test_missing_sections_raise_on_access():
+    [lazy] = _parse_lazy_content_response(b'[{"content": null, "metadata": {}}]')
+
+    assert isinstance(lazy, LazyContentResult)
+    with pytest.raises(ParseResponseError):
+        lazy.main_bytes()
+    with pytest.raises(ParseResponseError):
+        lazy.rate
@@ -6,6 +6,7 @@ from tollbit._apis.errors import (
     BadRequestError,
     ServerError,
     UnknownError,
+    RateLimitedError,
 )
 from tollbit._apis.models import (
     CreateSubdomainAccessTokenRequest,
@@ -16,7 +17,7 @@ from tollbit._environment import Environment
 import os
 
 # --- Mocks and Fixtures ---
-# Patch requests.post for testing
+# Patch requests.Session.post for testing
 import requests
 
 
@@ -42,17 +43,19 @@ class MockResponse:
 @pytest.fixture()
 def patch_requests_post(monkeypatch):
     def _patch_requests_post(response: MockResponse):
-        monkeypatch.setattr(requests, "post", lambda url, headers=None, json=None: response)
+        monkeypatch.setattr(
+            requests.Session, "post", lambda self, url, headers=None, json=None: response
+        )
 
     return _patch_requests_post
 
 
 @pytest.fixture()
 def mock_server_down(monkeypatch):
-    def _raise_connection_error(url, headers=None, json=None):
+    def _raise_connection_error(self, url, headers=None, json=None):
         raise requests.ConnectionError("Unable to connect to the server")
 
-    monkeypatch.setattr(requests, "post", _raise_connection_error)
+    monkeypatch.setattr(requests.Session, "post", _raise_connection_error)
 
 
 # --- Tests for Content Access Token ---
@@ -130,6 +133,23 @@ def test_get_content_token_server_error(patch_requests_post, test_env):
     assert isinstance(excinfo.value, ServerError)
 
 
+def test_get_content_token_rate_limited(patch_requests_post, test_env):
+    patch_requests_post(MockResponse(body_text="Slow down", status_code=429))
+
+    client = TokenAPI(api_key="test-key", user_agent="test-agent", env=test_env)
+    req = CreateSubdomainAccessTokenRequest(
+        url="https://example.com",
+        userAgent="test-agent",
+        maxPriceMicros=1000000,
+        currency="USD",
+        licenseType="ON_DEMAND_LICENSE",
+        licenseCuid="",
+        format=Format.markdown,
+    )
+    with pytest.raises(RateLimitedError):
+        client.get_content_token(req)
+
+
 def test_get_content_token_unknown_error(patch_requests_post, test_env):
     patch_requests_post(MockResponse(body_text="Teapots on the attack", status_code=418))
 
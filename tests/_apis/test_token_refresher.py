@@ -0,0 +1,138 @@
+import base64
+import json
+import time
+import itertools
+from unittest.mock import MagicMock
+from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.token_refresher import TokenRefresher
+from tollbit.tokens import token_expiry
+from tollbit._apis.errors import ServerError
+from tollbit._apis.models import (
+    CreateSubdomainAccessTokenRequest,
+    CreateSubdomainAccessTokenResponse,
+    CreateCrawlAccessTokenRequest,
+    CreateCrawlAccessTokenResponse,
+    Format,
+)
+
+
+def _jwt(exp: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).rstrip(b"=")
+    return f"header.{payload.decode()}.signature"
+
+
+def _content_request(url="https://example.com/a"):
+    return CreateSubdomainAccessTokenRequest(
+        url=url,
+        userAgent="test-agent",
+        maxPriceMicros=1000000,
+        currency="USD",
+        licenseType="ON_DEMAND_LICENSE",
+        licenseCuid="",
+        format=Format.markdown,
+    )
+
+
+def _mock_token_api():
+    counter = itertools.count()
+    mock_token_api = MagicMock(spec=TokenAPI)
+    mock_token_api.user_agent = "test-agent"
+    mock_token_api.get_content_token.side_effect = lambda req: CreateSubdomainAccessTokenResponse(
+        token=f"content-{next(counter)}"
+    )
+    mock_token_api.get_crawl_token.side_effect = lambda req: CreateCrawlAccessTokenResponse(
+        token=f"crawl-{next(counter)}"
+    )
+    return mock_token_api
+
+
+def test_reuses_tokens_for_identical_requests():
+    mock_token_api = _mock_token_api()
+    refresher = TokenRefresher(mock_token_api, default_ttl=60)
+    try:
+        first = refresher.get_content_token(_content_request())
+        second = refresher.get_content_token(_content_request())
+        other = refresher.get_content_token(_content_request("https://example.com/b"))
+        crawl = refresher.get_crawl_token(
+            CreateCrawlAccessTokenRequest(url="https://example.com/a", userAgent="test-agent")
+        )
+    finally:
+        refresher.close()
+
+    assert first.token == second.token
+    assert other.token != first.token
+    assert crawl.token.startswith("crawl-")
+    assert mock_token_api.get_content_token.call_count == 2
+
+
+def test_refreshes_tokens_in_use_before_they_expire():
+    mock_token_api = _mock_token_api()
+    refresher = TokenRefresher(mock_token_api, refresh_margin=0.2, default_ttl=0.3)
+    try:
+        first = refresher.get_content_token(_content_request())
+        time.sleep(0.2)
+        second = refresher.get_content_token(_content_request())
+    finally:
+        refresher.close()
+
+    assert second.token != first.token
+    # The replacement was minted in the background, not inline
+    assert mock_token_api.get_content_token.call_count == 2
+
+
+def test_does_not_refresh_idle_tokens():
+    mock_token_api = _mock_token_api()
+    refresher = TokenRefresher(mock_token_api, refresh_margin=0.05, idle_timeout=0, default_ttl=0.1)
+    try:
+        refresher.get_content_token(_content_request())
+        time.sleep(0.3)
+        assert refresher._entries == {}
+    finally:
+        refresher.close()
+
+    assert mock_token_api.get_content_token.call_count == 1
+
+
+def test_failed_refresh_keeps_current_token():
+    mock_token_api = _mock_token_api()
+    refresher = TokenRefresher(mock_token_api, refresh_margin=0.5, default_ttl=1)
+    try:
+        first = refresher.get_content_token(_content_request())
+        mock_token_api.get_content_token.side_effect = ServerError("boom")
+        time.sleep(0.6)
+        assert refresher.get_content_token(_content_request()).token == first.token
+    finally:
+        refresher.close()
+
+
+def test_does_not_refresh_expired_tokens_in_a_busy_loop():
+    mock_token_api = _mock_token_api()
+    mock_token_api.get_content_token.side_effect = lambda req: CreateSubdomainAccessTokenResponse(
+        token=_jwt(time.time() - 10)
+    )
+    refresher = TokenRefresher(mock_token_api, default_ttl=60)
+    try:
+        refresher.get_content_token(_content_request())
+        time.sleep(0.3)
+    finally:
+        refresher.close()
+
+    assert mock_token_api.get_content_token.call_count == 1
+
+
+def test_close_stops_background_thread():
+    mock_token_api = _mock_token_api()
+    refresher = TokenRefresher(mock_token_api, default_ttl=60)
+    refresher.get_content_token(_content_request())
+    thread = refresher._thread
+
+    refresher.close()
+
+    assert thread is not None and not thread.is_alive()
+    mock_token_api.close.assert_called_once()
+
+
+def test_token_expiry():
+    assert token_expiry(_jwt(1700000000)) == 1700000000
+    assert token_expiry("not-a-jwt") is None
+    assert token_expiry("a.!!!.c") is None
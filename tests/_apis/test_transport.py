@@ -0,0 +1,195 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from tollbit._apis.transport import Transport
+from tollbit._environment import Environment, env_from_vars
+
+
+@pytest.fixture()
+def server():
+    peers = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_HEAD(self):
+            peers.add(self.client_address)
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            peers.add(self.client_address)
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"[]")
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}", peers
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_warmup_opens_pooled_connections(server):
+    base_url, peers = server
+    transport = Transport(Environment(developer_api_base_url=base_url), pool_maxsize=3)
+
+    assert transport.warmup(connections=5) == 3
+    assert len(peers) == 3
+
+    # Later requests reuse the warmed connections rather than opening new ones
+    for _ in range(3):
+        transport.get("/dev/v1/rate/example.com", headers={})
+    assert len(peers) == 3
+    transport.close()
+
+
+def test_warmup_logs_failures():
+    transport = Transport(Environment(developer_api_base_url="http://127.0.0.1:9"))
+
+    assert transport.warmup(connections=2) == 0
+
+
+def _response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b"[]"
+    return response
+
+
+def test_env_from_vars_accepts_several_gateways(monkeypatch):
+    monkeypatch.setenv("TOLLBIT_SDK_DEVELOPER_API_BASE_URL", "https://eu.local, https://us.local")
+
+    env = env_from_vars()
+
+    assert env.developer_api_base_url == "https://eu.local"
+    assert env.base_urls == ("https://eu.local", "https://us.local")
+
+
+def test_idempotent_requests_fail_over_on_any_error(monkeypatch):
+    calls = []
+    broken = {"http://a.local": requests.ConnectionError("down"), "http://b.local": None}
+
+    def fake_get(self, url, headers=None):
+        calls.append(url)
+        base_url = url.split("/dev")[0]
+        error = broken.get(base_url)
+        if error is not None:
+            raise error
+        return _response(503 if base_url == "http://b.local" else 200)
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    env = Environment(
+        developer_api_base_url="http://a.local",
+        fallback_base_urls=("http://b.local", "http://c.local"),
+    )
+    transport = Transport(env)
+
+    assert transport.get("/dev/v1/rate/x", headers={}, idempotent=True).status_code == 200
+    assert calls == [
+        "http://a.local/dev/v1/rate/x",
+        "http://b.local/dev/v1/rate/x",
+        "http://c.local/dev/v1/rate/x",
+    ]
+
+    # Failed gateways are avoided until their backoff expires
+    calls.clear()
+    transport.get("/dev/v1/rate/x", headers={})
+    assert calls == ["http://c.local/dev/v1/rate/x"]
+
+    retries = transport.metrics.snapshot()["counters"]["tollbit_retries_total"]
+    assert {sample["labels"]["reason"] for sample in retries} == {"ConnectionError", "503"}
+
+
+def test_other_requests_only_fail_over_when_nothing_was_sent(monkeypatch):
+    calls = []
+    errors = {
+        "http://a.local": requests.ConnectionError(
+            MaxRetryError(None, "/x", NewConnectionError(None, "refused"))
+        ),
+        "http://b.local": requests.ReadTimeout("sent, but no answer"),
+    }
+
+    def fake_post(self, url, headers=None, json=None):
+        calls.append(url)
+        raise errors[url.split("/dev")[0]]
+
+    monkeypatch.setattr(requests.Session, "post", fake_post)
+    env = Environment(
+        developer_api_base_url="http://a.local",
+        fallback_base_urls=("http://b.local", "http://c.local"),
+    )
+
+    with pytest.raises(requests.ReadTimeout):
+        Transport(env).post("/dev/v2/tokens/content", headers={}, json={})
+    assert calls == [
+        "http://a.local/dev/v2/tokens/content",
+        "http://b.local/dev/v2/tokens/content",
+    ]
+
+
+def test_server_errors_are_returned_for_requests_that_are_not_idempotent(monkeypatch):
+    calls = []
+
+    def fake_get(self, url, headers=None):
+        calls.append(url)
+        return _response(503)
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    env = Environment(
+        developer_api_base_url="http://a.local", fallback_base_urls=("http://b.local",)
+    )
+
+    assert Transport(env).get("/dev/v1/content/x", headers={}).status_code == 503
+    assert calls == ["http://a.local/dev/v1/content/x"]
+
+
+def test_returns_last_server_error_when_every_gateway_fails(monkeypatch):
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, headers=None: _response(500))
+    env = Environment(
+        developer_api_base_url="http://a.local", fallback_base_urls=("http://b.local",)
+    )
+
+    assert Transport(env).get("/dev/v1/rate/x", headers={}).status_code == 500
+
+
+def test_prefers_the_fastest_gateway(monkeypatch):
+    calls = []
+
+    def fake_get(self, url, headers=None):
+        calls.append(url)
+        if url.startswith("http://slow.local"):
+            time.sleep(0.02)
+        return _response(200)
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    env = Environment(
+        developer_api_base_url="http://slow.local", fallback_base_urls=("http://fast.local",)
+    )
+    transport = Transport(env)
+    # Both gateways are measured once before the faster one is preferred
+    transport.get("/a", headers={})
+    transport._gateways[1].succeeded(0.001)
+    calls.clear()
+
+    for _ in range(3):
+        transport.get("/a", headers={})
+    assert calls == ["http://fast.local/a"] * 3
+
+
+def test_unmeasured_gateways_are_ranked_after_measured_ones():
+    env = Environment(
+        developer_api_base_url="http://a.local", fallback_base_urls=("http://b.local",)
+    )
+    transport = Transport(env)
+    transport._gateways[1].succeeded(0.5)
+
+    assert [gateway.url for gateway in transport._ranked()] == ["http://b.local", "http://a.local"]
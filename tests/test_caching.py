@@ -0,0 +1,150 @@
+import pickle
+import threading
+import time
+import pytest
+from tollbit import caching
+from tollbit.caching import MemoryCache, SQLiteCache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return MemoryCache()
+    return SQLiteCache(tmp_path / "cache.db", poll_interval=0.01)
+
+
+def test_get_and_set(cache):
+    cache.set("a", "1", time.time() + 60)
+    cache.set("expired", "2", time.time() - 1)
+
+    assert cache.get("a") == "1"
+    assert cache.get("expired") is None
+    assert cache.get("missing") is None
+
+
+def test_get_or_compute_only_computes_missing_values(cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "value", time.time() + 60
+
+    assert cache.get_or_compute("k", compute) == "value"
+    assert cache.get_or_compute("k", compute) == "value"
+    assert len(calls) == 1
+
+
+def test_get_or_compute_recomputes_expired_values(cache):
+    cache.set("k", "old", time.time() - 1)
+    assert cache.get_or_compute("k", lambda: ("new", time.time() + 60)) == "new"
+
+
+def test_get_or_compute_raises_and_allows_retry(cache):
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("k", fail)
+
+    assert cache.get_or_compute("k", lambda: ("value", time.time() + 60)) == "value"
+
+
+def test_items_filters_by_prefix(cache):
+    cache.set("rate:a", "1", time.time() + 60)
+    cache.set("rate:b", "2", time.time() - 1)
+    cache.set("token:a", "3", time.time() + 60)
+
+    assert [(key, value) for key, value, _ in cache.items("rate:")] == [("rate:a", "1")]
+
+
+def test_memory_cache_coalesces_concurrent_computes():
+    cache = MemoryCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "value", time.time() + 60
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_sqlite_cache_coalesces_across_instances(tmp_path):
+    # Separate instances have separate connections, as separate processes would
+    caches = [SQLiteCache(tmp_path / "cache.db", poll_interval=0.01) for _ in range(8)]
+    lock = threading.Lock()
+    calls = []
+
+    def compute():
+        with lock:
+            calls.append(1)
+        time.sleep(0.05)
+        return "value", time.time() + 60
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda c=c: results.append(c.get_or_compute("k", compute)))
+        for c in caches
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == ["value"] * 8
+    assert len(calls) == 1
+
+
+def test_sqlite_cache_takes_over_lapsed_leases(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.db", lease_seconds=0.05, poll_interval=0.01)
+    # A lease left behind by a worker that died while computing
+    assert cache._get_or_lease("k", "dead-worker") == (None, True)
+
+    assert cache.get_or_compute("k", lambda: ("value", time.time() + 60)) == "value"
+
+
+def test_sqlite_cache_purges_after_computed_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(caching, "_PURGE_EVERY_N_WRITES", 2)
+    cache = SQLiteCache(tmp_path / "cache.db")
+    cache.set("old", "v", time.time() - 1)
+
+    cache.get_or_compute("a", lambda: ("v", time.time() + 60))
+
+    assert cache._connect().execute("SELECT key FROM entries").fetchall() == [("a",)]
+
+
+def test_sqlite_cache_counts_writes_from_every_thread(tmp_path):
+    cache = SQLiteCache(tmp_path / "cache.db")
+
+    def write(n):
+        for i in range(50):
+            cache.set(f"{n}-{i}", "v", time.time() + 60)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache._writes == 400
+
+
+def test_pickling(tmp_path):
+    memory = MemoryCache()
+    memory.set("k", "v", time.time() + 60)
+    assert pickle.loads(pickle.dumps(memory)).get("k") is None
+
+    sqlite = SQLiteCache(tmp_path / "cache.db")
+    sqlite.set("k", "v", time.time() + 60)
+    assert pickle.loads(pickle.dumps(sqlite)).get("k") == "v"
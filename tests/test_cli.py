@@ -0,0 +1,101 @@
+import io
+import json
+import pytest
+from unittest.mock import MagicMock
+from tollbit import cli
+from tollbit.use_content.client import UseContentClient
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.errors import ServerError
+from tollbit._apis.models import CreateSubdomainAccessTokenResponse
+from test_helpers.stub_api_responses import stub_rate_response, stub_content_response
+
+
+@pytest.fixture
+def content_api(monkeypatch):
+    content_api = MagicMock(spec=ContentAPI)
+    token_api = MagicMock(spec=TokenAPI)
+    token_api.user_agent = "test-agent"
+    token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(token="token")
+    created = {}
+
+    def create_client(secret_key, user_agent):
+        created.update(secret_key=secret_key, user_agent=user_agent)
+        return UseContentClient(content_api=content_api, token_api=token_api)
+
+    monkeypatch.setattr(cli, "create_client", create_client)
+    monkeypatch.setenv("TOLLBIT_ORG_API_KEY", "key-1, key-2")
+    monkeypatch.setenv("TOLLBIT_USER_AGENT", "test-agent")
+    content_api.created = created
+    return content_api
+
+
+def test_rates_reads_urls_from_stdin(content_api, monkeypatch, capsys):
+    def get_rate(path):
+        if path == "example.com/b":
+            raise ServerError("down")
+        return [stub_rate_response()]
+
+    content_api.get_rate.side_effect = get_rate
+    monkeypatch.setattr(
+        "sys.stdin", io.StringIO("https://example.com/a\n\n# skipped\nhttps://example.com/b\n")
+    )
+
+    assert cli.main(["rates"]) == 1
+
+    out, err = capsys.readouterr()
+    rows = {row["url"]: row for row in map(json.loads, out.splitlines())}
+    assert rows["https://example.com/a"]["rates"][0]["license"]["licenseType"] == "STANDARD"
+    assert rows["https://example.com/b"]["error"] == {"type": "ServerError", "message": "down"}
+    assert "2 URLs (1 ok, 1 failed)" in err
+    assert content_api.created == {"secret_key": ["key-1", "key-2"], "user_agent": "test-agent"}
+
+
+def test_fetch_writes_content_and_spend(content_api, tmp_path, capsys):
+    content = stub_content_response()
+    content.rate.price.price_micros = 2500
+    content_api.get_content.return_value = [content]
+    urls = tmp_path / "urls.txt"
+    urls.write_text("https://example.com/a\nhttps://example.com/b\n")
+    output = tmp_path / "out.jsonl"
+
+    code = cli.main(
+        ["fetch", str(urls), "-o", str(output), "--max-price-micros", "5000", "--adaptive"]
+    )
+
+    assert code == 0
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row["url"] for row in rows) == ["https://example.com/a", "https://example.com/b"]
+    assert rows[0]["content"]["content"]["main"] == "<main>Main Content</main>"
+    assert "spent 0.005000 USD" in capsys.readouterr().err
+
+
+def test_requires_api_key(monkeypatch, capsys):
+    monkeypatch.delenv("TOLLBIT_ORG_API_KEY", raising=False)
+    monkeypatch.setenv("TOLLBIT_USER_AGENT", "test-agent")
+
+    assert cli.main(["rates"]) == 2
+    assert "API key" in capsys.readouterr().err
+
+
+def test_rejects_empty_api_keys(monkeypatch, capsys):
+    monkeypatch.setenv("TOLLBIT_USER_AGENT", "test-agent")
+
+    assert cli.main(["rates", "--api-key", " , ,"]) == 2
+    assert "API key" in capsys.readouterr().err
+
+
+def test_max_rps_spaces_out_urls(content_api, monkeypatch, capsys):
+    content_api.get_rate.return_value = [stub_rate_response()]
+    monkeypatch.setattr("sys.stdin", io.StringIO("https://example.com/a\nhttps://example.com/b\n"))
+    sleeps = []
+    monkeypatch.setattr(cli.time, "sleep", sleeps.append)
+
+    assert cli.main(["rates", "--max-rps", "4"]) == 0
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 0.25
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+
+def test_rejects_unknown_license_type(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["fetch", "--max-price-micros", "1", "--license-type", "FREE"])
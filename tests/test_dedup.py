@@ -0,0 +1,43 @@
+from test_helpers.stub_api_responses import stub_content_response
+from tollbit.dedup import ArticleKey, DedupIndex, _HashSet
+
+
+def test_hash_set_grows_and_keeps_values():
+    table = _HashSet(capacity=4)
+    for value in range(1, 1000):
+        assert table.add(value * 7919) is False
+
+    assert len(table) == 999
+    assert all(value * 7919 in table for value in range(1, 1000))
+    assert 13 not in table
+    assert table.add(7919) is True
+
+
+def test_add_detects_syndicated_copies():
+    index = DedupIndex()
+    original = stub_content_response()
+    copy = stub_content_response()
+    copy.content.main = "<main>Same story, different markup</main>"
+    copy.metadata.title = "  SAMPLE   title "
+
+    assert index.add("example.com/a", original) is False
+    assert index.add("syndicator.com/b", copy) is True
+    assert index.contains_url("syndicator.com/b")
+    assert index.contains_content("<main>Main Content</main>")
+    assert index.contains_article(ArticleKey("Sample Title", "Author Name", "2024-01-01T00:00:00Z"))
+    assert not index.contains_article(ArticleKey("Another Title"))
+
+
+def test_save_and_load(tmp_path):
+    index = DedupIndex()
+    for i in range(2000):
+        index._urls.add(i + 1)
+    index.add("example.com/a", stub_content_response())
+    index.save(tmp_path / "index.bin")
+
+    loaded = DedupIndex.load(tmp_path / "index.bin")
+
+    assert len(loaded) == 2001
+    assert loaded.contains_url("example.com/a")
+    assert loaded.contains_content("<main>Main Content</main>")
+    assert all(i + 1 in loaded._urls for i in range(2000))
@@ -0,0 +1,121 @@
+import threading
+import time
+import pytest
+import requests
+from tollbit._apis.transport import Transport
+from tollbit.hedging import HedgeBudget, HedgePolicy, LatencyTracker
+
+
+def test_tracker_reports_percentile_once_enough_samples():
+    tracker = LatencyTracker(HedgePolicy(percentile=90, min_samples=10, window=10, min_delay=0))
+    for i in range(9):
+        tracker.add("rate", i / 100)
+    assert tracker.threshold("rate") is None
+
+    tracker.add("rate", 0.09)
+    assert tracker.threshold("rate") == 0.09
+    assert tracker.threshold("content") is None
+
+
+def test_budget_caps_hedge_ratio():
+    budget = HedgeBudget(max_ratio=0.1)
+    for _ in range(20):
+        budget.count_request()
+
+    assert [budget.try_hedge() for _ in range(3)] == [True, True, False]
+
+
+def test_policy_validates_settings():
+    with pytest.raises(ValueError):
+        HedgePolicy(percentile=100)
+    with pytest.raises(ValueError):
+        HedgePolicy(min_samples=10, window=5)
+
+
+def _hedged_transport(monkeypatch, test_env, slow_call):
+    calls = []
+    slow = threading.Event()
+
+    def fake_get(self, url, headers=None):
+        calls.append(threading.current_thread().name)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"fast"
+        if slow.is_set() and len(calls) == 6:
+            return slow_call(response)
+        return response
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    policy = HedgePolicy(min_samples=5, window=5, max_ratio=1.0, min_delay=0.01)
+    transport = Transport(test_env, hedging=policy)
+    for _ in range(5):
+        transport.get("/a", headers={}, hedge=True)
+    slow.set()
+    return transport, calls
+
+
+def test_slow_requests_are_beaten_by_the_hedge(monkeypatch, test_env):
+    def slow_success(response):
+        time.sleep(0.5)
+        response._content = b"slow"
+        return response
+
+    transport, calls = _hedged_transport(monkeypatch, test_env, slow_success)
+    start = time.perf_counter()
+    response = transport.get("/a", headers={}, hedge=True)
+
+    assert response.content == b"fast"
+    assert time.perf_counter() - start < 0.4
+    assert len(calls) == 7
+    counters = transport.metrics.snapshot()["counters"]
+    assert counters["tollbit_hedges_total"][0]["value"] == 1
+    assert counters["tollbit_hedge_wins_total"][0]["value"] == 1
+    transport.close()
+
+
+def test_slow_failing_requests_fall_back_to_the_hedge(monkeypatch, test_env):
+    def slow_failure(response):
+        time.sleep(0.2)
+        raise requests.ConnectionError("reset")
+
+    transport, calls = _hedged_transport(monkeypatch, test_env, slow_failure)
+    response = transport.get("/a", headers={}, hedge=True)
+
+    assert response.content == b"fast"
+    # Neither attempt ran on the calling thread
+    assert calls[5].startswith("tollbit-hedge") and calls[6].startswith("tollbit-hedge")
+    transport.close()
+
+
+def test_hedged_requests_fail_once_every_attempt_has(monkeypatch, test_env):
+    transport, calls = _hedged_transport(monkeypatch, test_env, lambda response: None)
+
+    def failing_get(self, url, headers=None):
+        calls.append(url)
+        time.sleep(0.05)
+        raise requests.ConnectionError("reset")
+
+    monkeypatch.setattr(requests.Session, "get", failing_get)
+    with pytest.raises(requests.ConnectionError):
+        transport.get("/a", headers={}, hedge=True)
+
+    assert len(calls) == 7
+    transport.close()
+
+
+def test_requests_are_not_hedged_unless_asked(monkeypatch, test_env):
+    calls = []
+
+    def fake_get(self, url, headers=None):
+        calls.append(url)
+        time.sleep(0.02)
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    monkeypatch.setattr(requests.Session, "get", fake_get)
+    transport = Transport(test_env, hedging=HedgePolicy(min_samples=1, window=1, max_ratio=1.0))
+    for _ in range(3):
+        transport.get("/a", headers={})
+
+    assert len(calls) == 3
@@ -0,0 +1,104 @@
+import pickle
+from datetime import datetime, timedelta, timezone
+import pytest
+from tollbit.license_paths import LicensePathIndex
+from test_helpers.stub_api_responses import stub_rate_response
+
+
+def _rate(license_path, license_type="STANDARD", valid_for=timedelta(hours=1), error=""):
+    rate = stub_rate_response()
+    rate.license.licensePath = license_path
+    rate.license.licenseType = license_type
+    rate.license.validUntil = datetime.now(timezone.utc) + valid_for
+    rate.error = error
+    return rate
+
+
+def test_lookup_answers_paths_under_a_learned_prefix():
+    index = LicensePathIndex()
+    rate = _rate("/news")
+    index.learn("example.com/news/2024/story", [rate])
+
+    assert index.lookup("example.com/news/other") == [rate]
+    assert index.lookup("example.com/news") == [rate]
+    assert index.lookup("example.com/newsletter") is None
+    assert index.lookup("example.com/sports/game") is None
+    assert index.lookup("other.com/news/other") is None
+
+
+def test_lookup_collects_rates_from_every_prefix():
+    index = LicensePathIndex()
+    site, news = _rate("/*"), _rate("https://example.com/news", license_type="AI_TRAINING")
+    index.learn("example.com/news/story", [site, news])
+
+    assert index.lookup("example.com/news/another") == [site, news]
+    assert index.lookup("example.com/about") == [site]
+
+
+def test_learn_skips_responses_not_explained_by_prefixes():
+    index = LicensePathIndex()
+    index.learn("example.com/news/story", [_rate("/news"), _rate("/licenses/standard")])
+    index.learn("example.com/a", [_rate("https://elsewhere.com/a")])
+
+    assert index.lookup("example.com/news/other") is None
+    assert index.lookup("example.com/a") is None
+
+
+def test_learn_ignores_rates_with_errors_and_replaces_same_license():
+    index = LicensePathIndex()
+    index.learn("example.com/a", [_rate("/", error="unavailable")])
+    assert index.lookup("example.com/a") is None
+
+    old, new = _rate("/"), _rate("/", valid_for=timedelta(hours=2))
+    index.learn("example.com/a", [old])
+    index.learn("example.com/b", [new])
+    assert index.lookup("example.com/c") == [new]
+
+
+def test_learn_keeps_the_same_license_type_in_other_currencies():
+    index = LicensePathIndex()
+    usd, eur = _rate("/"), _rate("/")
+    eur.price.currency = "EUR"
+    index.learn("example.com/a", [usd, eur])
+
+    assert index.lookup("example.com/b") == [usd, eur]
+
+
+def test_learn_matches_absolute_license_paths_on_ipv6_hosts():
+    index = LicensePathIndex()
+    rate = _rate("http://[::1]:8080/news")
+    index.learn("[::1]:8080/news/story", [rate])
+
+    assert index.lookup("[::1]:8080/news/other") == [rate]
+
+
+def test_expired_rates_are_not_returned():
+    index = LicensePathIndex()
+    index.learn("example.com/a", [_rate("/", valid_for=timedelta(seconds=-1))])
+
+    assert index.lookup("example.com/a") is None
+
+
+def test_forget_drops_a_domain():
+    index = LicensePathIndex()
+    index.learn("example.com/a", [_rate("/")])
+    index.learn("other.com/a", [_rate("/")])
+    index.forget("example.com")
+
+    assert index.lookup("example.com/a") is None
+    assert index.lookup("other.com/a") is not None
+
+
+def test_should_verify_follows_verify_rate():
+    assert not LicensePathIndex(verify_rate=0).should_verify()
+    assert LicensePathIndex(verify_rate=1).should_verify()
+    with pytest.raises(ValueError):
+        LicensePathIndex(verify_rate=2)
+
+
+def test_index_survives_pickling():
+    index = LicensePathIndex()
+    index.learn("example.com/a", [_rate("/")])
+
+    restored = pickle.loads(pickle.dumps(index))
+    assert restored.lookup("example.com/b") == index.lookup("example.com/b")
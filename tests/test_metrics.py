@@ -0,0 +1,113 @@
+import pickle
+import threading
+import requests
+from tollbit._apis.transport import Transport
+from tollbit.metrics import Metrics, prometheus_text
+
+
+def _counter(snapshot, name, **labels):
+    for sample in snapshot["counters"].get(name, []):
+        if sample["labels"] == labels:
+            return sample["value"]
+    return None
+
+
+def test_counters_are_merged_across_threads():
+    metrics = Metrics()
+
+    def work():
+        for _ in range(1000):
+            metrics.inc("requests", endpoint="rate")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.inc("spend", 250, currency="USD")
+
+    snapshot = metrics.snapshot()
+    assert _counter(snapshot, "requests", endpoint="rate") == 4000
+    assert _counter(snapshot, "spend", currency="USD") == 250
+
+
+def test_shards_of_exited_threads_are_folded_together():
+    metrics = Metrics()
+
+    def work():
+        metrics.inc("requests", endpoint="rate")
+        metrics.observe("latency", 0.01)
+
+    for _ in range(10):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+    snapshot = metrics.snapshot()
+    assert _counter(snapshot, "requests", endpoint="rate") == 10
+    assert snapshot["histograms"]["latency"][0]["count"] == 10
+    assert metrics._shards == []
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        metrics.observe("latency", value, endpoint="rate")
+
+    (sample,) = metrics.snapshot()["histograms"]["latency"]
+    assert sample["buckets"] == [[0.1, 1], [1.0, 3], ["+Inf", 4]]
+    assert sample["count"] == 4
+    assert sample["sum"] == 6.05
+
+
+def test_prometheus_text():
+    metrics = Metrics(buckets=(0.5,))
+    metrics.inc("tollbit_requests_total", endpoint="/dev/v1/rate", status="200")
+    metrics.observe("tollbit_request_seconds", 0.25, endpoint='say "hi"')
+
+    assert prometheus_text(metrics.snapshot()) == (
+        "# TYPE tollbit_requests_total counter\n"
+        'tollbit_requests_total{endpoint="/dev/v1/rate",status="200"} 1\n'
+        "# TYPE tollbit_request_seconds histogram\n"
+        'tollbit_request_seconds_bucket{endpoint="say \\"hi\\"",le="0.5"} 1\n'
+        'tollbit_request_seconds_bucket{endpoint="say \\"hi\\"",le="+Inf"} 1\n'
+        'tollbit_request_seconds_sum{endpoint="say \\"hi\\""} 0.25\n'
+        'tollbit_request_seconds_count{endpoint="say \\"hi\\""} 1\n'
+    )
+
+
+def test_unpickled_metrics_start_empty():
+    metrics = Metrics(buckets=(1.0,))
+    metrics.inc("requests")
+
+    copy = pickle.loads(pickle.dumps(metrics))
+
+    assert copy.buckets == (1.0,)
+    assert copy.snapshot() == {"counters": {}, "histograms": {}}
+
+
+def test_transport_records_requests(monkeypatch, test_env):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b"[]"
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, headers=None: response)
+
+    transport = Transport(test_env)
+    transport.get("/dev/v1/rate/example.com", headers={}, endpoint="/dev/v1/rate/<PATH>")
+
+    def fail(self, url, headers=None):
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(requests.Session, "get", fail)
+    try:
+        transport.get("/dev/v1/rate/example.com", headers={}, endpoint="/dev/v1/rate/<PATH>")
+    except requests.ConnectionError:
+        pass
+
+    snapshot = transport.metrics.snapshot()
+    endpoint = "/dev/v1/rate/<PATH>"
+    assert _counter(snapshot, "tollbit_requests_total", endpoint=endpoint, status="200") == 1
+    assert _counter(snapshot, "tollbit_requests_total", endpoint=endpoint, status="error") == 1
+    assert _counter(snapshot, "tollbit_response_bytes_total", endpoint=endpoint) == 2
+    (latency,) = snapshot["histograms"]["tollbit_request_seconds"]
+    assert latency["count"] == 1
@@ -0,0 +1,123 @@
+import json
+import pytest
+from tollbit import cli
+from tollbit._apis.errors import ServerError
+from tollbit.replay import StandInGateway, replay, replay_client, summarize
+from tollbit.traffic import TrafficRecord
+
+_RATE = "/dev/v1/rate/<PATH>"
+_CONTENT = "/dev/v1/content/<PATH>"
+_TOKEN = "/dev/v2/tokens/content"
+
+
+def _records():
+    return [
+        TrafficRecord(100.0, "GET", _RATE, "/dev/v1/rate/example.com/a", 200, 0, 400, 0.01, 0.02),
+        TrafficRecord(100.05, "POST", _TOKEN, _TOKEN, 200, 300, 900, 0.01, 0.01),
+        TrafficRecord(
+            100.1, "GET", _CONTENT, "/dev/v1/content/example.com/a", 200, 0, 5000, 0.01, 0.03
+        ),
+        TrafficRecord(100.1, "GET", _RATE, "/dev/v1/rate/example.com/b", 500, 0, 40, 0.0, 0.0),
+        TrafficRecord(
+            100.2, "GET", _RATE, "/dev/v1/rate/example.com/c", "error", 0, 0, 0.0, 0.0, "Timeout"
+        ),
+    ]
+
+
+def test_replay_reproduces_recorded_responses():
+    records = _records()
+    with StandInGateway(records, speed=2.0).start() as gateway:
+        with replay_client(gateway) as client:
+            results = replay(records, client, speed=2.0)
+
+    assert [result.record for result in results] == records
+    assert [result.error is None for result in results] == [True, True, True, False, False]
+    assert isinstance(results[3].error, ServerError)
+    assert isinstance(results[4].error, ServerError)
+    assert gateway.unmatched == 0
+    # Stand-in bodies are the recorded size
+    sizes = {
+        c["labels"]["endpoint"]: c["value"]
+        for c in client.stats()["counters"]["tollbit_response_bytes_total"]
+    }
+    assert sizes == {_RATE: 400 + 40, _TOKEN: 900, _CONTENT: 5000}
+
+
+def test_replay_uses_recorded_bodies():
+    body = json.dumps({"token": "REDACTED"})
+    request_body = json.dumps(
+        {
+            "url": "https://example.com/a",
+            "userAgent": "agent",
+            "maxPriceMicros": 5,
+            "currency": "USD",
+            "licenseType": "ON_DEMAND_LICENSE",
+            "licenseCuid": "",
+            "format": "markdown",
+        }
+    )
+    record = TrafficRecord(
+        1.0, "POST", _TOKEN, _TOKEN, 200, 0, 0, 0.0, 0.0, None, request_body, body
+    )
+    with StandInGateway([record]).start() as gateway:
+        with replay_client(gateway) as client:
+            (result,) = replay([record], client)
+
+    assert result.error is None
+
+
+def test_replay_mints_tokens_for_the_recorded_page():
+    record = TrafficRecord(
+        1.0, "POST", _TOKEN, _TOKEN, 200, 300, 900, 0.0, 0.0, page_url="https://example.com/a"
+    )
+    requests = []
+    with StandInGateway([record]).start() as gateway:
+        with replay_client(gateway) as client:
+            mint = client.token_api.get_content_token
+            client.token_api.get_content_token = lambda req: requests.append(req) or mint(req)
+            (result,) = replay([record], client)
+
+    assert result.error is None
+    assert [str(req.url) for req in requests] == ["https://example.com/a"]
+
+
+def test_unmatched_requests_get_a_404():
+    with StandInGateway([]).start() as gateway:
+        with replay_client(gateway) as client:
+            record = TrafficRecord(1.0, "GET", _RATE, "/dev/v1/rate/x.com", 200, 0, 0, 0.0, 0.0)
+            (result,) = replay([record], client)
+
+    assert result.error is not None
+    assert gateway.unmatched == 1
+
+
+def test_summarize_counts_requests_and_errors_by_endpoint():
+    records = _records()
+    with StandInGateway(records, speed=10.0).start() as gateway:
+        with replay_client(gateway) as client:
+            summary = summarize(replay(records, client, speed=10.0))
+
+    assert {endpoint: (s["requests"], s["errors"]) for endpoint, s in summary.items()} == {
+        _RATE: (3, 2),
+        _TOKEN: (1, 0),
+        _CONTENT: (1, 0),
+    }
+    assert summary[_CONTENT]["recorded_p50_seconds"] == 0.03
+
+
+def test_cli_replays_a_journal(tmp_path, capsys):
+    journal = tmp_path / "traffic.jsonl"
+    journal.write_text("".join(json.dumps(r._asdict()) + "\n" for r in _records()))
+
+    assert cli.main(["replay", str(journal), "--speed", "10"]) == 0
+
+    out, err = capsys.readouterr()
+    rows = {row["endpoint"]: row for row in map(json.loads, out.splitlines())}
+    assert rows[_RATE]["requests"] == 3
+    assert "replayed 5 requests" in err
+
+
+@pytest.mark.parametrize("speed", [0, -1])
+def test_speed_must_be_positive(speed):
+    with pytest.raises(ValueError):
+        StandInGateway([], speed=speed)
@@ -0,0 +1,156 @@
+import pytest
+import requests
+from unittest.mock import MagicMock
+from test_helpers.stub_api_responses import stub_content_response
+from tollbit import currencies, licences
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.models import CreateSubdomainAccessTokenResponse
+from tollbit._apis.token_api import TokenAPI
+from tollbit.revalidation import Revalidator, Validators
+from tollbit.use_content.client import UseContentClient
+
+
+class MockHeadResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture()
+def patch_requests_head(monkeypatch):
+    sent = []
+
+    def _patch_requests_head(response):
+        def head(self, url, headers=None, **kwargs):
+            sent.append(headers)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        monkeypatch.setattr(requests.Session, "head", head)
+        return sent
+
+    return _patch_requests_head
+
+
+def test_unknown_urls_are_changed(patch_requests_head):
+    sent = patch_requests_head(MockHeadResponse(304, {"ETag": '"v1"'}))
+
+    unchanged, validators = Revalidator().check("https://example.com/a", "example.com/a", "agent")
+
+    assert unchanged is False
+    # The page is still asked for the validators to record with the purchase
+    assert sent == [{"User-Agent": "agent"}]
+    assert validators.etag == '"v1"'
+
+
+def test_not_modified_is_unchanged(patch_requests_head):
+    sent = patch_requests_head(MockHeadResponse(304, {"ETag": '"v1"'}))
+    revalidator = Revalidator()
+    revalidator.record("example.com/a", Validators(modified="2024-01-02T00:00:00Z", etag='"v1"'))
+
+    unchanged, validators = revalidator.check("https://example.com/a", "example.com/a", "agent")
+
+    assert unchanged is True
+    assert sent[0]["If-None-Match"] == '"v1"'
+    # The content's metadata date is not a validator the page served
+    assert "If-Modified-Since" not in sent[0]
+
+
+def test_pages_without_recorded_validators_are_changed(patch_requests_head):
+    sent = patch_requests_head(MockHeadResponse(304, {"ETag": '"v1"'}))
+    revalidator = Revalidator()
+    revalidator.record("example.com/a", Validators(modified="2024-01-02T00:00:00Z"))
+
+    unchanged, validators = revalidator.check("https://example.com/a", "example.com/a", "agent")
+
+    assert unchanged is False
+    assert "If-None-Match" not in sent[0] and "If-Modified-Since" not in sent[0]
+    assert validators.etag == '"v1"'
+
+
+@pytest.mark.parametrize(
+    "recorded, last_modified, expected",
+    [
+        ("Tue, 02 Jan 2024 00:00:00 GMT", "Mon, 01 Jan 2024 00:00:00 GMT", True),
+        ("Tue, 02 Jan 2024 00:00:00 GMT", "Tue, 02 Jan 2024 00:00:00 GMT", True),
+        ("Tue, 02 Jan 2024 00:00:00 GMT", "Wed, 03 Jan 2024 00:00:00 GMT", False),
+        # The content's metadata date is not a validator the page served
+        (None, "Mon, 01 Jan 2024 00:00:00 GMT", False),
+    ],
+)
+def test_last_modified_is_compared_with_recorded_last_modified(
+    patch_requests_head, recorded, last_modified, expected
+):
+    patch_requests_head(MockHeadResponse(200, {"Last-Modified": last_modified}))
+    revalidator = Revalidator()
+    revalidator.record(
+        "example.com/a", Validators(modified="2024-01-02T00:00:00Z", last_modified=recorded)
+    )
+
+    unchanged, _ = revalidator.check("https://example.com/a", "example.com/a", "agent")
+    assert unchanged is expected
+
+
+def test_changed_validators_are_recorded_only_after_purchase(patch_requests_head):
+    patch_requests_head(MockHeadResponse(200, {"ETag": '"v2"'}))
+    revalidator = Revalidator()
+    revalidator.record("example.com/a", Validators(etag='"v1"'))
+
+    unchanged, validators = revalidator.check("https://example.com/a", "example.com/a", "agent")
+    assert unchanged is False
+    assert revalidator.get("example.com/a").etag == '"v1"'
+
+    revalidator.record_purchase("example.com/a", stub_content_response(), validators)
+    assert revalidator.get("example.com/a") == Validators(
+        modified="2024-01-02T00:00:00Z", etag='"v2"'
+    )
+
+
+def test_unreachable_pages_are_changed(patch_requests_head):
+    patch_requests_head(requests.ConnectionError("down"))
+    revalidator = Revalidator()
+    revalidator.record("example.com/a", Validators(etag='"v1"'))
+
+    assert revalidator.check("https://example.com/a", "example.com/a", "agent")[0] is False
+
+
+def test_records_persist(tmp_path):
+    path = tmp_path / "validators.jsonl"
+    revalidator = Revalidator(path)
+    revalidator.record("example.com/a", Validators(etag='"v1"'))
+    revalidator.record("example.com/a", Validators(etag='"v2"'))
+    revalidator.record("example.com/b", Validators(modified="2024-01-01T00:00:00Z"))
+    with open(path, "a") as f:
+        f.write('{"key": "torn')
+
+    assert Revalidator(path).get("example.com/a") == Validators(etag='"v2"')
+
+    revalidator.compact()
+    assert len(path.read_text().splitlines()) == 2
+
+
+def test_refresh_sanctioned_content_skips_unchanged_pages(patch_requests_head):
+    patch_requests_head(MockHeadResponse(304, {"ETag": '"v1"'}))
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_content.return_value = [stub_content_response()]
+    mock_token_api = MagicMock(spec=TokenAPI)
+    mock_token_api.user_agent = "test-agent"
+    mock_token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(
+        token="tok_123"
+    )
+    client = UseContentClient(
+        content_api=mock_content_api, token_api=mock_token_api, revalidator=Revalidator()
+    )
+    kwargs = dict(
+        max_price_micros=1000000,
+        currency=currencies.USD,
+        license_type=licences.ON_DEMAND_LICENSE,
+    )
+
+    first = client.refresh_sanctioned_content("https://example.com/a", **kwargs)
+    second = client.refresh_sanctioned_content("https://example.com/a", **kwargs)
+
+    assert first == stub_content_response()
+    assert second is None
+    mock_token_api.get_content_token.assert_called_once()
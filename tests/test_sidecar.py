@@ -0,0 +1,147 @@
+import http.client
+import json
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from tollbit.sidecar import Sidecar
+from tollbit.use_content.client import UseContentClient
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.errors import ServerError
+from tollbit._apis.models import CreateSubdomainAccessTokenResponse
+from tollbit.dedup import DedupIndex
+from test_helpers.stub_api_responses import stub_content_response, stub_rate_response
+
+_CONTENT_REQUEST = {
+    "url": "https://example.com/a",
+    "max_price_micros": 1000,
+    "license_type": "ON_DEMAND_LICENSE",
+}
+
+
+@pytest.fixture
+def content_api():
+    content_api = MagicMock(spec=ContentAPI)
+    content_api.get_rate.return_value = [stub_rate_response()]
+    content_api.get_content.return_value = [stub_content_response()]
+    return content_api
+
+
+def _sidecar(content_api, **kwargs):
+    token_api = MagicMock(spec=TokenAPI)
+    token_api.user_agent = "test-agent"
+    token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(token="token")
+    client = UseContentClient(content_api=content_api, token_api=token_api, **kwargs)
+    return Sidecar(client, port=0).start()
+
+
+def _request(sidecar, path, body=None):
+    host, port = sidecar.address
+    data = None if body is None else json.dumps(body).encode()
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_rate_and_content_endpoints(content_api):
+    with _sidecar(content_api) as sidecar:
+        status, body = _request(sidecar, "/v1/rate?url=https%3A%2F%2Fexample.com%2Fa")
+        assert status == 200
+        assert json.loads(body)["rates"][0]["license"]["licenseType"] == "STANDARD"
+
+        status, body = _request(sidecar, "/v1/content", _CONTENT_REQUEST)
+        assert status == 200
+        assert json.loads(body)["content"]["content"]["main"] == "<main>Main Content</main>"
+
+        assert _request(sidecar, "/healthz") == (200, b"ok")
+        status, body = _request(sidecar, "/metrics")
+        assert b'tollbit_sidecar_requests_total{endpoint="content",status="200"} 1' in body
+
+
+def test_recent_content_is_not_bought_again(content_api):
+    with _sidecar(content_api) as sidecar:
+        for url in ("https://example.com/a", "https://EXAMPLE.com/a/"):
+            status, _ = _request(sidecar, "/v1/content", {**_CONTENT_REQUEST, "url": url})
+            assert status == 200
+
+    content_api.get_content.assert_called_once()
+
+
+def test_concurrent_requests_are_coalesced(content_api):
+    started, release = threading.Event(), threading.Event()
+
+    def get_rate(content):
+        started.set()
+        release.wait(5)
+        return [stub_rate_response()]
+
+    content_api.get_rate.side_effect = get_rate
+    with _sidecar(content_api) as sidecar, ThreadPoolExecutor(4) as pool:
+        first = pool.submit(_request, sidecar, "/v1/rate?url=example.com/a")
+        started.wait(5)
+        others = [pool.submit(_request, sidecar, "/v1/rate?url=example.com/a") for _ in range(3)]
+        # Give the other requests time to join the call in flight
+        threading.Event().wait(0.2)
+        release.set()
+        assert all(f.result()[0] == 200 for f in [first, *others])
+
+    content_api.get_rate.assert_called_once()
+
+
+def test_errors(content_api):
+    content_api.get_rate.side_effect = ServerError("down")
+    with _sidecar(content_api, dedup_index=DedupIndex()) as sidecar:
+        assert _request(sidecar, "/v1/rate")[0] == 400
+        assert _request(sidecar, "/v1/rate?url=example.com/a")[0] == 502
+        assert _request(sidecar, "/v1/other")[0] == 404
+        status, body = _request(sidecar, "/v1/content", {"url": "https://example.com/a"})
+        assert status == 400
+        assert json.loads(body)["error"]["type"] == "BadRequestError"
+        bad_licence = {**_CONTENT_REQUEST, "license_type": "FREE"}
+        assert _request(sidecar, "/v1/content", bad_licence)[0] == 400
+
+        assert _request(sidecar, "/v1/content", _CONTENT_REQUEST)[0] == 200
+        sidecar._recent.clear()
+        assert _request(sidecar, "/v1/content", _CONTENT_REQUEST)[0] == 409
+
+
+def test_malformed_urls_are_bad_requests(content_api):
+    with _sidecar(content_api) as sidecar:
+        assert _request(sidecar, "/v1/rate?url=https://example.com:port/a")[0] == 400
+        bad_url = {**_CONTENT_REQUEST, "url": "https://example.com:port/a"}
+        assert _request(sidecar, "/v1/content", bad_url)[0] == 400
+    content_api.get_rate.assert_not_called()
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_invalid_content_length_is_a_bad_request(content_api, length):
+    with _sidecar(content_api) as sidecar:
+        connection = http.client.HTTPConnection(*sidecar.address, timeout=5)
+        connection.putrequest("POST", "/v1/content")
+        connection.putheader("Content-Length", length)
+        connection.endheaders()
+        response = connection.getresponse()
+
+        assert response.status == 400
+        assert response.getheader("Connection") == "close"
+        connection.close()
+
+
+def test_unknown_post_endpoint_keeps_the_connection_usable(content_api):
+    with _sidecar(content_api) as sidecar:
+        connection = http.client.HTTPConnection(*sidecar.address, timeout=5)
+        connection.request("POST", "/v1/other", body=json.dumps(_CONTENT_REQUEST))
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 404
+
+        connection.request("GET", "/healthz")
+        response = connection.getresponse()
+        assert (response.status, response.read()) == (200, b"ok")
+        connection.close()
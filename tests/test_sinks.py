@@ -0,0 +1,75 @@
+import gzip
+import json
+import pytest
+from test_helpers.stub_api_responses import stub_content_response
+from tollbit import sinks
+from tollbit._apis.errors import ServerError
+
+
+def _read_jsonl(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_sink_writes_rows_in_batches(tmp_path):
+    with sinks.JSONLSink(tmp_path, batch_size=2) as sink:
+        for i in range(3):
+            sink.write(f"https://example.com/{i}", stub_content_response())
+        # Only full batches are written before the sink is closed
+        assert len(sink._rows) == 1
+
+    rows = [row for path in sink.files for row in _read_jsonl(path)]
+    assert [row["url"] for row in rows] == [f"https://example.com/{i}" for i in range(3)]
+    assert set(rows[0]) == set(sinks.COLUMNS)
+    assert rows[0]["main"] == "<main>Main Content</main>"
+    assert rows[0]["price_micros"] == 0
+    assert rows[0]["license_type"] == "STANDARD"
+    assert rows[0]["image_url"] == "https://example.com/image.png"
+
+
+def test_jsonl_sink_rotates_files_by_size(tmp_path):
+    with sinks.JSONLSink(tmp_path, batch_size=1, max_file_bytes=1, compress=False) as sink:
+        for i in range(3):
+            sink.write(f"https://example.com/{i}", stub_content_response())
+
+    assert [p.rsplit("/", 1)[1] for p in sink.files] == [
+        "content-00000.jsonl",
+        "content-00001.jsonl",
+        "content-00002.jsonl",
+    ]
+
+
+def test_consume_writes_successes_and_passes_everything_through(tmp_path):
+    error = ServerError("boom")
+    results = [
+        ("https://example.com/ok", stub_content_response()),
+        ("https://example.com/broken", error),
+    ]
+
+    with sinks.JSONLSink(tmp_path) as sink:
+        assert list(sink.consume(iter(results))) == results
+
+    assert [row["url"] for row in _read_jsonl(sink.files[0])] == ["https://example.com/ok"]
+
+
+def test_parquet_sink(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    with sinks.ParquetSink(tmp_path, batch_size=2) as sink:
+        for i in range(3):
+            sink.write(f"https://example.com/{i}", stub_content_response())
+
+    table = pq.read_table(sink.files[0])
+    assert table.column_names == list(sinks.COLUMNS)
+    assert table.num_rows == 3
+
+
+def test_sink_missing_a_file_method_cannot_be_created(tmp_path):
+    class Incomplete(sinks._Sink):
+        extension = ".txt"
+
+        def _is_open(self):
+            return False
+
+    with pytest.raises(TypeError):
+        Incomplete(tmp_path)
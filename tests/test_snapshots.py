@@ -0,0 +1,94 @@
+import pickle
+import time
+import pytest
+from unittest.mock import MagicMock
+from tollbit.caching import MemoryCache
+from tollbit.snapshots import (
+    RateSnapshot,
+    SnapshotFormatError,
+    export_rate_snapshot,
+    write_rate_snapshot,
+)
+from tollbit.use_content.client import UseContentClient
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.token_api import TokenAPI
+
+
+def test_export_and_load_rates_from_cache(tmp_path):
+    cache = MemoryCache()
+    cache.set("rate:example.com/a", '[{"a": 1}]', time.time() + 60)
+    cache.set("rate:example.com/b", "[]", time.time() + 60)
+    cache.set("token:content:x", "secret", time.time() + 60)
+    path = tmp_path / "rates.snap"
+
+    assert export_rate_snapshot(cache, path) == 2
+
+    with RateSnapshot(path) as snapshot:
+        assert len(snapshot) == 2
+        assert snapshot.get("example.com/a") == '[{"a": 1}]'
+        assert snapshot.get("example.com/b") == "[]"
+        assert snapshot.get("example.com/c") is None
+        assert snapshot.get("token:content:x") is None
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    path = tmp_path / "rates.snap"
+    write_rate_snapshot(
+        path,
+        [("example.com/old", "[]", time.time() - 1), ("example.com/new", "[]", time.time() + 60)],
+    )
+
+    snapshot = RateSnapshot(path)
+    assert snapshot.get("example.com/old") is None
+    assert snapshot.get("example.com/new") == "[]"
+    assert len(snapshot) == 1
+
+
+def test_lookup_finds_every_entry(tmp_path):
+    path = tmp_path / "rates.snap"
+    entries = [(f"site{i}.com/ünïcode/{i}", f'["{i}"]', time.time() + 60) for i in range(500)]
+    write_rate_snapshot(path, reversed(entries))
+
+    snapshot = RateSnapshot(path)
+    assert all(snapshot.get(content) == value for content, value, _ in entries)
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / "rates.snap"
+    assert write_rate_snapshot(path, []) == 0
+
+    assert RateSnapshot(path).get("example.com/a") is None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "rates.snap"
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(SnapshotFormatError):
+        RateSnapshot(path)
+
+    path.write_bytes(b"")
+    with pytest.raises(SnapshotFormatError):
+        RateSnapshot(path)
+
+
+def test_snapshot_survives_pickling(tmp_path):
+    path = tmp_path / "rates.snap"
+    write_rate_snapshot(path, [("example.com/a", "[]", time.time() + 60)])
+
+    restored = pickle.loads(pickle.dumps(RateSnapshot(path)))
+    assert restored.get("example.com/a") == "[]"
+
+
+def test_closing_the_client_closes_its_snapshot(tmp_path):
+    path = tmp_path / "rates.snap"
+    write_rate_snapshot(path, [("example.com/a", "[]", time.time() + 60)])
+    snapshot = RateSnapshot(path)
+
+    with UseContentClient(
+        content_api=MagicMock(spec=ContentAPI),
+        token_api=MagicMock(spec=TokenAPI),
+        rate_snapshot=snapshot,
+    ):
+        pass
+
+    assert snapshot._map.closed
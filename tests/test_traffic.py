@@ -0,0 +1,109 @@
+import json
+import pickle
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from tollbit._apis.transport import Transport
+from tollbit._environment import Environment
+from tollbit.traffic import TrafficJournal, TrafficRecord, read_traffic, redact_fields
+
+
+@pytest.fixture()
+def base_url():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self._send(b"[]")
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self._send(b'{"token": "secret"}')
+
+        def _send(self, body):
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_transport_records_each_attempt(base_url, tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    # The first gateway refuses connections, so the request fails over to the second
+    env = Environment(developer_api_base_url="http://127.0.0.1:9", fallback_base_urls=(base_url,))
+    with TrafficJournal(path) as journal:
+        transport = Transport(env, journal=journal)
+        transport.get("/dev/v1/rate/example.com/a", headers={}, endpoint="/dev/v1/rate/<PATH>")
+        transport.post("/dev/v2/tokens/content", headers={}, json={"url": "https://example.com/a"})
+        transport.close()
+
+    failed, rate, token = read_traffic(path)
+    assert (failed.status, failed.error, failed.path) == (
+        "error",
+        "ConnectionError",
+        "/dev/v1/rate/example.com/a",
+    )
+    assert rate.endpoint == "/dev/v1/rate/<PATH>"
+    assert (rate.method, rate.status, rate.response_bytes) == ("GET", 200, 2)
+    assert 0 <= rate.headers_seconds <= rate.total_seconds
+    assert (token.method, token.endpoint, token.status) == ("POST", "/dev/v2/tokens/content", 200)
+    assert token.request_bytes == len(json.dumps({"url": "https://example.com/a"}))
+    assert token.response_bytes == len(b'{"token": "secret"}')
+    assert token.request_body is None and token.response_body is None
+    # The page a token was minted for is kept even without bodies
+    assert token.page_url == "https://example.com/a"
+    assert rate.page_url is None and failed.page_url is None
+
+
+def test_bodies_are_recorded_redacted(base_url, tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    journal = TrafficJournal(path, record_bodies=True)
+    transport = Transport(Environment(developer_api_base_url=base_url), journal=journal)
+    transport.post("/dev/v2/tokens/content", headers={}, json={"url": "https://example.com/a"})
+    transport.close()
+    journal.close()
+
+    (record,) = read_traffic(path)
+    assert json.loads(record.request_body) == {"url": "https://example.com/a"}
+    assert json.loads(record.response_body) == {"token": "REDACTED"}
+
+
+def test_redact_fields_replaces_nested_values_and_leaves_other_bodies():
+    redact = redact_fields("token", "userAgent")
+
+    assert json.loads(redact(b'[{"token": "a", "nested": {"userAgent": "b", "n": 1}}]')) == [
+        {"token": "REDACTED", "nested": {"userAgent": "REDACTED", "n": 1}}
+    ]
+    assert redact(b"not json") == b"not json"
+
+
+def test_pickled_journal_appends_to_the_same_file(tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    journal = TrafficJournal(path)
+    copy = pickle.loads(pickle.dumps(journal))
+    copy.record_failure("GET", "/e", "/p", OSError("down"), 1.0, 0.5)
+    copy.close()
+    journal.close()
+
+    assert list(read_traffic(path)) == [
+        TrafficRecord(1.0, "GET", "/e", "/p", "error", 0, 0, 0.5, 0.5, "OSError")
+    ]
+
+
+def test_read_traffic_skips_a_torn_line(tmp_path):
+    path = tmp_path / "traffic.jsonl"
+    with TrafficJournal(path) as journal:
+        journal.record_failure("GET", "/e", "/p", OSError("down"), 1.0, 0.5)
+    with open(path, "a") as f:
+        f.write('{"time": 2.0, "meth')
+
+    assert [record.time for record in read_traffic(path)] == [1.0]
@@ -1,7 +1,14 @@
 import pytest
+import asyncio
+import json
+import functools
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from tollbit.use_content.client import UseContentClient
-from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.content_api import ContentAPI, _parse_lazy_content_response
 from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.transport import Transport
 from tollbit._apis.models import ContentRate
 from unittest.mock import MagicMock
 from test_helpers.stub_api_responses import stub_rate_response, stub_content_response
@@ -13,6 +20,11 @@ from tollbit._apis.models import (
     CreateSubdomainAccessTokenResponse,
 )
 from tollbit.content_formats import Format
+from tollbit._apis.errors import ServerError
+from tollbit.caching import MemoryCache
+from tollbit.dedup import ArticleKey, DedupIndex, DuplicateContentError
+from tollbit.license_paths import LicensePathIndex
+from tollbit.snapshots import RateSnapshot, export_rate_snapshot
 
 
 @pytest.mark.parametrize(
@@ -119,3 +131,405 @@ def test_get_sanctioned_content_with_html():
     )
 
     assert result == fake_response
+
+
+def test_get_rates_deduplicates_paths():
+    fake_rate = [stub_rate_response()]
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.return_value = fake_rate
+
+    client = UseContentClient(content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI))
+    result = client.get_rates(
+        ["https://example.com/bar", "example.com/bar", "https://other.com/baz"]
+    )
+
+    assert mock_content_api.get_rate.call_count == 2
+    assert result == {
+        "https://example.com/bar": fake_rate,
+        "example.com/bar": fake_rate,
+        "https://other.com/baz": fake_rate,
+    }
+
+
+def test_get_rates_returns_errors_per_url():
+    error = ServerError("boom")
+
+    def fake_get_rate(path):
+        if path == "example.com/broken":
+            raise error
+        return [stub_rate_response()]
+
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.side_effect = fake_get_rate
+
+    client = UseContentClient(content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI))
+    result = client.get_rates(["https://example.com/broken", "https://example.com/ok"])
+
+    assert result["https://example.com/broken"] is error
+    assert isinstance(result["https://example.com/ok"], list)
+
+
+def test_get_rates_returns_malformed_urls_as_errors():
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.return_value = [stub_rate_response()]
+
+    client = UseContentClient(content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI))
+    result = client.get_rates(["https://example.com:port/bad", "https://example.com/ok"])
+
+    assert isinstance(result["https://example.com:port/bad"], ValueError)
+    assert isinstance(result["https://example.com/ok"], list)
+
+
+def test_get_rates_caps_concurrency_per_domain():
+    lock = threading.Lock()
+    in_flight: dict[str, int] = {}
+    peak: dict[str, int] = {}
+
+    def fake_get_rate(path):
+        domain = path.split("/", 1)[0]
+        with lock:
+            in_flight[domain] = in_flight.get(domain, 0) + 1
+            peak[domain] = max(peak.get(domain, 0), in_flight[domain])
+        time.sleep(0.01)
+        with lock:
+            in_flight[domain] -= 1
+        return []
+
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.side_effect = fake_get_rate
+
+    client = UseContentClient(content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI))
+    urls = [f"https://big.com/{i}" for i in range(20)] + ["https://small.com/a"]
+    client.get_rates(urls, max_workers=8, max_per_domain=2)
+
+    assert peak["big.com"] <= 2
+    assert peak["small.com"] == 1
+
+
+def test_get_rate_uses_cache():
+    fake_rate = stub_rate_response()
+    fake_rate.license.validUntil = datetime.now(timezone.utc) + timedelta(hours=1)
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.return_value = [fake_rate]
+
+    client = UseContentClient(
+        content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI), cache=MemoryCache()
+    )
+
+    assert client.get_rate("https://example.com/bar") == [fake_rate]
+    assert client.get_rates(["https://example.com/bar"]) == {"https://example.com/bar": [fake_rate]}
+    mock_content_api.get_rate.assert_called_once_with("example.com/bar")
+
+
+def test_get_sanctioned_content_caches_tokens():
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_content.return_value = [stub_content_response()]
+
+    mock_token_api = MagicMock(spec=TokenAPI)
+    mock_token_api.user_agent = "test-agent"
+    mock_token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(
+        token="tok_123"
+    )
+
+    client = UseContentClient(
+        content_api=mock_content_api, token_api=mock_token_api, cache=MemoryCache()
+    )
+    for _ in range(2):
+        client.get_sanctioned_content(
+            url="https://example.com/bar",
+            max_price_micros=1000000,
+            currency=currencies.USD,
+            license_type=licences.ON_DEMAND_LICENSE,
+        )
+
+    mock_token_api.get_content_token.assert_called_once()
+    assert mock_content_api.get_content.call_count == 2
+
+
+def test_cached_tokens_are_not_shared_between_api_keys():
+    cache = MemoryCache()
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_content.return_value = [stub_content_response()]
+    token_apis = []
+    for key in ("key-a", "key-b"):
+        token_api = MagicMock(spec=TokenAPI)
+        token_api.api_key = key
+        token_api.user_agent = "test-agent"
+        token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(
+            token=f"token-for-{key}"
+        )
+        token_apis.append(token_api)
+        UseContentClient(
+            content_api=mock_content_api, token_api=token_api, cache=cache
+        ).get_sanctioned_content(
+            url="https://example.com/bar",
+            max_price_micros=1000000,
+            currency=currencies.USD,
+            license_type=licences.ON_DEMAND_LICENSE,
+        )
+
+    for token_api in token_apis:
+        token_api.get_content_token.assert_called_once()
+    tokens = [call.kwargs["token"] for call in mock_content_api.get_content.call_args_list]
+    assert tokens == ["token-for-key-a", "token-for-key-b"]
+    assert not any("key-a" in key or "key-b" in key for key, _, _ in cache.items("token:"))
+
+
+def _content_client(get_content):
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_content.side_effect = get_content
+
+    mock_token_api = MagicMock(spec=TokenAPI)
+    mock_token_api.user_agent = "test-agent"
+    mock_token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(
+        token="tok_123"
+    )
+    return UseContentClient(content_api=mock_content_api, token_api=mock_token_api)
+
+
+def test_iter_sanctioned_content_bounds_in_flight_and_reads_lazily():
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0, "pulled": 0}
+
+    def fake_get_content(content_url, token):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(0.005)
+        with lock:
+            state["in_flight"] -= 1
+        if content_url.endswith("/13"):
+            raise ServerError("boom")
+        return [stub_content_response()]
+
+    def urls():
+        for i in range(40):
+            state["pulled"] += 1
+            yield f"https://example.com/{i}"
+
+    client = _content_client(fake_get_content)
+    results = client.iter_sanctioned_content(
+        urls(),
+        max_price_micros=1000000,
+        currency=currencies.USD,
+        license_type=licences.ON_DEMAND_LICENSE,
+        max_in_flight=4,
+    )
+
+    first_url, first_result = next(results)
+    assert state["pulled"] <= 5
+    all_results = {first_url: first_result, **dict(results)}
+
+    assert len(all_results) == 40
+    assert state["peak"] <= 4
+    errors = {url for url, result in all_results.items() if isinstance(result, Exception)}
+    assert errors == {"https://example.com/13"}
+
+
+def test_aiter_sanctioned_content_accepts_async_iterables():
+    client = _content_client(lambda content_url, token: [stub_content_response()])
+
+    async def urls():
+        for i in range(10):
+            yield f"https://example.com/{i}"
+
+    async def collect():
+        return [
+            pair
+            async for pair in client.aiter_sanctioned_content(
+                urls(),
+                max_price_micros=1000000,
+                currency=currencies.USD,
+                license_type=licences.ON_DEMAND_LICENSE,
+                max_in_flight=3,
+            )
+        ]
+
+    results = asyncio.run(collect())
+
+    assert sorted(url for url, _ in results) == sorted(
+        f"https://example.com/{i}" for i in range(10)
+    )
+    assert all(result == stub_content_response() for _, result in results)
+
+
+def test_get_sanctioned_content_skips_content_already_held():
+    client = _content_client(lambda content_url, token: [stub_content_response()])
+    client.dedup_index = DedupIndex()
+    buy = functools.partial(
+        client.get_sanctioned_content,
+        max_price_micros=1000000,
+        currency=currencies.USD,
+        license_type=licences.ON_DEMAND_LICENSE,
+    )
+
+    buy("https://example.com/bar")
+    with pytest.raises(DuplicateContentError):
+        buy("https://example.com/bar")
+    with pytest.raises(DuplicateContentError):
+        buy(
+            "https://syndicator.com/copy",
+            article=ArticleKey("Sample Title", "Author Name", "2024-01-01T00:00:00Z"),
+        )
+    buy("https://example.com/other", article=ArticleKey("Another Title"))
+
+    assert client.token_api.get_content_token.call_count == 2
+    assert client.content_api.get_content.call_count == 2
+
+
+def test_stats_count_cache_hits_and_spend():
+    response = stub_content_response()
+    response.rate.price.price_micros = 1500
+
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_content.return_value = [response]
+    mock_token_api = MagicMock(spec=TokenAPI)
+    mock_token_api.user_agent = "test-agent"
+    mock_token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(
+        token="tok_123"
+    )
+
+    client = UseContentClient(
+        content_api=mock_content_api, token_api=mock_token_api, cache=MemoryCache()
+    )
+    for _ in range(2):
+        client.get_sanctioned_content(
+            url="https://example.com/bar",
+            max_price_micros=1000000,
+            currency=currencies.USD,
+            license_type=licences.ON_DEMAND_LICENSE,
+        )
+
+    counters = {
+        (name, tuple(sorted(sample["labels"].items()))): sample["value"]
+        for name, samples in client.stats()["counters"].items()
+        for sample in samples
+    }
+    labels = (("currency", "USD"), ("license_type", "STANDARD"))
+    assert counters[("tollbit_spend_micros_total", labels)] == 3000
+    assert counters[("tollbit_purchases_total", labels)] == 2
+    assert counters[("tollbit_cache_requests_total", (("kind", "token"), ("result", "miss")))] == 1
+    assert counters[("tollbit_cache_requests_total", (("kind", "token"), ("result", "hit")))] == 1
+
+
+def test_client_built_directly_shares_its_transports_metrics(test_env):
+    transport = Transport(test_env)
+    content_api = ContentAPI(user_agent="test-agent", env=test_env, transport=transport)
+
+    client = UseContentClient(content_api=content_api, token_api=MagicMock(spec=TokenAPI))
+
+    assert client.metrics is transport.metrics
+
+
+def test_get_rates_looks_up_equivalent_urls_once():
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.return_value = []
+
+    client = UseContentClient(content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI))
+    urls = ["https://Example.com/bar/", "example.com/bar?ref=home", "https://example.com:443/bar"]
+    result = client.get_rates(urls)
+
+    assert set(result) == set(urls)
+    mock_content_api.get_rate.assert_called_once_with("example.com/bar")
+
+
+def test_get_rate_answers_from_license_index():
+    site_rate = stub_rate_response()
+    site_rate.license.licensePath = "/"
+    site_rate.license.validUntil = datetime.now(timezone.utc) + timedelta(hours=1)
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.return_value = [site_rate]
+
+    client = UseContentClient(
+        content_api=mock_content_api,
+        token_api=MagicMock(spec=TokenAPI),
+        license_index=LicensePathIndex(verify_rate=0),
+    )
+
+    assert client.get_rate("https://example.com/a") == [site_rate]
+    assert client.get_rate("https://example.com/b/c") == [site_rate]
+    mock_content_api.get_rate.assert_called_once_with("example.com/a")
+
+
+def test_get_rate_relearns_domain_when_verification_disagrees():
+    site_rate, news_rate = stub_rate_response(), stub_rate_response()
+    site_rate.license.licensePath = "/"
+    news_rate.license.licensePath = "/news"
+    news_rate.license.licenseType = "AI_TRAINING"
+    for rate in (site_rate, news_rate):
+        rate.license.validUntil = datetime.now(timezone.utc) + timedelta(hours=1)
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.side_effect = [[site_rate], [site_rate, news_rate]]
+
+    index = LicensePathIndex(verify_rate=1)
+    client = UseContentClient(
+        content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI), license_index=index
+    )
+    client.get_rate("https://example.com/a")
+
+    assert client.get_rate("https://example.com/news/story") == [site_rate, news_rate]
+    assert index.lookup("example.com/news/other") == [site_rate, news_rate]
+    counters = client.stats()["counters"]["tollbit_license_index_requests_total"]
+    assert {c["labels"]["result"]: c["value"] for c in counters} == {"miss": 1, "mismatch": 1}
+
+
+def test_get_rate_table_leaves_out_failed_lookups():
+    def get_rate(path):
+        if path == "example.com/b":
+            raise ServerError("down")
+        return [stub_rate_response()]
+
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.side_effect = get_rate
+    client = UseContentClient(content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI))
+
+    table = client.get_rate_table(["https://example.com/a", "https://example.com/b"])
+
+    assert table.urls == ["https://example.com/a"]
+    assert [row.price_micros for row in table.rows()] == [0]
+
+
+def test_get_rate_answers_from_rate_snapshot(tmp_path):
+    fake_rate = stub_rate_response()
+    fake_rate.license.validUntil = datetime.now(timezone.utc) + timedelta(hours=1)
+    exporter_api = MagicMock(spec=ContentAPI)
+    exporter_api.get_rate.return_value = [fake_rate]
+    cache = MemoryCache()
+    exporter = UseContentClient(
+        content_api=exporter_api, token_api=MagicMock(spec=TokenAPI), cache=cache
+    )
+    exporter.get_rate("https://example.com/bar")
+    export_rate_snapshot(cache, tmp_path / "rates.snap")
+
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.return_value = []
+    client = UseContentClient(
+        content_api=mock_content_api,
+        token_api=MagicMock(spec=TokenAPI),
+        rate_snapshot=RateSnapshot(tmp_path / "rates.snap"),
+    )
+
+    assert client.get_rate("https://example.com/bar") == [fake_rate]
+    assert client.get_rate("https://example.com/other") == []
+    mock_content_api.get_rate.assert_called_once_with("example.com/other")
+
+
+def test_get_sanctioned_content_lazy_records_purchase_without_decoding_content():
+    raw = json.dumps([stub_content_response().model_dump(mode="json", by_alias=True)]).encode()
+    client = _content_client(lambda content_url, token: [stub_content_response()])
+    client.content_api.get_content_lazy.side_effect = lambda content_url, token: (
+        _parse_lazy_content_response(raw)
+    )
+    client.dedup_index = DedupIndex()
+
+    result = client.get_sanctioned_content_lazy(
+        "https://example.com/bar",
+        max_price_micros=1000000,
+        currency=currencies.USD,
+        license_type=licences.ON_DEMAND_LICENSE,
+    )
+
+    assert result.main_bytes() == b"<main>Main Content</main>"
+    assert "content" not in vars(result)
+    assert client.dedup_index.contains_content("<main>Main Content</main>")
+    client.content_api.get_content.assert_not_called()
@@ -0,0 +1,130 @@
+import json
+import pytest
+from unittest.mock import MagicMock
+from tollbit import currencies, licences
+from tollbit.use_content.client import UseContentClient
+from tollbit.use_content.jobs import JobEntry, PurchaseJob, UrlState
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.errors import BadRequestError
+from tollbit._apis.models import CreateSubdomainAccessTokenResponse
+from test_helpers.stub_api_responses import stub_content_response
+
+
+def _client(fail=()):
+    content_api = MagicMock(spec=ContentAPI)
+
+    def get_content(content_url, token):
+        if content_url in fail:
+            raise BadRequestError("too expensive")
+        return [stub_content_response()]
+
+    content_api.get_content.side_effect = get_content
+    token_api = MagicMock(spec=TokenAPI)
+    token_api.user_agent = "test-agent"
+    token_api.get_content_token.return_value = CreateSubdomainAccessTokenResponse(token="token")
+    return UseContentClient(content_api=content_api, token_api=token_api)
+
+
+def _job(client, path, **kwargs):
+    return PurchaseJob(
+        client,
+        path,
+        max_price_micros=1000,
+        currency=currencies.USD,
+        license_type=licences.ON_DEMAND_LICENSE,
+        **kwargs,
+    )
+
+
+def test_run_journals_every_state(tmp_path):
+    path = tmp_path / "job.journal"
+    client = _client(fail={"example.com/b"})
+
+    with _job(client, path) as job:
+        results = dict(job.run(["https://example.com/a", "https://example.com/b"]))
+        entries = job.entries()
+
+    assert isinstance(results["https://example.com/b"], BadRequestError)
+    assert entries == {
+        "https://example.com/a": JobEntry(UrlState.FETCHED),
+        "https://example.com/b": JobEntry(UrlState.FAILED, "BadRequestError: too expensive"),
+    }
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    states = [r["state"] for r in records if r["url"] == "https://example.com/a"]
+    assert states == ["pending", "token_minted", "fetched"]
+
+
+def test_resume_skips_finished_urls(tmp_path):
+    path = tmp_path / "job.journal"
+    urls = ["https://example.com/a", "https://example.com/b", "https://example.com/c"]
+    with _job(_client(fail={"example.com/b"}), path) as job:
+        for url, _ in job.run(urls):
+            if url == "https://example.com/a":
+                break
+
+    client = _client()
+    with _job(client, path) as job:
+        resumed = [url for url, _ in job.run(urls + ["https://EXAMPLE.com/a/"])]
+
+    assert "https://example.com/a" not in resumed
+    assert "https://EXAMPLE.com/a/" not in resumed
+    fetched = [c.kwargs["content_url"] for c in client.content_api.get_content.call_args_list]
+    assert "example.com/a" not in fetched
+
+
+def test_retry_failed(tmp_path):
+    path = tmp_path / "job.journal"
+    with _job(_client(fail={"example.com/b"}), path) as job:
+        list(job.run(["https://example.com/b"]))
+
+    with _job(_client(), path) as job:
+        assert list(job.run(["https://example.com/b"])) == []
+    with _job(_client(), path, retry_failed=True) as job:
+        assert [url for url, _ in job.run(["https://example.com/b"])] == ["https://example.com/b"]
+        assert job.entries()["https://example.com/b"].state is UrlState.FETCHED
+
+
+def test_resume_after_a_torn_record(tmp_path):
+    path = tmp_path / "job.journal"
+    path.write_text(
+        json.dumps({"url": "https://example.com/a", "state": "fetched", "time": 0})
+        + '\n{"url": "https://example.com/b", "sta'
+    )
+
+    with _job(_client(), path) as job:
+        results = [url for url, _ in job.run(["https://example.com/a", "https://example.com/b"])]
+
+    assert results == ["https://example.com/b"]
+    with _job(_client(), path) as job:
+        assert job.entries()["https://example.com/b"].state is UrlState.FETCHED
+
+
+def test_records_are_flushed_in_batches(tmp_path):
+    path = tmp_path / "job.journal"
+    job = _job(_client(), path, flush_every=1000, flush_interval=3600)
+    results = job.run(["https://example.com/a"])
+    next(results)
+
+    assert path.read_text() == ""
+    results.close()
+    assert len(path.read_text().splitlines()) == 3
+    job.close()
+
+
+def test_urls_interrupted_after_minting_are_reported_as_possibly_charged(tmp_path):
+    path = tmp_path / "job.journal"
+    path.write_text(
+        "".join(
+            json.dumps({"url": url, "state": state, "time": 0}) + "\n"
+            for url, state in [
+                ("https://example.com/a", "token_minted"),
+                ("https://example.com/b", "token_minted"),
+                ("https://example.com/b", "fetched"),
+            ]
+        )
+    )
+
+    with _job(_client(), path) as job:
+        assert job.possibly_charged == {"https://example.com/a"}
+        assert [url for url, _ in job.run(["https://example.com/a"])] == ["https://example.com/a"]
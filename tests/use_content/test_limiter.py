@@ -0,0 +1,96 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.errors import BadRequestError, RateLimitedError, ServerError
+from tollbit._apis.token_api import TokenAPI
+from tollbit.use_content.client import UseContentClient
+from tollbit.use_content.limiter import AdaptiveLimiter
+
+
+def test_limit_grows_while_saturated_and_latency_is_flat():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4)
+    for _ in range(20):
+        slots = limiter.limit
+        for _ in range(slots):
+            limiter.acquire()
+        for _ in range(slots):
+            limiter.release(0.01)
+
+    assert limiter.limit == 4
+
+
+def test_limit_does_not_grow_when_unused():
+    limiter = AdaptiveLimiter(initial_limit=4)
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release(0.01)
+
+    assert limiter.limit == 4
+
+
+@pytest.mark.parametrize("error", [ServerError("boom"), RateLimitedError("slow down")])
+def test_limit_is_cut_on_overload(error):
+    limiter = AdaptiveLimiter(initial_limit=8)
+
+    with pytest.raises(type(error)):
+        limiter.run(lambda: (_ for _ in ()).throw(error))
+
+    assert limiter.limit == 4
+
+
+def test_other_errors_do_not_change_the_limit():
+    limiter = AdaptiveLimiter(initial_limit=8)
+
+    def fail():
+        raise BadRequestError("bad")
+
+    with pytest.raises(BadRequestError):
+        limiter.run(fail)
+
+    assert limiter.limit == 8
+
+
+def test_limit_is_cut_when_latency_grows():
+    limiter = AdaptiveLimiter(initial_limit=10)
+    for _ in range(20):
+        limiter.acquire()
+        limiter.release(0.001)
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(0.05)
+
+    assert limiter.limit < 10
+
+
+def test_get_rates_respects_the_limit():
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def fake_get_rate(path):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return []
+
+    mock_content_api = MagicMock(spec=ContentAPI)
+    mock_content_api.get_rate.side_effect = fake_get_rate
+    client = UseContentClient(content_api=mock_content_api, token_api=MagicMock(spec=TokenAPI))
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=2)
+
+    urls = [f"https://site{i}.com/a" for i in range(10)]
+    results = client.get_rates(urls, max_workers=8, limiter=limiter)
+
+    assert len(results) == 10
+    assert peak <= 2
+
+
+def test_rejects_invalid_limits():
+    with pytest.raises(ValueError):
+        AdaptiveLimiter(initial_limit=10, max_limit=5)
@@ -0,0 +1,182 @@
+import pickle
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from tollbit import currencies, licences
+from tollbit.use_content import prefetch
+from tollbit.use_content.client import UseContentClient
+from tollbit.use_content.prefetch import Prefetcher
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.models import (
+    ContentRate,
+    CreateSubdomainAccessTokenResponse,
+    RateLicenseResponse,
+    RatePrice,
+)
+from test_helpers.stub_api_responses import stub_content_response
+
+
+def _rate(price_micros):
+    return ContentRate(
+        price=RatePrice(priceMicros=price_micros, currency="USD"),
+        license=RateLicenseResponse(
+            licenseType="ON_DEMAND_LICENSE",
+            licensePath="/",
+            permissions=[],
+            validUntil="2999-01-01T00:00:00Z",
+        ),
+        error="",
+    )
+
+
+def _client(prices):
+    content_api = MagicMock(spec=ContentAPI)
+    content_api.get_rate.side_effect = lambda content: [_rate(prices[content])]
+    content_api.get_content.return_value = [stub_content_response()]
+    token_api = MagicMock(spec=TokenAPI)
+    token_api.user_agent = "test-agent"
+    token_api.get_content_token.side_effect = lambda req: CreateSubdomainAccessTokenResponse(
+        token=f"token-for-{req.url}"
+    )
+    return UseContentClient(content_api=content_api, token_api=token_api)
+
+
+def _prefetcher(client, budget_micros=10_000, **kwargs):
+    return Prefetcher(
+        client,
+        budget_micros=budget_micros,
+        max_price_micros=1000,
+        currency=currencies.USD,
+        license_type=licences.ON_DEMAND_LICENSE,
+        **kwargs,
+    )
+
+
+def _buy(client, url):
+    return client.get_sanctioned_content(url, 1000, currencies.USD, licences.ON_DEMAND_LICENSE)
+
+
+def test_purchase_only_fetches_content_after_prefetch():
+    client = _client({"example.com/a": 500})
+
+    with _prefetcher(client) as prefetcher:
+        assert prefetcher.enqueue("https://example.com/a")
+        prefetcher.join()
+        assert client.token_api.get_content_token.call_count == 1
+        assert prefetcher.reserved_micros == 500
+
+        assert client.get_rate("https://example.com/a") == [_rate(500)]
+        _buy(client, "https://example.com/a")
+
+        assert client.content_api.get_rate.call_count == 1
+        assert client.token_api.get_content_token.call_count == 1
+        client.content_api.get_content.assert_called_once_with(
+            content_url="example.com/a", token="token-for-https://example.com/a"
+        )
+        assert prefetcher.reserved_micros == 0
+
+    counters = client.stats()["counters"]["tollbit_prefetch_requests_total"]
+    assert {(c["labels"]["kind"], c["labels"]["result"]): c["value"] for c in counters} == {
+        ("rate", "hit"): 1,
+        ("token", "hit"): 1,
+    }
+    assert client.prefetcher is None
+
+
+def test_tokens_are_only_minted_within_budget_and_price_cap():
+    prices = {"example.com/a": 600, "example.com/b": 600, "example.com/c": 5000}
+    client = _client(prices)
+
+    with _prefetcher(client, budget_micros=1000, max_in_flight=1) as prefetcher:
+        prefetcher.enqueue_many(f"https://{path}" for path in prices)
+        prefetcher.join()
+
+        assert client.token_api.get_content_token.call_count == 1
+        assert prefetcher.reserved_micros == 600
+        skipped = client.stats()["counters"]["tollbit_prefetch_skipped_total"]
+        assert {c["labels"]["reason"]: c["value"] for c in skipped} == {
+            "over_budget": 1,
+            "over_price": 1,
+        }
+
+        # Buying the first URL frees its budget, but the second still mints its own token
+        _buy(client, "https://example.com/a")
+        _buy(client, "https://example.com/b")
+        assert client.token_api.get_content_token.call_count == 2
+
+
+def test_unused_prefetches_expire_without_fetching_content(monkeypatch):
+    client = _client({"example.com/a": 500})
+
+    with _prefetcher(client) as prefetcher:
+        prefetcher.enqueue("https://example.com/a")
+        prefetcher.join()
+
+        # Tokens without an expiry are kept for a minute
+        later = prefetch.time.time() + 120
+        monkeypatch.setattr(prefetch, "time", SimpleNamespace(time=lambda: later))
+        assert prefetcher.reserved_micros == 500
+        assert prefetcher.take_rates("example.com/a") is not None
+        assert prefetcher.take_token("example.com/other", MagicMock()) is None
+
+        assert prefetcher.reserved_micros == 0
+        client.content_api.get_content.assert_not_called()
+
+
+def test_purchase_with_other_terms_mints_its_own_token():
+    client = _client({"example.com/a": 500})
+
+    with _prefetcher(client) as prefetcher:
+        prefetcher.enqueue("https://example.com/a")
+        prefetcher.join()
+        client.get_sanctioned_content(
+            "https://example.com/a", 2000, currencies.USD, licences.ON_DEMAND_LICENSE
+        )
+
+        assert client.token_api.get_content_token.call_count == 2
+        assert prefetcher.reserved_micros == 500
+
+
+def test_full_queue_drops_the_oldest_prefetch():
+    client = _client({"example.com/a": 500, "example.com/b": 500})
+
+    with _prefetcher(client, max_pending=1) as prefetcher:
+        prefetcher.enqueue("https://example.com/a")
+        prefetcher.join()
+        assert prefetcher.enqueue("https://example.com/b")
+        prefetcher.join()
+
+        assert prefetcher.reserved_micros == 500
+        assert prefetcher.take_rates("example.com/a") is None
+        assert prefetcher.take_rates("example.com/b") is not None
+
+
+def test_pickled_client_leaves_prefetcher_behind():
+    client = UseContentClient(content_api=None, token_api=None)
+    with _prefetcher(client, max_in_flight=0):
+        copy = pickle.loads(pickle.dumps(client))
+
+    assert copy.prefetcher is None
+
+
+def test_client_only_takes_one_prefetcher():
+    client = UseContentClient(content_api=None, token_api=None)
+    with _prefetcher(client, max_in_flight=0):
+        with pytest.raises(ValueError):
+            _prefetcher(client, max_in_flight=0)
+
+    with _prefetcher(client, max_in_flight=0) as prefetcher:
+        assert client.prefetcher is prefetcher
+
+
+def test_failed_mint_after_close_leaves_budget_alone():
+    client = UseContentClient(content_api=None, token_api=None)
+    prefetcher = _prefetcher(client, max_in_flight=0)
+    assert prefetcher._reserve(500)
+    prefetcher.close()
+
+    prefetcher._release(500)
+
+    assert prefetcher.reserved_micros == 0
+    assert prefetcher._tokens == 0
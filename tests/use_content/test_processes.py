@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import pickle
+from test_helpers.stub_api_responses import stub_content_response
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.token_api import TokenAPI
+from tollbit._apis.token_refresher import TokenRefresher
+from tollbit._apis.transport import Transport, _after_fork_in_child
+from tollbit.dedup import DedupIndex
+from tollbit.use_content.client import UseContentClient
+from tollbit.use_content.processes import map_in_processes
+
+
+def _client(test_env, **kwargs):
+    transport = Transport(test_env)
+    return UseContentClient(
+        content_api=ContentAPI(user_agent="test-agent", env=test_env, transport=transport),
+        token_api=TokenRefresher(
+            TokenAPI(api_key="test-key", user_agent="test-agent", env=test_env, transport=transport)
+        ),
+        **kwargs,
+    )
+
+
+def _describe(client, item):
+    return os.getpid(), client.content_api.user_agent, item
+
+
+def test_client_pickles_without_connections(test_env):
+    client = _client(test_env)
+    client.content_api._transport.session()
+
+    copy = pickle.loads(pickle.dumps(client))
+
+    assert copy.content_api._transport._session is None
+    assert copy.content_api._transport.base_url == "http://testserver.local"
+    assert copy.token_api.token_api.api_key == "test-key"
+    assert copy.token_api._entries == {}
+
+
+def test_client_with_dedup_index_pickles(test_env):
+    index = DedupIndex()
+    index.add("example.com/a", stub_content_response())
+    client = _client(test_env, dedup_index=index)
+
+    copy = pickle.loads(pickle.dumps(client))
+
+    assert copy.dedup_index.contains_url("example.com/a")
+    assert not copy.dedup_index.contains_url("example.com/b")
+    copy.dedup_index.add("example.com/b", stub_content_response())
+    assert not index.contains_url("example.com/b")
+
+
+def test_transport_rebuilds_session_in_forked_child(test_env):
+    transport = Transport(test_env)
+    parent_session = transport.session()
+
+    # Simulate what the child sees after a fork
+    _after_fork_in_child()
+
+    assert transport._session is None
+    assert transport.session() is not parent_session
+
+
+def test_map_in_processes_reuses_client_per_process(test_env):
+    client = _client(test_env)
+
+    results = list(
+        map_in_processes(
+            _describe,
+            range(20),
+            client,
+            max_workers=2,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    )
+
+    assert [item for _, _, item in results] == list(range(20))
+    assert {agent for _, agent, _ in results} == {"test-agent"}
+    assert os.getpid() not in {pid for pid, _, _ in results}
@@ -0,0 +1,95 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from tollbit.use_content import rate_table
+from tollbit.use_content.rate_table import RateRow, RateTable
+from tollbit.currencies import USD
+from test_helpers.stub_api_responses import stub_rate_response
+
+_NOW = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["numpy", "array"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(rate_table, "np", None)
+    return request.param
+
+
+def _rate(price, license_type="ON_DEMAND_LICENSE", currency="USD", expires_in=3600, error=""):
+    rate = stub_rate_response()
+    rate.price.priceMicros = price
+    rate.price.currency = currency
+    rate.license.licenseType = license_type
+    rate.license.licensePath = "/"
+    rate.license.validUntil = _NOW + timedelta(seconds=expires_in)
+    rate.error = error
+    return rate
+
+
+def _table():
+    return RateTable.from_rates(
+        {
+            "https://a.com/1": [_rate(300), _rate(100, "CUSTOM_LICENSE")],
+            "https://a.com/2": [_rate(500), _rate(200, "CUSTOM_LICENSE", expires_in=-60)],
+            "https://b.com/1": [_rate(50, error="unavailable"), _rate(700, currency="EUR")],
+            "https://b.com/2": RuntimeError("lookup failed"),
+        }
+    )
+
+
+def test_from_rates_skips_failures_and_rate_errors(backend):
+    table = _table()
+
+    assert len(table) == 5
+    assert table.urls == ["https://a.com/1", "https://a.com/2", "https://b.com/1"]
+    assert next(table.rows()) == RateRow(
+        "https://a.com/1",
+        300,
+        "USD",
+        "ON_DEMAND_LICENSE",
+        "/",
+        (_NOW + timedelta(hours=1)).timestamp(),
+    )
+
+
+def test_filter(backend):
+    table = _table()
+
+    assert [r.price_micros for r in table.filter(max_price_micros=300).rows()] == [300, 100, 200]
+    assert [r.price_micros for r in table.filter(license_type="CUSTOM_LICENSE").rows()] == [
+        100,
+        200,
+    ]
+    assert [
+        r.price_micros for r in table.filter(currency=USD, valid_at=_NOW.timestamp()).rows()
+    ] == [
+        300,
+        100,
+        500,
+    ]
+    assert len(table.filter(license_type="UNKNOWN")) == 0
+
+
+def test_cheapest_picks_one_rate_per_url(backend):
+    cheapest = _table().filter(valid_at=_NOW.timestamp()).cheapest()
+
+    assert [(r.url, r.price_micros) for r in cheapest.rows()] == [
+        ("https://a.com/1", 100),
+        ("https://a.com/2", 500),
+        ("https://b.com/1", 700),
+    ]
+
+
+def test_cheapest_keeps_first_rate_on_a_tie(backend):
+    table = RateTable.from_rates({"https://a.com": [_rate(100), _rate(100, "CUSTOM_LICENSE")]})
+
+    assert [r.license_type for r in table.cheapest().rows()] == ["ON_DEMAND_LICENSE"]
+
+
+def test_total_cost_by_currency(backend):
+    table = _table()
+
+    assert table.total_cost() == {"USD": 1100, "EUR": 700}
+    assert table.filter(currency="GBP").total_cost() == {}
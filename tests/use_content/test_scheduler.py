@@ -0,0 +1,110 @@
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from tollbit import currencies, licences
+from tollbit._apis.content_api import ContentAPI
+from tollbit._apis.errors import ServerError
+from tollbit._apis.token_api import TokenAPI
+from tollbit.use_content.client import UseContentClient
+from tollbit.use_content.scheduler import CrawlScheduler
+
+
+def _scheduler(fetch, **kwargs):
+    client = UseContentClient(
+        content_api=MagicMock(spec=ContentAPI), token_api=MagicMock(spec=TokenAPI)
+    )
+    client.get_sanctioned_content = lambda url, **_: fetch(url)
+    return CrawlScheduler(
+        client,
+        max_price_micros=1000,
+        currency=currencies.USD,
+        license_type=licences.ON_DEMAND_LICENSE,
+        **kwargs,
+    )
+
+
+def test_rotates_across_domains_by_priority():
+    order = []
+    scheduler = _scheduler(order.append, max_workers=1)
+    scheduler.submit_many([f"https://big.com/{i}" for i in range(3)])
+    scheduler.submit_many(["https://small.com/a", "https://small.com/b"])
+    scheduler.submit("https://other.com/urgent", priority=5)
+
+    results = list(scheduler.run())
+
+    assert len(results) == 6
+    assert order == [
+        "https://other.com/urgent",
+        "https://big.com/0",
+        "https://small.com/a",
+        "https://big.com/1",
+        "https://small.com/b",
+        "https://big.com/2",
+    ]
+
+
+def test_caps_concurrency_per_domain():
+    lock = threading.Lock()
+    in_flight: dict[str, int] = {}
+    peak: dict[str, int] = {}
+
+    def fetch(url):
+        domain = url.split("/")[2]
+        with lock:
+            in_flight[domain] = in_flight.get(domain, 0) + 1
+            peak[domain] = max(peak.get(domain, 0), in_flight[domain])
+        time.sleep(0.01)
+        with lock:
+            in_flight[domain] -= 1
+
+    scheduler = _scheduler(fetch, max_workers=8, max_per_domain=2, domain_limits={"slow.com": 1})
+    scheduler.submit_many([f"https://big.com/{i}" for i in range(20)])
+    scheduler.submit_many([f"https://slow.com/{i}" for i in range(5)])
+    scheduler.submit("https://small.com/a")
+
+    assert len(list(scheduler.run())) == 26
+    assert peak == {"big.com": 2, "slow.com": 1, "small.com": 1}
+
+
+def test_accepts_jobs_while_running_and_yields_errors():
+    error = ServerError("boom")
+
+    def fetch(url):
+        if url.endswith("broken"):
+            raise error
+        return url
+
+    scheduler = _scheduler(fetch, max_workers=2)
+    scheduler.submit("https://example.com/a")
+    results = {}
+    for url, result in scheduler.run():
+        results[url] = result
+        if url == "https://example.com/a":
+            scheduler.submit("https://example.com/broken")
+            scheduler.submit("https://other.com/b")
+
+    assert results == {
+        "https://example.com/a": "https://example.com/a",
+        "https://example.com/broken": error,
+        "https://other.com/b": "https://other.com/b",
+    }
+    assert len(scheduler) == 0
+
+
+def test_yields_malformed_urls_as_errors():
+    scheduler = _scheduler(lambda url: url)
+    scheduler.submit("https://example.com:port/bad")
+    scheduler.submit("https://example.com/a")
+    assert len(scheduler) == 2
+
+    results = dict(scheduler.run())
+
+    assert isinstance(results["https://example.com:port/bad"], ValueError)
+    assert results["https://example.com/a"] == "https://example.com/a"
+    assert len(scheduler) == 0
+
+
+def test_rejects_invalid_limits():
+    with pytest.raises(ValueError):
+        _scheduler(lambda url: url, domain_limits={"example.com": 0})